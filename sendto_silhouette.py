@@ -7,7 +7,7 @@
 __version__ = "1.26"     # Keep in sync with sendto_silhouette.inx ca line 79
 __author__ = "Juergen Weigert <juergen@fabmail.org> and contributors"
 
-import sys, os, time, math, operator, re
+import sys, os, io, time, math, re, threading
 
 # we sys.path.append() the directory where this script lives.
 sys.path.append(os.path.dirname(os.path.abspath(sys.argv[0])))
@@ -22,6 +22,15 @@ elif sys_platform.startswith("darwin"):
 else:   # linux
     sys.path.append("/usr/share/inkscape/extensions")
 
+# With a service running (see silhouette/Service.py), this process is only a
+# thin client: the service has inkex loaded and the device open already.
+if __name__ == "__main__" and len(sys.argv) > 1 and \
+        not set(sys.argv[1:]) & {"--serve", "--version", "-V", "--help", "-h"}:
+    from silhouette.Service import submit
+    exit_code = submit(sys.argv[1:], path_options=("--logfile", "--cmdfile"))
+    if exit_code is not None:
+        sys.exit(exit_code)
+
 # We will use the inkex module with the predefined Effect base class.
 # As of Inkscape 1.1, inkex cannot be loaded if stdout is closed,
 # which it might be if we are coming here via silhouette_multi.
@@ -51,10 +60,15 @@ from tempfile import NamedTemporaryFile
 
 inkex.localization.localize()
 
-from silhouette.Graphtec import SilhouetteCameo, CAMEO_MATS
-from silhouette.Strategy import MatFree
+from silhouette.Graphtec import SilhouetteCameo, CAMEO_MATS, DEVICE
+from silhouette.DeviceLock import DeviceLock
+from silhouette.Strategy import MatFree, presets as matfree_presets
+from silhouette.Intersections import find_intersections, path_segments
+from silhouette.PathStore import PathStore
+from silhouette.TimeModel import MotionModel
 from silhouette.convert2dashes import splitPath
 import silhouette.StrategyMinTraveling
+import silhouette.StrategyAuto
 import silhouette.read_dump
 from silhouette.Geometry import dist_sq, XY_a
 
@@ -163,6 +177,19 @@ class SendtoSilhouette(EffectExtension):
     """
     Inkscape Extension to send to a Silhouette Cameo
     """
+    pool = None             # devices kept open between jobs, see serve() and silhouette_multi.
+    spooler = None          # the spool of the service.
+    device = None           # the device of the pool this job holds.
+    last_device = None
+    spool_buffer = None     # compiled commands of a spooled job.
+    setup_len = 0           # the part of it from setup()
+    device_thread = None    # runs prepare_device()
+    dev = None              # the SilhouetteCameo, once found
+    device_error = None
+    device_lock = None      # the DeviceLock, outside the service.
+    pipelined = False       # compiling offline, while another run has the device.
+    document_in = None      # an already parsed document, to use instead of the input.
+
     def __init__(self):
         # Call the base class constructor.
         EffectExtension.__init__(self)
@@ -198,6 +225,7 @@ class SendtoSilhouette(EffectExtension):
         except:
             self.tty = None
         self.log = self.tty
+        self.stderr = sys.stderr    # in the service, the one of the client.
 
         self.arg_parser.add_argument("--active-tab", dest = "active_tab",
                 help=SUPPRESS_HELP)
@@ -230,15 +258,65 @@ class SendtoSilhouette(EffectExtension):
                 help="Do not send commands to device (queries allowed)")
         self.arg_parser.add_argument("-g", "--strategy",
                 dest = "strategy", default = "mintravel",
-                choices=("mintravel", "mintravelfull", "mintravelfwd", "matfree", "zorder"),
-                help="Cutting Strategy: mintravel, mintravelfull, mintravelfwd, matfree or zorder")
+                choices=("mintravel", "mintravelfull", "mintravelfwd", "matfree", "euler", "zorder", "auto"),
+                help="Cutting Strategy: mintravel, mintravelfull, mintravelfwd, matfree, euler, zorder or auto")
+        self.arg_parser.add_argument("--matfree_preset",
+                dest = "matfree_preset", default = "default",
+                choices=("default", "pyramids"),
+                help="Algorithm of the matfree strategy: default (barrier slices) or pyramids (45 degree shadows)")
+        self.arg_parser.add_argument("--matfree_processes",
+                dest = "matfree_processes", type = int, default = 1,
+                help="Worker processes of the matfree strategy for shapes at different heights, 0 = one per cpu")
+        self.arg_parser.add_argument("--auto_timeout",
+                dest = "auto_timeout", type = float, default = 10.0,
+                help="Seconds the auto strategy waits for the other strategies")
+        self.arg_parser.add_argument("--travel_cost",
+                dest = "travel_cost", default = "distance",
+                choices=("distance", "time"),
+                help="What the mintravel strategies minimize: travel distance, or estimated travel time")
+        self.arg_parser.add_argument("--estimate",
+                dest = "estimate", type = Boolean, default = False,
+                help="Log cut length, travel length, tool lifts and estimated duration")
+        self.arg_parser.add_argument("--check_overlaps",
+                dest = "check_overlaps", type = Boolean, default = False,
+                help="Log where cut paths cross or cut the same line twice")
+        self.arg_parser.add_argument("--optimize_time",
+                dest = "optimize_time", type = float, default = 0.0,
+                help="Seconds to spend on shortening the travel between paths after a mintravel strategy, 0 = off.")
+        self.arg_parser.add_argument("--inner_first",
+                dest = "inner_first", type = Boolean, default = False,
+                help="Mintravel strategies: cut paths inside a closed path before it")
+        self.arg_parser.add_argument("--mirror",
+                dest = "mirror", type = Boolean, default = False,
+                help="Mirror the cut left to right")
+        self.arg_parser.add_argument("--flip",
+                dest = "flip", type = Boolean, default = False,
+                help="Flip the cut upside down")
+        self.arg_parser.add_argument("--rotate",
+                dest = "rotate", type = float, default = 0.0,
+                help="Rotate the cut clockwise by this many degrees, 90 turns landscape into portrait")
+        self.arg_parser.add_argument("--scale",
+                dest = "scale", type = float, default = 1.0,
+                help="Scale the cut by this factor. All transforms keep its top left corner in place.")
         self.arg_parser.add_argument("--orient_paths",
                 dest = "orient_paths", default = "natural",
                 choices=("natural","desy","ascy","desx","ascx"),
                 help="Pre-orient paths: natural (as in svg), or [des(cending)|asc(ending)][y|x]")
         self.arg_parser.add_argument("--fuse_paths",
                 dest = "fuse_paths", type = Boolean, default = True,
-                help="Merge any path with predecessor that ends at its start.")
+                help="Merge any path with predecessor that ends at its start (within the weld tolerance).")
+        self.arg_parser.add_argument("--weld_paths",
+                dest = "weld_paths", type = Boolean, default = False,
+                help="Before ordering, join all paths that meet at their ends into chains")
+        self.arg_parser.add_argument("--weld_tolerance",
+                dest = "weld_tolerance", type = float, default = 0.01,
+                help="Path ends closer than this meet [mm]")
+        self.arg_parser.add_argument("--simplify",
+                dest = "simplify", type = float, default = 0.0,
+                help="Drop points closer than this to the simplified path [mm], 0 = off. Sharp corners are kept.")
+        self.arg_parser.add_argument("--dedup_edges",
+                dest = "dedup_edges", type = Boolean, default = False,
+                help="Cut lines shared by several paths only once")
         self.arg_parser.add_argument("-l", "--sw_clipping",
                 dest = "sw_clipping", type = Boolean, default = True,
                 help="Enable software clipping")
@@ -287,6 +365,15 @@ class SendtoSilhouette(EffectExtension):
         self.arg_parser.add_argument("-w", "--wait", "--wait-done", "--wait_done",
                 dest = "wait_done", type = Boolean, default = False,
                 help="After sending wait til device reports ready")
+        self.arg_parser.add_argument("--spool",
+                dest = "spool", type = Boolean, default = False,
+                help="Queue the job in the spool of the service, see --serve, instead of sending it now")
+        self.arg_parser.add_argument("--spool_priority",
+                dest = "spool_priority", type = int, default = 0,
+                help="Spooled jobs with a higher priority are cut first")
+        self.arg_parser.add_argument("--spool_hold",
+                dest = "spool_hold", type = Boolean, default = False,
+                help="Hold the spooled job until released with 'python3 -m silhouette.Spooler release JOB'")
         self.arg_parser.add_argument("-x", "--x-off", "--x_off",
                 type = float, dest = "x_off", default = 0.0, help="X-Offset [mm]")
         self.arg_parser.add_argument("-y", "--y-off", "--y_off",
@@ -320,6 +407,9 @@ class SendtoSilhouette(EffectExtension):
         self.arg_parser.add_argument("--inc_queries",
                 dest = "inc_queries", type = Boolean, default = False,
                 help="Include queries in cutter command transcript")
+        self.arg_parser.add_argument("--device",
+                dest = "device", default = None,
+                help = "Address or serial number of the cutter, see 'python3 -m silhouette.DevicePool'. Default: the first one found.")
         self.arg_parser.add_argument("--force_hardware",
                 dest = "force_hardware", default = None,
                 help = "Override hardware model of cutting device.")
@@ -363,11 +453,11 @@ class SendtoSilhouette(EffectExtension):
                     self.tty.flush()
             if level == 'log':
                 return
-        print(message, file=sys.stderr)
+        print(message, file=self.stderr)
         if level != 'error':
             # oops accidentally used an invalid level
             print(f"  ... WARNING: message issued at invalid level {level}",
-                  file=sys.stderr)
+                  file=self.stderr)
 
     def penUp(self):
         self.fPrevX = None              # flag that we are up
@@ -1003,6 +1093,190 @@ class SendtoSilhouette(EffectExtension):
         return mat
 
 
+    def start_method(self):
+        """How to start worker processes. With a pool, we run in the threads of
+           the service or silhouette_multi, which must not be forked.
+        """
+        return "spawn" if SendtoSilhouette.pool is not None else None
+
+
+    def load_raw(self):
+        """Take document_in, if given, instead of parsing the input again."""
+        if self.document_in is None:
+            return EffectExtension.load_raw(self)
+        # we do not change the document, so there is nothing to save.
+        self.document = self.original_document = self.document_in
+        self.svg = self.document.getroot()
+        self.svg.selection.set(*self.options.ids)
+
+
+    def clean_up(self):
+        """With a pool, close the log file now. It outlives the job otherwise."""
+        EffectExtension.clean_up(self)
+        if self.device_thread is not None:
+            self.device_thread.join()
+        if self.device is not None:
+            SendtoSilhouette.pool.release(self.device)
+            self.device = None
+        if self.device_lock is not None:
+            self.device_lock.release()
+        if SendtoSilhouette.pool is not None and self.log is not None and self.log is not self.tty:
+            if isinstance(self.log, teeFile):
+                self.log.f2.close()
+            else:
+                self.log.close()
+            self.log = self.tty
+
+
+    def forced_hardware(self):
+        """The DEVICE entry of --force_hardware, None if not given."""
+        for hw in DEVICE:
+            if hw["name"] == self.options.force_hardware:
+                return hw
+        return None
+
+
+    def lock_device(self):
+        """Outside the service, take the DeviceLock of the device. If another
+           run holds it and we know what hardware to compile for, the job is
+           compiled offline meanwhile, and transmit() sends it when the lock
+           is free. Otherwise wait for the lock here.
+        """
+        self.device_lock = DeviceLock.find(self.options.device)
+        if self.device_lock.acquire(blocking=False):
+            return
+        hardware = self.forced_hardware() or self.device_lock.hardware
+        if hardware in DEVICE and not self.options.regmark:
+            self.device_lock.hardware = hardware
+            self.pipelined = True
+            self.report("The device is busy, preparing the job meanwhile.", 'tty')
+            return
+        self.report("The device is busy, waiting for it ...", 'tty')
+        self.device_lock.acquire()
+
+
+    def transmit(self, progress_cb, cmdfile):
+        """Send the job compiled into spool_buffer, as soon as we get the
+           device and it is done with the run before. Returns the
+           SilhouetteCameo it was sent to.
+        """
+        self.report("The job is ready, waiting for the device ...", 'tty')
+        self.device_lock.acquire()
+        dev = SilhouetteCameo(log=self.log, progress_cb=progress_cb,
+                              cmdfile=cmdfile,
+                              inc_queries=self.options.inc_queries,
+                              force_hardware=self.options.force_hardware,
+                              address=self.device_lock.address)
+        # the run before may have left without waiting for the cut to finish.
+        state = dev.wait_for_ready(timeout=600, poll_interval=1.0)
+        self.report("status=%s" % (state), 'log')
+        if state != 'ready':
+            raise ValueError("The device is not ready: status=%s" % (state))
+        dev.replay(self.spool_buffer.getvalue())
+        return dev
+
+
+    def open_device(self, progress_cb, cmdfile):
+        """A new SilhouetteCameo. In the service, the one of the device pool,
+           which stays open for the next job. The job waits until the device
+           is idle.
+           For a spooled or pipelined job, an offline one that compiles into
+           spool_buffer.
+        """
+        pool = SendtoSilhouette.pool
+        if self.pipelined:
+            self.spool_buffer = io.BytesIO()
+            return SilhouetteCameo(log=self.log, progress_cb=progress_cb,
+                                   cmdfile=self.spool_buffer,
+                                   offline_hardware=self.device_lock.hardware)
+        if self.options.spool:
+            hardware = self.forced_hardware()
+            if hardware is None:
+                device = pool.device(self.options.device)
+                if device.hardware is None:
+                    with device.lock:
+                        device.open(log=self.log)
+                hardware = device.hardware
+            if hardware is None:
+                raise ValueError("No device to compile the job for, use --force_hardware")
+            self.spool_buffer = io.BytesIO()
+            return SilhouetteCameo(log=self.log, progress_cb=progress_cb,
+                                   cmdfile=self.spool_buffer,
+                                   offline_hardware=hardware)
+        if pool is None:
+            return SilhouetteCameo(log=self.log, progress_cb=progress_cb,
+                                   cmdfile=cmdfile,
+                                   inc_queries=self.options.inc_queries,
+                                   dry_run=self.options.dry_run,
+                                   force_hardware=self.options.force_hardware,
+                                   address=self.options.device)
+        device = pool.device(self.options.device)
+        device.lock.acquire()
+        self.device = self.last_device = device
+        device.last_setup = None    # we set up the device our way.
+        return device.open(log=self.log, progress_cb=progress_cb,
+                           cmdfile=cmdfile,
+                           inc_queries=self.options.inc_queries,
+                           dry_run=self.options.dry_run,
+                           force_hardware=self.options.force_hardware)
+
+
+    def prepare_device(self, progress_cb, cmdfile):
+        """Open the device, query it and set it up. Runs in device_thread.
+           device_found is set when the device is open, or failed to open.
+        """
+        try:
+            self.dev = self.open_device(progress_cb, cmdfile)
+            state = self.dev.status()    # hint at loading paper, if not ready.
+            self.report("status=%s" % (state), 'log')
+            self.report("device version: '%s'" % self.dev.get_version(), 'log')
+        except Exception as e:
+            self.dev = None
+            self.device_error = e
+            return
+        finally:
+            self.device_found.set()
+        try:
+            self.dev.setup(media=int(self.options.media, 10),
+                    pen=self.pen,
+                    toolholder=self.options.toolholder,
+                    cuttingmat=self.options.cuttingmat,
+                    sharpencorners=self.options.sharpencorners,
+                    sharpencorners_start=self.options.sharpencorners_start,
+                    sharpencorners_end=self.options.sharpencorners_end,
+                    autoblade=self.autoblade,
+                    depth=self.options.depth,
+                    sw_clipping=self.options.sw_clipping,
+                    bladediameter=self.options.bladediameter,
+                    pressure=self.options.pressure,
+                    speed=self.options.speed)
+            if self.options.spool:
+                self.setup_len = self.spool_buffer.tell()
+        except Exception as e:
+            self.device_error = e
+
+
+    def spool_job(self, dev, bbox, setup_len, command_file):
+        """Queue the commands compiled into spool_buffer, for devices like dev
+           that fit bbox, the result of dev.plot().
+        """
+        data = self.spool_buffer.getvalue()
+        if command_file:
+            command_file.write(data)
+            command_file.close()
+        name = os.path.basename(self.options.input_file) if isinstance(self.options.input_file, str) else ""
+        name = self.document.getroot().get(addNS("docname", "sodipodi"), name)
+        requires = dict(model=dev.hardware["name"],
+                        width_mm=bbox["bbox"]["urx"]*bbox["unit"],
+                        media=self.options.media, tool=self.options.tool)
+        if self.options.device:
+            requires["address"] = self.options.device
+        id = SendtoSilhouette.spooler.add(data[:setup_len], data[setup_len:],
+                priority=self.options.spool_priority, name=name,
+                hold=self.options.spool_hold, requires=requires)
+        self.report("spooled as job %d%s" % (id, ", held" if self.options.spool_hold else ""), 'error')
+
+
     def effect(self):
         if self.options.version:
             print(__version__)
@@ -1033,18 +1307,43 @@ class SendtoSilhouette(EffectExtension):
             mode = "ab" if self.options.append_logs else "wb"
             command_file = open(self.options.cmdfile, mode)
 
-        try:
-            dev = SilhouetteCameo(log=self.log, progress_cb=write_progress,
-                                  cmdfile=command_file,
-                                  inc_queries=self.options.inc_queries,
-                                  dry_run=self.options.dry_run,
-                                  force_hardware=self.options.force_hardware)
-        except Exception as e:
-            self.report(e, 'error')
-            return
-        state = dev.status()    # hint at loading paper, if not ready.
-        self.report("status=%s" % (state), 'log')
-        self.report("device version: '%s'" % dev.get_version(), 'log')
+        if self.options.spool:
+            if SendtoSilhouette.spooler is None:
+                self.report("Spooling needs the service, start it with 'sendto_silhouette.py --serve'", 'error')
+                return
+            if self.options.regmark:
+                self.report("Jobs with registration marks cannot be spooled, the device must search them", 'error')
+                return
+
+        if self.options.toolholder is not None:
+            self.options.toolholder = int(self.options.toolholder)
+        self.pen=None
+        self.autoblade=False
+        if self.options.tool == "pen":
+            self.pen=True
+        if self.options.tool == "cut":
+            self.pen=False
+        if self.options.tool == "autoblade":
+            self.pen=False
+            self.autoblade=True
+        if self.options.pressure == 0:
+            self.options.pressure = None
+        if self.options.speed == 0:
+            self.options.speed = None
+        if self.options.depth == -1:
+            self.options.depth = None
+        if not self.options.device:
+            self.options.device = None
+
+        if SendtoSilhouette.pool is None and not self.options.dry_run:
+            self.lock_device()
+
+        # The device is found and set up in the background, while we
+        # process the drawing and the preview is shown.
+        self.device_found = threading.Event()
+        self.device_thread = threading.Thread(target=self.prepare_device,
+                args=(write_progress, command_file), name="device", daemon=True)
+        self.device_thread.start()
 
         # Viewbox handling
         self.handleViewBox()
@@ -1061,127 +1360,124 @@ class SendtoSilhouette(EffectExtension):
             # Traverse the entire document
             self.recursivelyTraverseSvg(self.document.getroot())
 
-        if self.options.toolholder is not None:
-            self.options.toolholder = int(self.options.toolholder)
-        self.pen=None
-        self.autoblade=False
-        if self.options.tool == "pen":
-            self.pen=True
-        if self.options.tool == "cut":
-            self.pen=False
-        if self.options.tool == "autoblade":
-            self.pen=False
-            self.autoblade=True
+        store = PathStore.from_paths(self.paths)
+        if self.options.mirror:
+            store.mirror()
+        if self.options.flip:
+            store.flip()
+        if self.options.rotate % 360:
+            store.rotate(self.options.rotate)
+        if self.options.scale != 1.0:
+            store.scale(self.options.scale)
 
         if self.options.orient_paths != "natural":
-            index = dict(x=0,y=1)[self.options.orient_paths[-1]]
-            ordered = dict(des=operator.gt, asc=operator.lt)[self.options.orient_paths[0:3]]
-            oldpaths = self.paths
-            self.paths = []
-            oldpaths.reverse() # Since popping from old and appending to new will
-                               # itself reverse
-            while oldpaths:
-                curpath = oldpaths.pop()
-                if ordered(curpath[0][index], curpath[-1][index]):
-                    curpath.reverse()
-                newpath = [curpath.pop()]
-                while curpath:
-                    if ordered(newpath[-1][index],curpath[-1][index]):
-                        newpath.append(curpath.pop())
-                    else:
-                        if len(newpath) == 1:
-                            # Have to make some progress:
-                            newpath = [curpath[-1], newpath[0]]
-                            # Don't leave behind an orphan
-                            if len(curpath) == 1:
-                                curpath = []
-                        else:
-                            # Have to put end of newpath back onto curpath to
-                            # keep the segment between it and rest of curpath:
-                            curpath.append(newpath[-1])
-                        break # stop collecting an ordered segment of curpath
-                if curpath: # Some of curpath is left because it was out of order
-                    oldpaths.append(curpath)
-                self.paths.append(newpath)
+            axis = dict(x=0, y=1)[self.options.orient_paths[-1]]
+            store = store.orient(axis, descending=self.options.orient_paths.startswith("des"))
 
         # scale all points to unit mm
-        for path in self.paths:
-            for i, pt in enumerate(path):
-                path[i] = (px2mm(pt[0]), px2mm(pt[1]))
-
-        if self.options.strategy == "matfree":
-            mf = MatFree("default", scale=1.0, pen=self.pen)
+        store.xy = px2mm(store.xy)
+
+        if self.options.weld_paths:
+            welded = store.weld(self.options.weld_tolerance,
+                    reversible=(self.options.orient_paths == "natural" and
+                                self.options.strategy != "mintravelfwd"))
+            self.report("weld_paths: %d paths joined into %d" % (len(store), len(welded)), 'log')
+            store = welded
+
+        if self.options.simplify > 0.0:
+            simplified = store.simplify(self.options.simplify,
+                    sharp_fwd_ratio=matfree_presets['default']['sharp_turn_fwd_ratio'])
+            self.report("simplify: %d points reduced to %d" % (
+                    store.point_count(), simplified.point_count()), 'log')
+            store = simplified
+
+        if self.options.dedup_edges:
+            deduped = store.dedup_edges()
+            self.report("dedup_edges: %.1fmm of %.1fmm were cut twice" % (
+                    store.length() - deduped.length(), store.length()), 'log')
+            store = deduped
+
+        motion = None
+        if self.options.travel_cost == "time" or self.options.estimate or self.options.strategy == "auto":
+            self.device_found.wait()
+            motion = MotionModel.for_device(self.dev.product_id() if self.dev else None,
+                    speed=self.options.speed, media=int(self.options.media, 10))
+        metric = motion if self.options.travel_cost == "time" else None
+
+        strategy = self.options.strategy
+        if strategy != "zorder":
+            self.paths = store.to_paths()   # the strategies work on lists of paths.
+        parents = None
+        if self.options.inner_first and (strategy.startswith("mintravel") or strategy == "auto"):
+            parents = silhouette.StrategyMinTraveling.containment(self.paths, self.is_closed_path)
+            self.report("inner_first: %d of %d paths lie inside others" % (
+                    len(parents) - parents.count(None), len(parents)), 'log')
+        if strategy == "auto":
+            strategy, self.paths, scores = silhouette.StrategyAuto.race(self.paths, motion,
+                    timeout=self.options.auto_timeout, pen=self.pen, metric=metric,
+                    log=lambda msg: self.report(msg, 'log'),
+                    preset=self.options.matfree_preset, parents=parents,
+                    start_method=self.start_method())
+            for s in sorted(scores, key=scores.get):
+                self.report("auto: %-14s %8.1fs" % (s, scores[s]), 'log')
+            self.report("auto: using strategy %s" % strategy, 'log')
+        elif strategy == "matfree":
+            mf = MatFree(self.options.matfree_preset, scale=1.0, pen=self.pen)
             mf.verbose = 0    # inkscape crashes whenever something appears in stdout.
+            mf.processes = self.options.matfree_processes
+            mf.start_method = self.start_method()
             self.paths = mf.apply(self.paths)
-        elif self.options.strategy == "mintravel":
-            self.paths = silhouette.StrategyMinTraveling.sort(self.paths)
-        elif self.options.strategy == "mintravelfull":
-            self.paths = silhouette.StrategyMinTraveling.sort(self.paths, entrycircular=True)
-        elif self.options.strategy == "mintravelfwd":
-            self.paths = silhouette.StrategyMinTraveling.sort(self.paths, entrycircular=True, reversible=False)
-        # in case of zorder do no reorder
-
-        if self.paths and self.options.fuse_paths:
-            rest_paths = self.paths[1:]
-            self.paths = [self.paths[0]]
-            for path in rest_paths:
-                if path[0] == self.paths[-1][-1]:
-                    self.paths[-1].extend(path[1:])
-                else:
-                    self.paths.append(path)
-
-        cut = []
-        pointcount = 0
-        for mm_path in self.paths:
-            pointcount += len(mm_path)
-
-            multipath = []
-            multipath.extend(mm_path)
-
-            for i in range(1, self.options.multipass):
-                # if reverse continue path without lifting, instead turn with rotating knife
-                if (self.options.reversetoggle):
-                    mm_path = list(reversed(mm_path))
-                    multipath.extend(mm_path[1:])
-                # if closed path (end = start) continue path without lifting
-                elif self.is_closed_path(mm_path):
-                    multipath.extend(mm_path[1:])
-                # else start a new path
-                else:
-                    cut.append(mm_path)
-
-            # on a closed path some overlapping doesn't harm, limited to a maximum of one additional round
-            overcut = self.options.overcut
-            if (overcut > 0) and self.is_closed_path(mm_path):
-                precut = overcut
-                pfrom = mm_path[-1]
-                for pprev in reversed(mm_path[:-1]):
-                    dx = pprev[0] - pfrom[0]
-                    dy = pprev[1] - pfrom[1]
-                    dist = math.sqrt(dx*dx + dy*dy)
-                    if (precut > dist):  # Full segment needed
-                        precut -= dist
-                        multipath.insert(0, pprev)
-                        pfrom = pprev
-                    else:                # only partial segement needed, create new endpoint
-                        pprev = (pfrom[0]+dx*(precut/dist), pfrom[1]+dy*(precut/dist))
-                        multipath.insert(0, pprev)
-                        break
-                pfrom = mm_path[0]
-                for pnext in mm_path[1:]:
-                    dx = pnext[0] - pfrom[0]
-                    dy = pnext[1] - pfrom[1]
-                    dist = math.sqrt(dx*dx + dy*dy)
-                    if (overcut > dist):  # Full segment needed
-                            overcut -= dist
-                            multipath.append(pnext)
-                            pfrom = pnext
-                    else:                 # only partial segement needed, create new endpoint
-                            pnext = (pfrom[0]+dx*(overcut/dist), pfrom[1]+dy*(overcut/dist))
-                            multipath.append(pnext)
-                            break
-
-            cut.append(multipath)
+        elif strategy == "euler":
+            mf = MatFree("euler", scale=1.0, pen=self.pen)
+            mf.verbose = 0
+            self.paths = silhouette.StrategyMinTraveling.sort(mf.apply(self.paths), metric=metric)
+        elif strategy == "mintravel":
+            self.paths = silhouette.StrategyMinTraveling.sort(self.paths, metric=metric, parents=parents)
+        elif strategy == "mintravelfull":
+            self.paths = silhouette.StrategyMinTraveling.sort(self.paths, entrycircular=True, metric=metric, parents=parents)
+        elif strategy == "mintravelfwd":
+            self.paths = silhouette.StrategyMinTraveling.sort(self.paths, entrycircular=True, reversible=False,
+                    metric=metric, parents=parents)
+
+        if strategy.startswith("mintravel") and self.options.optimize_time > 0 and parents is not None:
+            # improve() does not know about the containment order.
+            self.report("optimize: skipped, it would break the inner_first order", 'log')
+        elif strategy.startswith("mintravel") and self.options.optimize_time > 0:
+            before = silhouette.StrategyMinTraveling.travel(self.paths)
+            self.paths = silhouette.StrategyMinTraveling.improve(self.paths,
+                    reversible=(strategy != "mintravelfwd"),
+                    timeout=self.options.optimize_time, metric=metric)
+            after = silhouette.StrategyMinTraveling.travel(self.paths)
+            self.report("optimize: travel %.1fmm reduced to %.1fmm" % (before, after), 'log')
+        if self.options.strategy != "zorder":
+            store = PathStore.from_paths(self.paths)
+
+        if self.options.fuse_paths:
+            store = store.fuse(max(self.options.weld_tolerance, 0.0))
+
+        if self.options.check_overlaps:
+            segments, where = path_segments(store)
+            crossings, overlaps = find_intersections(segments)
+            twice = sum(math.dist(a, b) for i, j, a, b in overlaps)
+            self.report("check_overlaps: %d crossings, %d overlaps, %.1fmm cut twice" % (
+                    len(crossings), len(overlaps), twice), 'log')
+            for x, y, i, j in crossings[:20]:
+                self.report("check_overlaps: path %d crosses path %d at (%.2f, %.2f)" % (
+                        where[i][0], where[j][0], x, y), 'log')
+
+        pointcount = store.point_count()
+        closed = store.closed(0.01)    # as is_closed_path()
+        store = store.multipass(self.options.multipass, self.options.reversetoggle,
+                self.options.overcut, closed)
+
+        if self.options.estimate:
+            est = motion.estimate(store)
+            self.report("estimate: cut %.1fmm, travel %.1fmm, %d lifts, %d:%02d min" % (
+                    est['cut_length'], est['travel_length'], est['lifts'],
+                    est['duration'] // 60, est['duration'] % 60), 'log')
+
+        # the device, the preview and the dump take lists of paths.
+        cut = store.to_paths()
 
         if self.options.dump_paths:
             docname=None
@@ -1204,25 +1500,13 @@ class SendtoSilhouette(EffectExtension):
                 self.report("Cut canceled via preview button.", 'log')
                 return False
 
-        if self.options.pressure == 0:
-            self.options.pressure = None
-        if self.options.speed == 0:
-            self.options.speed = None
-        if self.options.depth == -1:
-            self.options.depth = None
-        dev.setup(media=int(self.options.media, 10),
-                pen=self.pen,
-                toolholder=self.options.toolholder,
-                cuttingmat=self.options.cuttingmat,
-                sharpencorners=self.options.sharpencorners,
-                sharpencorners_start=self.options.sharpencorners_start,
-                sharpencorners_end=self.options.sharpencorners_end,
-                autoblade=self.autoblade,
-                depth=self.options.depth,
-                sw_clipping=self.options.sw_clipping,
-                bladediameter=self.options.bladediameter,
-                pressure=self.options.pressure,
-                speed=self.options.speed)
+        self.device_thread.join()
+        if self.device_error is not None:
+            if self.dev is None:
+                self.report(self.device_error, 'error')
+                return
+            raise self.device_error
+        dev = self.dev
 
         if self.options.autocrop:
             # this takes much longer, if we have a complext drawing
@@ -1261,6 +1545,15 @@ class SendtoSilhouette(EffectExtension):
             reglength=self.options.reglength,
             regoriginx=self.options.regoriginx,
             regoriginy=self.options.regoriginy)
+        if self.options.spool and len(bbox["bbox"].keys()):
+            self.spool_job(dev, bbox, self.setup_len, command_file)
+            return
+        if self.pipelined:
+            try:
+                dev = self.transmit(write_progress, command_file)
+            except ValueError as e:
+                self.report(e, 'error')
+                return
         if len(bbox["bbox"].keys()) == 0:
             self.report("empty page?", 'error')
         else:
@@ -1299,7 +1592,69 @@ class SendtoSilhouette(EffectExtension):
         self.report("\nstatus=%s" % (state), 'log')
 
 
+def run_on_pool(argv, output, stderr=None):
+    """Run one job on the devices of SendtoSilhouette.pool, which stay open
+       for the next job. A job that fails closes its device, the next job
+       opens it again.
+    """
+    e = SendtoSilhouette()
+    if stderr is not None:
+        e.stderr = stderr
+    try:
+        e.run(argv, output=output)
+    except SystemExit as err:
+        if err.code and e.last_device is not None:
+            e.last_device.close()
+        raise
+    except BaseException:
+        if e.last_device is not None:
+            e.last_device.close()
+        raise
+
+
+def run_job(argv, document, stdout, stderr):
+    """Run one job in the service, see silhouette.Service."""
+    tmpfile = NamedTemporaryFile(suffix=".svg", prefix="inkscape-silhouette", delete=False)
+    try:
+        tmpfile.write(document)
+        tmpfile.close()
+        run_on_pool(argv + [tmpfile.name], stdout, stderr)
+        return 0
+    finally:
+        os.remove(tmpfile.name)
+
+
+def serve(path=None):
+    """Stay running and take jobs from thin clients, until interrupted.
+       Jobs sent with --spool are queued, see silhouette/Spooler.py.
+    """
+    from silhouette.DevicePool import DevicePool
+    from silhouette.Service import Service
+    from silhouette.Spooler import Spooler
+    service = Service(run_job, path)
+    SendtoSilhouette.pool = DevicePool.find()
+    spooler = Spooler(pool=SendtoSilhouette.pool)
+    SendtoSilhouette.spooler = spooler
+    spooler.start()
+    print("sendto_silhouette %s: serving at %s, spool in %s, devices: %s" % (
+        __version__, service.server_address, spooler.path,
+        " ".join(dev.label() for dev in SendtoSilhouette.pool.devices)), file=sys.stderr)
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.server_close()
+        spooler.stop()
+
+
 if __name__ == "__main__":
+    if "--serve" in sys.argv[1:]:
+        # sendto_silhouette.py --serve [socket path]
+        args = [a for a in sys.argv[1:] if a != "--serve"]
+        serve(args[0] if args else None)
+        sys.exit(0)
+
     e = SendtoSilhouette()
 
     if any((len(sys.argv) < 2, "--version" in sys.argv, "-V" in sys.argv)):
@@ -0,0 +1,94 @@
+# (c) 2026 inkscape-silhouette contributors
+#
+# DeviceLock.py -- one run at a time on a device, across processes.
+#
+# Two runs of sendto_silhouette sending to the same cutter at once would mix
+# their commands. A DeviceLock is a lock file per device, locked with flock()
+# (or msvcrt.locking() on windows), so the operating system releases it when
+# a run ends in whatever way. A run that finds the device locked does not
+# wait idly: it compiles its job into a byte stream meanwhile, and only waits
+# for the lock to send it.
+
+import os
+import re
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+    import time
+
+from silhouette.Graphtec import find_devices
+
+
+def runtime_dir():
+    """Where sockets and lock files go: $XDG_RUNTIME_DIR, if there is one."""
+    run_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if run_dir and os.path.isdir(run_dir):
+        return run_dir
+    return tempfile.gettempdir()
+
+
+class DeviceLock:
+    def __init__(self, address=None, hardware=None):
+        """The lock of the device at address, None for the first device.
+           hardware is the DEVICE entry of the device, if known.
+        """
+        self.address = address
+        self.hardware = hardware
+        name = re.sub(r"[^\w.-]", "_", address or "default")
+        uid = os.getuid() if hasattr(os, "getuid") else 0
+        self.path = os.path.join(runtime_dir(), "inkscape-silhouette-%d-%s.lock" % (uid, name))
+        self.file = None
+
+    @classmethod
+    def find(cls, address=None):
+        """The lock of the attached device with that address or serial number,
+           default the first one. Also tells the hardware of the device.
+        """
+        for found in find_devices():
+            if address is None or address in (found["address"], found["serial"]):
+                return cls(found["address"], found["hardware"])
+        return cls(address)
+
+    def acquire(self, blocking=True):
+        """Returns True when locked, False if not blocking and the lock is taken."""
+        if self.file is not None:
+            return True
+        f = open(self.path, "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            else:
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        if not blocking:
+                            raise
+                        time.sleep(0.2)
+        except OSError:
+            f.close()
+            return False
+        self.file = f
+        return True
+
+    def release(self):
+        if self.file is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        else:
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
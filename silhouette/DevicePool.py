@@ -0,0 +1,193 @@
+# (c) 2026 inkscape-silhouette contributors
+#
+# DevicePool.py -- several cutters side by side.
+#
+# SilhouetteCameo() opens the first device it finds. A DevicePool knows all
+# attached Graphtec devices, by the usb port they are plugged into or their
+# serial number, and hands out idle ones that fit a job: wide enough, and
+# with the media and tool loaded that the job asks for. What is loaded cannot
+# be asked from most devices, so it comes from a configuration file, a JSON
+# object that maps addresses or serial numbers to {"media": ..., "tool": ...}
+# ($XDG_CONFIG_HOME/inkscape-silhouette/pool.json). Unknown values fit any job.
+#
+# Each device stays open between jobs. The spooler runs one thread per device
+# of the pool, run_all() fans a list of jobs, like the sheets of a bigger job,
+# out over all fitting devices.
+#
+#   python3 -m silhouette.DevicePool    lists the devices.
+
+import json
+import os
+import sys
+import threading
+
+from silhouette.Graphtec import SilhouetteCameo, find_devices
+
+
+def config_file():
+    config_home = os.environ.get("XDG_CONFIG_HOME") or os.path.join(os.path.expanduser("~"), ".config")
+    return os.path.join(config_home, "inkscape-silhouette", "pool.json")
+
+
+class PoolDevice:
+    def __init__(self, address=None, hardware=None, serial=None, media=None, tool=None):
+        """One cutter of the pool. address None is the first device found."""
+        self.address = address
+        self.hardware = hardware
+        self.serial = serial
+        self.media = media
+        self.tool = tool
+        self.lock = threading.Lock()    # held while a job uses the device
+        self.last_setup = None          # the setup the spooler sent last
+        self.cameo = None
+        self.key = None
+
+    def label(self):
+        return self.address or "default"
+
+    def matches(self, requires):
+        """True if the device fits a job that requires the given values of
+           'address' (or serial), 'model' (the hardware name), 'width_mm',
+           'media' and 'tool'.
+        """
+        if requires.get("address") and requires["address"] not in (self.address, self.serial):
+            return False
+        if requires.get("model") and self.hardware and requires["model"] != self.hardware["name"]:
+            return False
+        width = self.hardware.get("width_mm") if self.hardware else None
+        if width and requires.get("width_mm", 0.0) > width:
+            return False
+        for key in ("media", "tool"):
+            want = requires.get(key)
+            have = getattr(self, key)
+            if want is not None and have is not None and str(want) != str(have):
+                return False
+        return True
+
+    def progress(self, progress_cb):
+        """progress_cb for this device: the same, with the device in the message."""
+        if progress_cb is None:
+            return None
+        return lambda done, total, msg: progress_cb(done, total, "[%s] %s" % (self.label(), msg))
+
+    def open(self, log=sys.stderr, progress_cb=None, cmdfile=None, inc_queries=False,
+             dry_run=False, force_hardware=None):
+        """The SilhouetteCameo for this device, still open from the last job if
+           possible. The parameters are those of SilhouetteCameo(). Call with
+           the lock held.
+        """
+        dev = self.cameo
+        if dev is not None and dev.dev is not None and self.key == force_hardware:
+            dev.attach(log=log, progress_cb=progress_cb, cmdfile=cmdfile,
+                       inc_queries=inc_queries, dry_run=dry_run)
+            return dev
+        self.cameo = None
+        dev = SilhouetteCameo(log=log, progress_cb=progress_cb, cmdfile=cmdfile,
+                              inc_queries=inc_queries, dry_run=dry_run,
+                              force_hardware=force_hardware, address=self.address)
+        self.cameo = dev
+        self.key = force_hardware
+        if self.hardware is None and dev.dev is not None:
+            self.hardware = dev.hardware
+        return dev
+
+    def close(self):
+        """Open the device again for the next job, e.g. after an error."""
+        self.cameo = None
+
+
+class DevicePool:
+    def __init__(self, devices):
+        self.devices = devices
+        self.changed = threading.Condition()
+
+    @classmethod
+    def find(cls, loaded=None):
+        """A pool of all attached devices. loaded maps addresses or serial
+           numbers to dicts with the loaded 'media' and 'tool', default from
+           config_file(). Without any device found, the pool has one device
+           that stands for the first device plugged in later, as before.
+        """
+        if loaded is None:
+            loaded = {}
+            if os.path.exists(config_file()):
+                with open(config_file()) as f:
+                    loaded = json.load(f)
+        devices = []
+        for found in find_devices():
+            conf = loaded.get(found["address"]) or loaded.get(found["serial"]) or {}
+            devices.append(PoolDevice(found["address"], found["hardware"], found["serial"],
+                                      media=conf.get("media"), tool=conf.get("tool")))
+        if not devices:
+            devices.append(PoolDevice())
+        return cls(devices)
+
+    def device(self, address=None):
+        """The device with that address or serial number, default the first one."""
+        if address is None:
+            return self.devices[0]
+        for dev in self.devices:
+            if address in (dev.address, dev.serial):
+                return dev
+        raise ValueError("No device %s in the pool: %s" % (
+            address, " ".join(dev.label() for dev in self.devices)))
+
+    def acquire(self, requires=None, timeout=None):
+        """Wait for an idle device that matches requires, see PoolDevice.matches().
+           Returns it with its lock held, None after timeout seconds.
+        """
+        fitting = [dev for dev in self.devices if dev.matches(requires or {})]
+        if not fitting:
+            raise ValueError("No device in the pool fits %s" % (requires,))
+        with self.changed:
+            while True:
+                for dev in fitting:
+                    if dev.lock.acquire(blocking=False):
+                        return dev
+                if not self.changed.wait(timeout if timeout is not None else 1.0) and timeout is not None:
+                    return None
+
+    def release(self, dev):
+        dev.lock.release()
+        with self.changed:
+            self.changed.notify_all()
+
+    def run_all(self, jobs, progress_cb=None):
+        """Run jobs, a list of (requires, run) pairs, on as many devices at
+           once as fit. run(dev, progress_cb) gets a PoolDevice with its lock
+           held and a progress_cb for it. Returns the results of run, in order.
+           If any job raised, the first exception is raised when all are done.
+        """
+        results = [None]*len(jobs)
+        errors = [None]*len(jobs)
+
+        def work(i, requires, run):
+            try:
+                dev = self.acquire(requires)
+                try:
+                    results[i] = run(dev, dev.progress(progress_cb))
+                finally:
+                    self.release(dev)
+            except Exception as e:
+                errors[i] = e
+
+        threads = [threading.Thread(target=work, args=(i, requires, run))
+                   for i, (requires, run) in enumerate(jobs)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for e in errors:
+            if e is not None:
+                raise e
+        return results
+
+
+def main():
+    for found in find_devices():
+        print("%-12s %-24s serial %s" % (found["address"], found["hardware"]["name"], found["serial"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
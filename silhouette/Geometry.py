@@ -3,11 +3,69 @@
 # Geometry.py -- collection of geometric functions.
 # Split from silhouette/Strategy.py
 #
+# Most functions come twice: the plain one takes XY_a points (anything with
+# .x and .y), the _batch one takes (N,2) arrays of points, or single points
+# that broadcast against them, and returns arrays. Both call the same kernel
+# on the coordinates, which works on floats and numpy arrays alike, so the
+# results and the _eps tolerances are the same. The intersections branch a lot,
+# they have a scalar and an array kernel that follow each other line by line.
+#
+
+import bisect
+
+import numpy as np
 
 # minimum difference for geometric values to be considered equal.
 _eps = 1e-10
 
 
+def _xy(P):
+  """x and y coordinates of an (N,2) array of points, or of a single point."""
+  P = np.asarray(P, dtype=float)
+  return P[...,0], P[...,1]
+
+
+def _dist_sq(ax,ay, bx,by):
+  dx = bx-ax
+  dy = by-ay
+  return dx*dx + dy*dy
+
+
+def _ccw(ax,ay, bx,by, cx,cy):
+  return (cy-ay)*(bx-ax) > (by-ay)*(cx-ax)
+
+
+def _colinear(ax,ay, bx,by, cx,cy):
+  return abs((cy-ay)*(bx-ax) - (by-ay)*(cx-ax)) < _eps
+
+
+def _sharp_turn_90(ax,ay, bx,by, cx,cy):
+  dx = bx-ax
+  dy = by-ay
+  dx_, dy_ = bx-dy, by+dx           # D, BD is now the normal to AB
+  return _ccw(ax,ay, bx,by, dx_,dy_) == _ccw(cx,cy, bx,by, dx_,dy_)
+
+
+def _sharp_turn(ax,ay, bx,by, cx,cy, fwd_ratio):
+  dx = bx-ax
+  dy = by-ay
+  ccw_abc = _ccw(ax,ay, bx,by, cx,cy)
+  ## side +1: D = (B.x-dy, B.y+dx), the normal to AB ...
+  ## side -1: D = (B.x+dy, B.y-dx), ... and C, D are on the same side of AB
+  side = 2*ccw_abc - 1
+  fx = bx+fwd_ratio*dx+1*(-dy*side)
+  fy = by+fwd_ratio*dy+1*(dx*side)
+  return _ccw(bx,by, fx,fy, cx,cy) == ccw_abc
+
+
+def _segment_dist_sq(px,py, ax,ay, bx,by):
+  dx = bx-ax
+  dy = by-ay
+  ## t is the position of the foot of P on AB, clipped to the segment.
+  t = np.clip(((px-ax)*dx + (py-ay)*dy) / np.maximum(dx*dx + dy*dy, _eps), 0.0, 1.0)
+  return _dist_sq(px,py, ax+t*dx, ay+t*dy)
+
+
 def dist_sq(A,B):
   """
   Pythagorean distance formula WITHOUT the square root.  Since
@@ -15,9 +73,38 @@ def dist_sq(A,B):
   fudge factor, we can just square the fudge factor once and run
   with it rather than compute square roots over and over.
   """
-  dx = B.x-A.x
-  dy = B.y-A.y
-  return dx*dx + dy*dy
+  return _dist_sq(A.x,A.y, B.x,B.y)
+
+
+def dist_sq_batch(A,B):
+  """Array version of dist_sq()."""
+  return _dist_sq(*_xy(A), *_xy(B))
+
+
+def pairwise_dist_sq(P,Q):
+  """dist_sq() between all points of P and all points of Q,
+     as a (len(P), len(Q)) array.
+  """
+  px, py = _xy(P)
+  qx, qy = _xy(Q)
+  return _dist_sq(px[:,None],py[:,None], qx[None,:],qy[None,:])
+
+
+def segment_dist_sq(P,A,B):
+  """Squared distance from point P to the nearest point of segment [AB]."""
+  return float(_segment_dist_sq(P.x,P.y, A.x,A.y, B.x,B.y))
+
+
+def segment_dist_sq_batch(P,A,B):
+  """Array version of segment_dist_sq()."""
+  return _segment_dist_sq(*_xy(P), *_xy(A), *_xy(B))
+
+
+def polyline_length(P):
+  """Length of the polyline through the points P, an (N,2) array or a list of points."""
+  P = np.asarray(P, dtype=float).reshape(-1, 2)
+  d = np.diff(P, axis=0)
+  return float(np.sum(np.hypot(d[:,0], d[:,1])))
 
 
 def ccw(A,B,C):
@@ -29,14 +116,24 @@ def ccw(A,B,C):
   ## From http://www.bryceboe.com/2006/10/23/line-segment-intersection-algorithm/
   ## FIXME: should integrate colinear() into ccw() returning
   ##        None when colinear, True when ccw, False when cw.
-  return (C.y-A.y)*(B.x-A.x) > (B.y-A.y)*(C.x-A.x)
+  return _ccw(A.x,A.y, B.x,B.y, C.x,C.y)
+
+
+def ccw_batch(A,B,C):
+  """Array version of ccw()."""
+  return _ccw(*_xy(A), *_xy(B), *_xy(C))
 
 
 def colinear(A,B,C):
   """True, if three points are on the same line.
   """
   ## FIXME: test this thoroughly and integrate into ccw()
-  return abs((C.y-A.y)*(B.x-A.x) - (B.y-A.y)*(C.x-A.x)) < _eps
+  return _colinear(A.x,A.y, B.x,B.y, C.x,C.y)
+
+
+def colinear_batch(A,B,C):
+  """Array version of colinear()."""
+  return _colinear(*_xy(A), *_xy(B), *_xy(C))
 
 
 def sharp_turn_90(A,B,C):
@@ -51,11 +148,12 @@ def sharp_turn_90(A,B,C):
      This 90 deg algoritm is a simplified (and faster) version of the general case
      sharp_turn() using a fwd_ratio.
   """
-  dx = B.x-A.x
-  dy = B.y-A.y
-  D = XY_a((B.x-dy, B.y+dx))        # BD is now the normal to AB
+  return _sharp_turn_90(A.x,A.y, B.x,B.y, C.x,C.y)
 
-  return ccw(A,B,D) == ccw(C,B,D)
+
+def sharp_turn_90_batch(A,B,C):
+  """Array version of sharp_turn_90()."""
+  return _sharp_turn_90(*_xy(A), *_xy(B), *_xy(C))
 
 
 def sharp_turn_116(A,B,C):
@@ -104,25 +202,74 @@ def sharp_turn(A,B,C,fwd_ratio):
 
   """
   if fwd_ratio == 0.0: return sharp_turn_90(A,B,C)      # short cut.
+  return _sharp_turn(A.x,A.y, B.x,B.y, C.x,C.y, fwd_ratio)
 
-  dx = B.x-A.x
-  dy = B.y-A.y
 
-  dx_be = dx
-  dy_be = dy
+def sharp_turn_batch(A,B,C,fwd_ratio):
+  """Array version of sharp_turn()."""
+  if fwd_ratio == 0.0: return sharp_turn_90_batch(A,B,C)      # short cut.
+  return _sharp_turn(*_xy(A), *_xy(B), *_xy(C), fwd_ratio)
 
-  ccw_abc = ccw(A,B,C)
-  if ccw_abc:
-    # D = (B.x-dy, B.y+dx)        # BD is now the normal to AB ...
-    dx_bd = -dy
-    dy_bd = +dx
-  else:
-    # D = (B.x+dy, B.y-dx)        # ... and C, D are on the same side of AB
-    dx_bd = +dy
-    dy_bd = -dx
-  F = XY_a((B.x+fwd_ratio*dx_be+1*dx_bd, B.y+fwd_ratio*dy_be+1*dy_bd))
 
-  return ccw(B,F,C) == ccw_abc
+def _in_segment(ax,ay, bx,by, x,y):
+  """ simplified segment test,
+      knowing that point (x,y) is colinar to AB.
+
+      We apply tolerance _eps, so that points that are "exactly" on the endpoint
+      are safely included.
+  """
+  if (abs(ax-bx) > _eps):               # AB is not vertial, test x-coordinate
+    if ax <= x+_eps and x-_eps <= bx: return True
+    if ax >= x-_eps and x+_eps >= bx: return True
+  else:                                 # test y-coordinate
+    if ay <= y+_eps and y-_eps <= by: return True
+    if ay >= y-_eps and y+_eps >= by: return True
+  return False                          # No, (x,y) is outside of [AB].
+
+
+def _in_segment_batch(ax,ay, bx,by, x,y):
+  """Array version of _in_segment()."""
+  def within(a, b, v):
+    return ((a <= v+_eps) & (v-_eps <= b)) | ((a >= v-_eps) & (v+_eps >= b))
+  # AB is not vertial: test x-coordinate, else test y-coordinate
+  return np.where(abs(ax-bx) > _eps, within(ax,bx,x), within(ay,by,y))
+
+
+def _intersect_lines_batch(ax,ay, bx,by, cx,cy, dx,dy, limit1, limit2):
+  """Array version of intersect_lines(). Returns x, y, and which: -1 if there is no
+     intersection, 0 or 2 or 3 if A or C or D is returned for colinear
+     segments, 4 if (x, y) was computed.
+  """
+  # from http://community.topcoder.com/tc?module=Static&d1=tutorials&d2=geometry2
+
+  _a1 = by - ay
+  _b1 = ax - bx
+  _c1 = _a1 * ax + _b1 * ay
+
+  _a2 = dy - cy
+  _b2 = cx - dx
+  _c2 = _a2 * cx + _b2 * cy
+
+  det = np.asarray(_a1 * _b2 - _a2 * _b1)
+  parallel = (det < _eps) & (det > -_eps)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    x = (_b2*_c1 - _b1*_c2) / det
+    y = (_a1*_c2 - _a2*_c1) / det
+
+  ok = np.logical_not(parallel)
+  if limit1: ok = ok & _in_segment_batch(ax,ay, bx,by, x,y)
+  if limit2: ok = ok & _in_segment_batch(cx,cy, dx,dy, x,y)
+
+  # the segments may be colinear, with many intersecting points.
+  colinear = parallel & _colinear(ax,ay, bx,by, cx,cy) & _colinear(ax,ay, bx,by, dx,dy)
+  which = np.where(ok, 4,
+          np.where(colinear & _in_segment_batch(ax,ay, bx,by, cx,cy), 2,  # A--C--B--D or A--C--D--B
+          np.where(colinear & _in_segment_batch(ax,ay, bx,by, dx,dy), 3,  # A--D--B--C
+          np.where(colinear & _in_segment_batch(cx,cy, dx,dy, ax,ay), 0,  # C--A--B--D
+                   -1))))                                           # A--B--C--D
+  x = np.select([which == 4, which == 2, which == 3, which == 0], [x, cx, dx, ax], np.nan)
+  y = np.select([which == 4, which == 2, which == 3, which == 0], [y, cy, dy, ay], np.nan)
+  return x, y, which
 
 
 def intersect_lines(A,B,C,D, limit1=False, limit2=False):
@@ -133,23 +280,6 @@ def intersect_lines(A,B,C,D, limit1=False, limit2=False):
      with applying limits -- the intersection point is outside
      a segment.
   """
-
-  def _in_segment(A,B,x,y):
-    """ simplified segment test,
-        knowing that point (x,y) is colinar to AB.
-
-        We apply tolerance _eps, so that points that are "exactly" on the endpoint
-        are safely included.
-    """
-    # print "intersect_lines:_in_segment", A, B, x, y
-    if (abs(A.x-B.x) > _eps):            # AB is not vertial, test x-coordinate
-      if A.x <= x+_eps and x-_eps <= B.x: return True
-      if A.x >= x-_eps and x+_eps >= B.x: return True
-    else:                               # test y-coordinate
-      if A.y <= y+_eps and y-_eps <= B.y: return True
-      if A.y >= y-_eps and y+_eps >= B.y: return True
-    return False                        # No, (x,y) is outside of [AB].
-
   # from http://community.topcoder.com/tc?module=Static&d1=tutorials&d2=geometry2
 
   _a1 = B.y - A.y
@@ -164,19 +294,27 @@ def intersect_lines(A,B,C,D, limit1=False, limit2=False):
   if det < _eps and det > -_eps:
     # the segments may be colinear, with many intersecting points.
     if colinear(A,B,C) and colinear(A,B,D):
-      if _in_segment(A,B,C.x,C.y): return C     # A--C--B--D or A--C--D--B
-      if _in_segment(A,B,D.x,D.y): return D     # A--D--B--C
-      if _in_segment(C,D,A.x,A.y): return A     # C--A--B--D
-      #  _in_segment(C,D,B.x,B.y): return B     # see above: A--C--B--D
-    return None                                 # A--B--C--D
+      if _in_segment(A.x,A.y, B.x,B.y, C.x,C.y): return C     # A--C--B--D or A--C--D--B
+      if _in_segment(A.x,A.y, B.x,B.y, D.x,D.y): return D     # A--D--B--C
+      if _in_segment(C.x,C.y, D.x,D.y, A.x,A.y): return A     # C--A--B--D
+      #  _in_segment(C,D,B.x,B.y): return B                     # see above: A--C--B--D
+    return None                                               # A--B--C--D
   x = (_b2*_c1 - _b1*_c2) / float(det)
   y = (_a1*_c2 - _a2*_c1) / float(det)
 
-  if limit1 and not _in_segment(A,B,x,y): return None
-  if limit2 and not _in_segment(C,D,x,y): return None
+  if limit1 and not _in_segment(A.x,A.y, B.x,B.y, x,y): return None
+  if limit2 and not _in_segment(C.x,C.y, D.x,D.y, x,y): return None
   return (x,y)
 
 
+def intersect_lines_batch(A,B,C,D, limit1=False, limit2=False):
+  """Array version of intersect_lines(). Returns an (N,2) array of the
+     intersection points, rows are nan where intersect_lines() returns None.
+  """
+  x, y, _ = _intersect_lines_batch(*_xy(A), *_xy(B), *_xy(C), *_xy(D), limit1, limit2)
+  return np.stack((x, y), axis=-1)
+
+
 def _intersect_y5(Ax,Ay,Bx,By,y_boundary, limit=False):
   """returns the x coordinate, where the line AB crosses the given y_boundary.
      Returns None, if the line is horizontal or if limit applies,
@@ -199,6 +337,20 @@ def _intersect_y5(Ax,Ay,Bx,By,y_boundary, limit=False):
   return Ax + ratio*(Bx-Ax)
 
 
+def _intersect_y5_batch(Ax,Ay,Bx,By,y_boundary, limit=False):
+  """Array version of _intersect_y5(), with nan instead of None."""
+  dy = np.asarray(By-Ay)
+  horizontal = abs(dy) < _eps
+  with np.errstate(divide='ignore', invalid='ignore'):
+    ratio = (y_boundary-Ay)/dy
+    x = Ax + ratio*(Bx-Ax)
+  if limit:
+    x = np.where((ratio < 0.0) | (ratio > 1.0), np.nan, x)
+  # on a horizontal line, return anything between A,B
+  on_line = np.where(abs(By-y_boundary) < _eps, 0.5*(Ax+Bx), np.nan)
+  return np.where(horizontal, on_line, x)
+
+
 def intersect_x(A,B,x_boundary, limit=False):
   """returns the y coordinate, where the line AB crosses the given x_boundary.
      Returns None, if the line is vertical or if limit applies and
@@ -209,6 +361,13 @@ def intersect_x(A,B,x_boundary, limit=False):
   return _intersect_y5(A.y, A.x, B.y, B.x, x_boundary, limit)
 
 
+def intersect_x_batch(A,B,x_boundary, limit=False):
+  """Array version of intersect_x(), with nan instead of None."""
+  ax, ay = _xy(A)
+  bx, by = _xy(B)
+  return _intersect_y5_batch(ay, ax, by, bx, x_boundary, limit)
+
+
 def intersect_y(A,B,y_boundary, limit=False):
   """returns the x coordinate, where the line AB crosses the given y_boundary.
      Returns None, if the line is horizontal or if limit applies and
@@ -219,6 +378,11 @@ def intersect_y(A,B,y_boundary, limit=False):
   return _intersect_y5(A.x, A.y, B.x, B.y, y_boundary, limit)
 
 
+def intersect_y_batch(A,B,y_boundary, limit=False):
+  """Array version of intersect_y(), with nan instead of None."""
+  return _intersect_y5_batch(*_xy(A), *_xy(B), y_boundary, limit)
+
+
 class XY_Grid_Factory:
   def __init__(self, spacing=0.5):
     self.serial = 0
@@ -276,9 +440,12 @@ class Barrier:
        find(point). All these method return an index into the sorted list
        that can be used in pos(idx) or pslice(idx1, idx2).
        Additional points can be added to an existing barrier with insert(point).
+       The key of each point is computed once, and kept in self.keys, so
+       that find() and insert() can bisect.
     """
     self.key=key
     self.points = sorted(points, key=key)
+    self.keys = [key(p) for p in self.points]
     self.idx = 0
 
   def first(self):
@@ -357,12 +524,23 @@ class Barrier:
        Use lookup() when one particular point is sought, and find()
        could return another point that happens to share the same key() value.
     """
-    ## SPEEDUP:  provide the lambda function to __init__ and build a hash
-    ## that we can lookup by value here. (Would need a rebuild after insert(), but hey).
+    ## Use index() to locate a known point object, that is much faster.
     for i in range(0, len(self.points)):
       if match(self.points[i]): return i
     return None
 
+  def index(self, point):
+    """Returns the index of point, or None if it is not in the barrier.
+       The point is compared by identity, so this finds exactly the object
+       passed to __init__() or insert(), even if other points share its key().
+    """
+    key = self.key(point)
+    i = bisect.bisect_left(self.keys, key)
+    while i < len(self.points) and self.keys[i] == key:
+      if self.points[i] is point: return i
+      i += 1
+    return None
+
   def find(self, targetpoint, backwards=False, start=None, id=None):
     """Advance the barrier so that it cuts through targetpoint. This
        targetpoint need not be amongst the set of points for which the barrier
@@ -373,30 +551,31 @@ class Barrier:
        If the targetpoint is beyond the the end, the barrier remains at the last point.
        Note: 'point(find(target)) == target' may or may not be true.
     """
-    ## SPEEDUP: uses a linear search. Look into bisect, just as with insert().
+    return self.find_key(self.key(targetpoint), backwards, start)
+
+  def find_key(self, key_limit, backwards=False, start=None):
+    """Same as find(), but for a point with the key key_limit."""
     saved_idx = self.idx
     if start is not None: self.idx = start
 
-    key_limit = self.key(targetpoint)
     if backwards == True:
-      for i in reversed(range(0, self.idx+1)):
-        if self.key(self.points[i]) <= key_limit:
-          return self.idx
+      # the keys are sorted: some point up to idx is within, if the first one is.
+      if self.keys[0] <= key_limit:
+        return self.idx
       self.idx = 0
       return self.idx     # stick at first point.
 
-    prev_idx = None
-    for i in range(self.idx, len(self.points)):
-      if self.key(self.points[i]) > key_limit:
-        if prev_idx is None:
-          if start is not None: self.idx = saved_idx
-          return None
-        else:
-          self.idx = prev_idx
-          return self.idx
-      prev_idx = i
-    self.idx = prev_idx
-    return self.idx     # stick at last point.
+    if self.idx >= len(self.points):
+      self.idx = None
+      return self.idx
+
+    # the first point beyond key_limit
+    i = bisect.bisect_right(self.keys, key_limit, lo=self.idx)
+    if i == self.idx:
+      if start is not None: self.idx = saved_idx
+      return None
+    self.idx = i-1
+    return self.idx     # sticks at last point, if all are within.
 
 
   def ahead(self, point):
@@ -405,7 +584,7 @@ class Barrier:
        The point need not belong to self.points . Calling ahead() is faster than
        find() when the exact index position for the point is not needed.
     """
-    return self.key(point) > self.key(self.points[self.idx])
+    return self.key(point) > self.keys[self.idx]
 
   def insert(self, point):
     """Insert a new point into the given barrier, while keeping the sort order.
@@ -414,25 +593,13 @@ class Barrier:
        Otherwise the current barrier position is incremented to refer to the same
        element and True is returned.
     """
-    ## SPEEDUP: A sequential scan is used.
-    ##  * Should use bisect and __cmp__, __lt__, __eq__.
-    ##  * Should call find() for doing all the bisecting.
-    ## http://bugs.python.org/issue4356 asks for adding a key= parameter to bisect,
-    ## one of the reasons says:
-    ##   The lack of key may as well encourage you to continue using linear searches,
-    ##   or other sub-optimal solutions.
-    ## I chose the linear search for simplicity, as I fear hidden complexity while
-    ## tweaking compare functions.
-
-    insert_idx = len(self.points)       # if none is before, let insert become append.
+    ## bisect on the cached keys. Points with the same key go after the existing ones.
     insert_key = self.key(point)
-    for i in range(0,len(self.points)):
-      if self.key(self.points[i]) > insert_key:
-        insert_idx = i
-        break
+    insert_idx = bisect.bisect_right(self.keys, insert_key)
 
     # print "Barrier.insert", point, insert_idx, self.points
     self.points.insert(insert_idx, point)
+    self.keys.insert(insert_idx, insert_key)
     if insert_idx > self.idx:
       return False      # ahead
     self.idx += 1
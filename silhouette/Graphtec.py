@@ -27,6 +27,8 @@ import re
 import sys
 import time
 
+from silhouette.PathStore import PathStore
+
 usb_reset_needed = False  # https://github.com/fablabnbg/inkscape-silhouette/issues/10
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/pyusb-1.0.2')      # have a pyusb fallback
@@ -233,6 +235,43 @@ DEVICE = [
 ]
 
 
+def device_address(dev):
+  """The place of a usb device as 'bus-port.port...', like in /sys/bus/usb/devices.
+     Stays the same while it is plugged into the same port."""
+  try:
+    if dev.port_numbers:
+      return "%d-%s" % (dev.bus, ".".join(str(p) for p in dev.port_numbers))
+    return "%d:%d" % (dev.bus, dev.address)
+  except Exception:
+    return None     # not a pyusb device
+
+
+def find_devices():
+  """All attached Graphtec devices, not only the first one. Returns a list of
+     dicts with 'address' (see device_address()), 'serial' (None if it cannot
+     be read), 'hardware' (the DEVICE entry) and 'usb' (the pyusb device).
+  """
+  found = []
+  try:
+    devs = list(usb.core.find(find_all=True, idVendor=VENDOR_ID_GRAPHTEC))
+  except (usb.core.NoBackendError, AttributeError):
+    return found
+  for dev in devs:
+    hardware = None
+    for hw in DEVICE:
+      if hw['product_id'] == dev.idProduct:
+        hardware = hw
+    if hardware is None:
+      hardware = { 'name': 'Unknown Graphtec device 0x%04x' % dev.idProduct,
+                   'vendor_id': dev.idVendor, 'product_id': dev.idProduct }
+    try:
+      serial = usb.util.get_string(dev, dev.iSerialNumber)
+    except Exception:
+      serial = None     # no permission, or no serial number
+    found.append({ 'address': device_address(dev), 'serial': serial, 'hardware': hardware, 'usb': dev })
+  return found
+
+
 def _bbox_extend(bb, x, y):
     # The coordinate system origin is in the top lefthand corner.
     # Downwards and rightwards we count positive. Just like SVG or HPGL.
@@ -334,7 +373,8 @@ class SilhouetteCameoTool:
 
 class SilhouetteCameo:
   def __init__(self, log=sys.stderr, cmdfile=None, inc_queries=False,
-               dry_run=False, progress_cb=None, force_hardware=None):
+               dry_run=False, progress_cb=None, force_hardware=None, offline_hardware=None,
+               address=None):
     """ This initializer simply finds the first known device.
         The default paper alignment is left hand side for devices with known width
         (currently Cameo and Portrait). Otherwise it is right hand side.
@@ -357,6 +397,13 @@ class SilhouetteCameo:
         int(strokes_done), int(strikes_total), str(status_flags)
         The status_flags contain 't' when there was a (non-fatal) write timeout
         on the device.
+
+        With offline_hardware, one of the DEVICE entries, no device is searched
+        for and nothing is sent. Queries get mock responses. This compiles the
+        commands of a job into cmdfile, to be sent later.
+
+        With address, the device with that address or serial number is used,
+        see find_devices(), instead of the first one found.
     """
     self.leftaligned = False            # True: only works for DEVICE with known hardware.width_mm
     self.log = log
@@ -371,7 +418,18 @@ class SilhouetteCameo:
       print("Dry run specified; no commands will be sent to cutter.",
             file=self.log)
 
-    for hardware in DEVICE:
+    if address is not None and offline_hardware is None:
+      if sys_platform.startswith('darwin'):
+        raise ValueError('Selecting a device by address is not implemented under macosx. Help adding code!')
+      for found in find_devices():
+        if address in (found['address'], found['serial']):
+          dev = found['usb']
+          self.hardware = found['hardware']
+      if dev is None:
+        raise ValueError('No Graphtec Silhouette device at %s.\nDevices: %s' % (
+          address, ' '.join(found['address'] for found in find_devices())))
+
+    for hardware in (DEVICE if dev is None and offline_hardware is None else []):
       try:
         if sys_platform.startswith('win'):
           print("device lookup under windows not tested. Help adding code!", file=self.log)
@@ -388,7 +446,7 @@ class SilhouetteCameo:
         self.hardware = hardware
         break
 
-    if dev is None:
+    if dev is None and offline_hardware is None:
       try:
         if sys_platform.startswith('win'):
           print("device fallback under windows not tested. Help adding code!", file=self.log)
@@ -412,7 +470,9 @@ class SilhouetteCameo:
       except usb.core.NoBackendError:
         dev = None
 
-    if dev is None:
+    if offline_hardware is not None:
+      self.hardware = offline_hardware
+    elif dev is None:
       if dry_run:
         print("No device detected; continuing dry run with dummy device",
               file=self.log)
@@ -493,6 +553,7 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
         break
 
     self.dev = dev
+    self.address = device_address(dev) if dev is not None else None
     self.need_interface = False         # probably never needed, but harmful on some versions of usb.core
     self.regmark = False                # not yet implemented. See robocut/Plotter.cpp:446
     if self.dev is None or 'width_mm' in self.hardware:
@@ -500,11 +561,32 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
     self.enable_sw_clipping = True
     self.clip_fuzz = 0.05
     self.mock_response = None
+    self.version = None                 # firmware version, queried once.
+    self.initialized = False            # initialize() palaver done.
 
   def __del__(self, *args):
     if self.commands:
       self.commands.close()
 
+  def attach(self, log=sys.stderr, cmdfile=None, inc_queries=False,
+             dry_run=False, progress_cb=None):
+    """Reuse this already opened device for another job.
+       The parameters are as for the initializer. A previous command
+       transcript is closed.
+    """
+    if self.commands and self.commands is not cmdfile:
+      self.commands.close()
+    self.log = log
+    self.commands = cmdfile
+    self.inc_queries = inc_queries
+    self.dry_run = dry_run
+    self.progress_cb = progress_cb
+    self.margins_printed = None
+    if self.dry_run:
+      print("Dry run specified; no commands will be sent to cutter.",
+            file=self.log)
+    print("%s still open from the last job" % self.hardware['name'], file=self.log)
+
   # Class data providing mock responses when there is no device:
   mock_responses = {
     CMD_ESC+CMD_ENQ: RESP_READY+CMD_ETX,
@@ -622,10 +704,32 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
       candidate = data[so:so+safechunksz]
       # strip string candidate of unfinished command at its end
       safechunk = candidate[0:(candidate.rfind(CMD_ETX) + 1)]
+      if not safechunk:
+        # no complete command in the chunk, send it as it is rather than loop
+        safechunk = candidate
       self.write(data = safechunk, is_query = False)
       self.wait_for_ready(timeout=120, poll_interval=0.05)
       so += len(safechunk)
 
+  def replay(self, data):
+    """
+        Send a command stream recorded from an offline device (see cmdfile),
+        with the same care as a direct run: escapes as they are, like
+        send_escape(), commands through safe_write().
+    """
+
+    data = to_bytes(data)
+    so = 0
+    while so < len(data):
+      esc = data.find(CMD_ESC, so)
+      if esc < 0:
+        esc = len(data)
+      if esc > so:
+        self.safe_write(data[so:esc])
+      if esc < len(data):
+        self.write(data[esc:esc+2])
+      so = esc + 2
+
   def send_command(self, cmd, is_query = False, timeout=10000):
     """ Sends a command or a list of commands """
     self.write(delimit_commands(cmd), is_query=is_query, timeout=timeout)
@@ -753,7 +857,10 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
     except Exception as e:
       raise ValueError("Write Exception: %s, %s errno=%s\n\nFailed to write the first 3 bytes. Permissions? inf-wizard?" % (type(e), e, e.errno))
 
-    # Initial palaver
+    # Initial palaver, once. A device kept open for the next job skips it.
+    if self.initialized:
+      return
+    self.initialized = True
     print("Device Version: '%s'" % self.get_version(), file=self.log)
 
     # Additional commands seen in init by Silhouette Studio
@@ -808,7 +915,9 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
 
   def get_version(self):
     """Retrieve the firmware version string from the device."""
-    return self.send_receive_command(QUERY_FIRMWARE_VERSION, rx_timeout = 10000)
+    if self.version is None:
+      self.version = self.send_receive_command(QUERY_FIRMWARE_VERSION, rx_timeout = 10000)
+    return self.version
 
   def set_boundary(self, top, left, bottom, right):
     """ Sets boundary box """
@@ -1083,36 +1192,21 @@ Alternatively, you can add yourself to group 'lp' and logout/login.""" % (self.h
       self.send_command("FE0,0")
 
   def find_bbox(self, cut):
-    """Find the bounding box of the cut, returns (xmin,ymin,xmax,ymax)"""
-    bb = {}
-    for path in cut:
-      for pt in path:
-        _bbox_extend(bb,pt[0],pt[1])
-    return bb
+    """Find the bounding box of the cut, returns a dict with llx, lly, urx, ury as in _bbox_extend()"""
+    bb = PathStore.from_paths(cut).bbox()
+    if bb is None:
+      return {}
+    return { 'llx': bb[0], 'ury': bb[1], 'urx': bb[2], 'lly': bb[3] }
 
   def flip_cut(self, cut):
     """this returns a flipped copy of the cut about the y-axis,
        keeping min and max values as they are."""
-    bb = self.find_bbox(cut)
-    new_cut = []
-    for path in cut:
-      new_path = []
-      for pt in path:
-        new_path.append((pt[0], bb['lly']+bb['ury']-pt[1]))
-      new_cut.append(new_path)
-    return new_cut
+    return PathStore.from_paths(cut).flip().to_paths()
 
   def mirror_cut(self, cut):
     """this returns a mirrored copy of the cut about the x-axis,
        keeping min and max values as they are."""
-    bb = self.find_bbox(cut)
-    new_cut = []
-    for path in cut:
-      new_path = []
-      for pt in path:
-        new_path.append((bb['llx']+bb['urx']-pt[0], pt[1]))
-      new_cut.append(new_path)
-    return new_cut
+    return PathStore.from_paths(cut).mirror().to_paths()
 
   def acceleration_cmd(self, acceleration):
     """ TJa """
@@ -0,0 +1,219 @@
+# (c) 2026 inkscape-silhouette contributors
+#
+# Intersections.py -- find crossing and overlapping cut segments.
+#
+# A Bentley-Ottmann sweep in ascending y, the direction the rollers move.
+# The sweep line stops at segment end points and at crossings found
+# between neighbours on the line, so that n segments with k crossings
+# take O((n+k) log n) steps instead of comparing all pairs.
+# Degenerate cases follow de Berg et al., Computational Geometry, ch. 2:
+# all segments through an event point are handled together, and
+# horizontal segments are ordered last on the sweep line.
+
+import heapq
+import math
+
+import numpy as np
+
+from silhouette.Geometry import XY_a, intersect_lines
+from silhouette.PathStore import PathStore
+
+
+def path_segments(paths):
+    """Flatten paths, a list of paths or a PathStore, into a list of
+       segments ((x0, y0), (x1, y1)). Returns segments, where, with
+       where[k] = (path index, point index of the start of segment k).
+    """
+    if isinstance(paths, PathStore):
+        same_path = paths.path_index()
+        k = np.flatnonzero(same_path[1:] == same_path[:-1])
+        xy = paths.xy.tolist()
+        pidx = same_path[k]
+        segments = [(tuple(xy[i]), tuple(xy[i+1])) for i in k.tolist()]
+        where = list(zip(pidx.tolist(), (k - paths.offsets[pidx]).tolist()))
+        return segments, where
+    segments = []
+    where = []
+    for i, path in enumerate(paths):
+        for j in range(len(path) - 1):
+            segments.append(((path[j][0], path[j][1]), (path[j+1][0], path[j+1][1])))
+            where.append((i, j))
+    return segments, where
+
+
+def find_intersections(segments, eps=1e-6):
+    """Sweep over segments, a list of ((x0, y0), (x1, y1)).
+       Returns crossings, overlaps:
+       - crossings lists (x, y, i, j) for each pair of segments i < j that
+         meet in a point that lies inside one of them. Segments meeting
+         only at their end points, like consecutive segments of a path,
+         are not reported.
+       - overlaps lists (i, j, (x0, y0), (x1, y1)) for each pair of
+         colinear segments i < j that share the part from (x0, y0) to
+         (x1, y1). They are also reported as crossing, if one starts
+         inside the other.
+       Coordinates within eps are considered equal.
+    """
+    ## each segment runs from its top (smaller y, then x) to its bottom.
+    top = []
+    bot = []
+    inv_slope = []      # dx/dy, horizontal segments last
+    starts = {}
+    ends = {}
+    queue = []
+    for k, (a, b) in enumerate(segments):
+        a = (float(a[0]), float(a[1]))
+        b = (float(b[0]), float(b[1]))
+        if (a[1], a[0]) > (b[1], b[0]):
+            a, b = b, a
+        top.append(a)
+        bot.append(b)
+        dy = b[1] - a[1]
+        inv_slope.append((b[0] - a[0])/dy if dy > eps else math.inf)
+        if abs(b[0] - a[0]) <= eps and dy <= eps:
+            continue    # a point, not a segment.
+        for key in ((a[1], a[0]), (b[1], b[0])):
+            if key not in starts:
+                starts[key] = []
+                heapq.heappush(queue, key)
+        starts[(a[1], a[0])].append(k)
+        ends.setdefault((b[1], b[0]), []).append(k)
+
+    def x_at(k, y, px):
+        ## x where segment k crosses the sweep line at y. On a horizontal
+        ## segment, that is the event point itself, if it is on the segment.
+        (x0, y0), (x1, y1) = top[k], bot[k]
+        if inv_slope[k] == math.inf:
+            return min(max(px, min(x0, x1)), max(x0, x1))
+        x = x0 + (y - y0)*inv_slope[k]
+        return min(max(x, min(x0, x1)), max(x0, x1))
+
+    def below(q, p):
+        return q[0] > p[0] + eps or (q[0] >= p[0] - eps and q[1] > p[1] + eps)
+
+    def check(i, j, p):
+        ## queue the crossing of neighbours i and j, if it is ahead of the sweep line.
+        q = intersect_lines(XY_a(top[i]), XY_a(bot[i]), XY_a(top[j]), XY_a(bot[j]), True, True)
+        if q is None:
+            return
+        ## end points are events anyway. A crossing with a horizontal segment
+        ## must not fall behind the events to its right on the sweep line.
+        for e in (top[i], bot[i], top[j], bot[j]):
+            if abs(q[0] - e[0]) <= eps and abs(q[1] - e[1]) <= eps:
+                return
+        qy = q[1]
+        for k in (i, j):
+            if inv_slope[k] == math.inf:
+                qy = top[k][1]
+        key = (qy, q[0])
+        if key not in starts and below(key, p):
+            starts[key] = []
+            heapq.heappush(queue, key)
+
+    status = []         # segments on the sweep line, ordered by x
+    active = set()      # the same, unordered
+    crossings = []
+    overlaps = []
+    seen = set()
+    while queue:
+        p = heapq.heappop(queue)
+        py, px = p
+        U = starts.pop(p)
+        L = ends.pop(p, ())
+
+        ## rounding may have hidden a crossing from us, and status is out of
+        ## order. Segments ending here must go nevertheless.
+        lost = []
+        while True:
+            lo, hi = _run(status, x_at, py, px, eps)
+            missing = [k for k in L if k in active and k not in lost and k not in status[lo:hi]]
+            if not missing:
+                break
+            for k in missing:
+                status.remove(k)
+            lost += missing
+        through = status[lo:hi] + lost
+        C = [k for k in through if not _near(bot[k], px, py, eps)]
+
+        if len(U) + len(through) > 1:
+            inside = {k for k in C if not _near(top[k], px, py, eps)}
+            meet = U + through
+            for a in range(len(meet)):
+                for b in range(a + 1, len(meet)):
+                    i, j = min(meet[a], meet[b]), max(meet[a], meet[b])
+                    if not (i in inside or j in inside) or (i, j) in seen:
+                        continue
+                    ## colinear segments overlap all along, they only cross
+                    ## where one of them starts inside the other.
+                    if _parallel(top[i], bot[i], top[j], bot[j], eps) and \
+                            not (i in U and j in inside or j in U and i in inside):
+                        continue
+                    seen.add((i, j))
+                    crossings.append((px, py, i, j))
+            ## colinear segments that both go on from p, at least one starting here.
+            going = U + C
+            for a in range(len(U)):
+                for b in range(len(going)):
+                    i, j = going[a], going[b]
+                    if b < len(U) and b <= a:
+                        continue
+                    if _colinear_from(p, bot[i], bot[j], eps):
+                        end = bot[i] if (bot[i][1], bot[i][0]) < (bot[j][1], bot[j][0]) else bot[j]
+                        overlaps.append((min(i, j), max(i, j), (px, py), end))
+
+        ## segments through p swap their order below it.
+        going = sorted(U + C, key=lambda k: (inv_slope[k], k))
+        status[lo:hi] = going
+        active.difference_update(through)
+        active.update(going)
+        if not going:
+            if 0 < lo < len(status):
+                check(status[lo-1], status[lo], p)
+        else:
+            if lo > 0:
+                check(status[lo-1], status[lo], p)
+            last = lo + len(going) - 1
+            if last + 1 < len(status):
+                check(status[last], status[last+1], p)
+    return crossings, overlaps
+
+
+def _near(a, px, py, eps):
+    return abs(a[0] - px) <= eps and abs(a[1] - py) <= eps
+
+
+def _run(status, x_at, py, px, eps):
+    """The segments on the sweep line that pass through (px, py) are the run
+       status[lo:hi]. Returns lo, hi.
+    """
+    lo, hi = 0, len(status)
+    while lo < hi:
+        mid = (lo + hi)//2
+        if x_at(status[mid], py, px) < px - eps:
+            lo = mid + 1
+        else:
+            hi = mid
+    hi = lo
+    while hi < len(status) and abs(x_at(status[hi], py, px) - px) <= eps:
+        hi += 1
+    return lo, hi
+
+
+def _parallel(a0, a1, b0, b1, eps):
+    """True, if the segments from a0 to a1 and from b0 to b1 have the same
+       or the opposite direction.
+    """
+    ax, ay = a1[0] - a0[0], a1[1] - a0[1]
+    bx, by = b1[0] - b0[0], b1[1] - b0[1]
+    return abs(ax*by - ay*bx) <= eps*max(math.hypot(ax, ay), math.hypot(bx, by))
+
+
+def _colinear_from(p, a, b, eps):
+    """True, if the segments from p = (y, x) to a and to b go in the same direction."""
+    ax, ay = a[0] - p[1], a[1] - p[0]
+    bx, by = b[0] - p[1], b[1] - p[0]
+    if ax*bx + ay*by <= 0.0:
+        return False
+    ## the end point of the shorter one must be on the line of the longer one.
+    la, lb = math.hypot(ax, ay), math.hypot(bx, by)
+    return abs(ax*by - ay*bx) <= eps*max(la, lb)
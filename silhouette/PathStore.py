@@ -0,0 +1,614 @@
+# (c) 2026 inkscape-silhouette contributors
+#
+# PathStore.py -- flat array storage for cut paths.
+#
+# Everywhere else a cut is a list of paths, each path a list of (x, y) tuples.
+# That is convenient, but slow once a document has many thousand points.
+# A PathStore holds the same data as one (N, 2) array of points plus an
+# offsets array, so that whole-cut stages can run as bulk numpy operations.
+# Convert with PathStore.from_paths() and to_paths() where a stage needs
+# lists: sendto_silhouette keeps one store from the flattened document to the
+# device, only the path ordering strategies get lists.
+
+import collections
+
+import numpy as np
+
+from silhouette.Geometry import sharp_turn_batch
+from silhouette.SpatialIndex import PointHash
+
+
+class PathStore:
+    def __init__(self, xy=None, offsets=None):
+        """xy is an (N, 2) float array with the points of all paths back to back.
+           offsets has one entry more than there are paths: path i consists of
+           the points xy[offsets[i]:offsets[i+1]].
+        """
+        if xy is None:
+            xy = np.zeros((0, 2))
+        if offsets is None:
+            offsets = np.array([0, len(xy)])
+        self.xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        self.offsets = np.asarray(offsets, dtype=np.intp)
+
+    @classmethod
+    def from_paths(cls, paths):
+        """Build a store from a list of paths of (x, y) tuples."""
+        counts = [len(path) for path in paths]
+        offsets = np.zeros(len(paths) + 1, dtype=np.intp)
+        np.cumsum(counts, out=offsets[1:])
+        if offsets[-1]:
+            xy = np.array([pt[:2] for path in paths for pt in path], dtype=float)
+        else:
+            xy = np.zeros((0, 2))
+        return cls(xy, offsets)
+
+    def to_paths(self):
+        """Returns the paths as a list of lists of (x, y) tuples."""
+        pts = list(zip(self.xy[:, 0].tolist(), self.xy[:, 1].tolist()))
+        o = self.offsets.tolist()
+        return [pts[o[i]:o[i+1]] for i in range(len(o) - 1)]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def point_count(self):
+        return len(self.xy)
+
+    def counts(self):
+        """Number of points in each path."""
+        return np.diff(self.offsets)
+
+    def starts(self):
+        return self.offsets[:-1]
+
+    def ends(self):
+        """Index of the last point of each path, -1 for empty paths."""
+        return self.offsets[1:] - 1
+
+    def path_index(self):
+        """For each point, the index of the path it belongs to."""
+        return np.repeat(np.arange(len(self)), self.counts())
+
+    def path(self, i):
+        """A view of the points of path i."""
+        return self.xy[self.offsets[i]:self.offsets[i+1]]
+
+    def compress(self, keep):
+        """Returns a new store with only the points where keep is True."""
+        pidx = self.path_index()[keep]
+        counts = np.bincount(pidx, minlength=len(self))
+        offsets = np.zeros(len(self) + 1, dtype=np.intp)
+        np.cumsum(counts, out=offsets[1:])
+        return PathStore(self.xy[keep], offsets)
+
+    def bbox(self):
+        """Returns (min_x, min_y, max_x, max_y) of all points, None if there are none."""
+        if not len(self.xy):
+            return None
+        lo = self.xy.min(axis=0).tolist()
+        hi = self.xy.max(axis=0).tolist()
+        return lo[0], lo[1], hi[0], hi[1]
+
+    ## The transforms below work in place on all points at once and return
+    ## self, so that they can be chained. The bounding box stays where it was,
+    ## unless noted otherwise.
+
+    def flip(self):
+        """Flip upside down: y runs the other way."""
+        bb = self.bbox()
+        if bb is not None:
+            self.xy[:, 1] = (bb[1] + bb[3]) - self.xy[:, 1]
+        return self
+
+    def mirror(self):
+        """Mirror left to right: x runs the other way."""
+        bb = self.bbox()
+        if bb is not None:
+            self.xy[:, 0] = (bb[0] + bb[2]) - self.xy[:, 0]
+        return self
+
+    def rotate(self, degrees):
+        """Rotate clockwise as seen with y pointing down, like on the mat.
+           The top left corner of the bounding box stays in place, so that
+           rotate(90) turns a landscape design into portrait.
+        """
+        bb = self.bbox()
+        if bb is None:
+            return self
+        quarter, rest = divmod(degrees, 90)
+        if rest == 0:
+            # exact, no rounding noise in the common case.
+            c, s = [(1, 0), (0, 1), (-1, 0), (0, -1)][int(quarter) % 4]
+        else:
+            c, s = np.cos(np.radians(degrees)), np.sin(np.radians(degrees))
+        x = self.xy[:, 0].copy()
+        y = self.xy[:, 1]
+        self.xy[:, 0] = c*x - s*y
+        self.xy[:, 1] = s*x + c*y
+        lo = self.xy.min(axis=0)
+        self.xy -= lo - (bb[0], bb[1])
+        return self
+
+    def scale(self, sx, sy=None, origin=None):
+        """Scale by sx horizontally and sy (default sx) vertically.
+           The point origin stays in place; default is the top left corner
+           of the bounding box.
+        """
+        if sy is None:
+            sy = sx
+        if origin is None:
+            bb = self.bbox()
+            if bb is None:
+                return self
+            origin = bb[:2]
+        self.xy -= origin
+        self.xy *= (sx, sy)
+        self.xy += origin
+        return self
+
+    def translate(self, dx, dy):
+        """Move all points by (dx, dy). This moves the bounding box."""
+        self.xy += (dx, dy)
+        return self
+
+    def _inner_mask(self):
+        """True for points that are neither the first nor the last of their path."""
+        inner = np.ones(len(self.xy), dtype=bool)
+        nonempty = self.counts() > 0
+        inner[self.starts()[nonempty]] = False
+        inner[self.ends()[nonempty]] = False
+        return inner
+
+    def _sharp_mask(self, fwd_ratio):
+        """True for inner points, where the path turns sharper than
+           Geometry.sharp_turn(A, B, C, fwd_ratio) allows.
+        """
+        sharp = np.zeros(len(self.xy), dtype=bool)
+        idx = np.flatnonzero(self._inner_mask())
+        if not len(idx):
+            return sharp
+        sharp[idx] = sharp_turn_batch(self.xy[idx-1], self.xy[idx], self.xy[idx+1], fwd_ratio)
+        return sharp
+
+    def simplify(self, tolerance, sharp_fwd_ratio=0.0):
+        """Douglas-Peucker simplification of all paths at once.
+
+           Points are dropped if they are less than tolerance away from the
+           simplified path. The first and last point of each path are always
+           kept, and so are corners that MatFree.mark_sharp_segs() would flag
+           as sharp with the same sharp_fwd_ratio; simplification never runs
+           across such a corner.
+           Returns a new PathStore.
+        """
+        if not self.point_count():
+            return PathStore(self.xy.copy(), self.offsets.copy())
+
+        # Repeated points would look like sharp turns. Drop them first,
+        # but never shrink a path to a single point.
+        inner = self._inner_mask()
+        same = np.zeros(len(self.xy), dtype=bool)
+        same[1:] = np.all(self.xy[1:] == self.xy[:-1], axis=1)
+        same[self.starts()[self.counts() > 0]] = False
+        store = self.compress(~(same & inner))
+        inner = store._inner_mask()
+
+        keep = ~inner | store._sharp_mask(sharp_fwd_ratio)
+        xy = store.xy
+        tol_sq = tolerance*tolerance
+
+        # work on the stretches between consecutive kept points of a path.
+        fixed = np.flatnonzero(keep)
+        lo = fixed[:-1]
+        hi = fixed[1:]
+        sel = inner[lo+1] & (hi - lo > 1)
+        lo = lo[sel]
+        hi = hi[sel]
+        while len(lo):
+            n = hi - lo - 1
+            rid = np.repeat(np.arange(len(lo)), n)
+            first = np.zeros(len(lo), dtype=np.intp)
+            np.cumsum(n[:-1], out=first[1:])
+            j = lo[rid] + 1 + np.arange(len(rid)) - first[rid]
+
+            # squared distance of point j to the segment lo--hi
+            A = xy[lo[rid]]
+            AB = xy[hi[rid]] - A
+            AP = xy[j] - A
+            ab_sq = np.einsum('ij,ij->i', AB, AB)
+            t = np.einsum('ij,ij->i', AP, AB)
+            t = np.divide(t, ab_sq, out=np.zeros_like(t), where=ab_sq > 0)
+            t = np.clip(t, 0.0, 1.0)
+            D = AP - t[:, None]*AB
+            dist_sq = np.einsum('ij,ij->i', D, D)
+
+            dmax = np.maximum.reduceat(dist_sq, first)
+            far = dmax > tol_sq
+            if not np.any(far):
+                break
+            # first point within each stretch, that is farthest away.
+            cand = np.flatnonzero(dist_sq == dmax[rid])
+            _, first_cand = np.unique(rid[cand], return_index=True)
+            split = j[cand[first_cand]][far]
+            keep[split] = True
+            lo, hi = np.concatenate((lo[far], split)), np.concatenate((split, hi[far]))
+            sel = hi - lo > 1
+            lo = lo[sel]
+            hi = hi[sel]
+
+        return store.compress(keep)
+
+    def length(self):
+        """Total length of all paths."""
+        d = np.diff(self.xy, axis=0)[self._segment_mask()]
+        return float(np.hypot(d[:, 0], d[:, 1]).sum())
+
+    def _segment_mask(self):
+        """True for the points that start a segment, i.e. all but the last of each path."""
+        starts = np.ones(max(len(self.xy) - 1, 0), dtype=bool)
+        ends = self.ends()[self.counts() > 0]
+        starts[ends[ends < len(starts)]] = False
+        return starts
+
+    def dedup_edges(self, quantum=0.05):
+        """Drop segments, and parts of segments, along which an earlier segment cuts.
+
+           Points are rounded to a grid of quantum, the device resolution by
+           default. Segments are on the same line, if their rounded end points
+           are, and there each one covers an interval. Of a segment, only the
+           parts of its interval not covered by earlier segments are kept.
+           Paths are split where parts are dropped. A closed path that falls
+           apart this way starts after its first gap instead.
+           Returns a new PathStore.
+        """
+        seg = np.flatnonzero(self._segment_mask())
+        q = np.rint(self.xy/quantum).astype(np.int64)
+        A = q[seg]
+        d = q[seg+1] - A
+        g = np.gcd(d[:, 0], d[:, 1])
+        sel = g > 0
+        seg, A, d, g = seg[sel], A[sel], d[sel], g[sel]
+        # reduced direction of the line, pointing right or down.
+        d //= g[:, None]
+        d[(d[:, 0] < 0) | ((d[:, 0] == 0) & (d[:, 1] < 0))] *= -1
+        offset = d[:, 0]*A[:, 1] - d[:, 1]*A[:, 0]
+        t0 = np.einsum('ij,ij->i', d, A)
+        t1 = np.einsum('ij,ij->i', d, q[seg+1])
+        unit = np.hypot(d[:, 0], d[:, 1])      # t per grid step along the line
+
+        _, line, count = np.unique(np.column_stack((d, offset)), axis=0,
+                                   return_inverse=True, return_counts=True)
+        line = line.ravel()
+        shared = np.flatnonzero(count[line] > 1)
+
+        ## pieces[k] lists the parts (f0, f1) of segment k that are kept, as
+        ## fractions from its start. Segments not listed are kept whole.
+        pieces = {}
+        covered = {}
+        for i in shared.tolist():
+            lo, hi = int(t0[i]), int(t1[i])
+            free = _subtract(covered.setdefault(int(line[i]), []), min(lo, hi), max(lo, hi))
+            if free == [(min(lo, hi), max(lo, hi))]:
+                continue
+            pieces[int(seg[i])] = sorted(tuple(sorted(((u - lo)/(hi - lo), (v - lo)/(hi - lo))))
+                                         for u, v in free if v - u >= unit[i])
+        if not pieces:
+            return PathStore(self.xy.copy(), self.offsets.copy())
+
+        xy = self.xy
+        o = self.offsets.tolist()
+        whole = ((0.0, 1.0),)
+        touched = set((np.searchsorted(self.offsets, list(pieces), side='right') - 1).tolist())
+        out = []
+        for p in range(len(self)):
+            if p not in touched:
+                out.append(xy[o[p]:o[p+1]])
+                continue
+            parts = []
+            cur = None
+            for k in range(o[p], o[p+1] - 1):
+                a, b = xy[k], xy[k+1]
+                kept = pieces.get(k, whole)
+                for f0, f1 in kept:
+                    if cur is None or f0 > 0.0:
+                        if cur is not None:
+                            parts.append(cur)
+                        cur = [a + f0*(b - a)]
+                    cur.append(b if f1 == 1.0 else a + f1*(b - a))
+                if cur is not None and (not kept or kept[-1][1] < 1.0):
+                    parts.append(cur)
+                    cur = None
+            if cur is not None:
+                parts.append(cur)
+            first = pieces.get(o[p], whole)
+            last = pieces.get(o[p+1] - 2, whole)
+            if (len(parts) > 1 and np.array_equal(xy[o[p]], xy[o[p+1]-1]) and
+                    first and first[0][0] == 0.0 and last and last[-1][1] == 1.0):
+                parts[0] = parts.pop() + parts[0][1:]
+            out.extend(np.array(part) for part in parts)
+        return PathStore.from_arrays(out)
+
+    def weld(self, tolerance, reversible=True):
+        """Join paths into chains, where the end of one path lies within
+           tolerance of the start of another. With reversible, paths may also
+           be reversed to join end to end. Starting with the first unused path,
+           a chain grows at both of its ends by the closest fitting path, as
+           long as there is one. Where two paths meet, the point of the one
+           that came first in the chain is kept.
+           Returns a new PathStore.
+        """
+        counts = self.counts().tolist()
+        first = self.starts().tolist()
+        last = self.ends().tolist()
+        xy = self.xy
+        points = []
+        for i in range(len(self)):
+            if counts[i]:
+                points.append((xy[first[i], 0], xy[first[i], 1], 2*i))
+                points.append((xy[last[i], 0], xy[last[i], 1], 2*i + 1))
+        index = PointHash(points, tolerance)
+        used = [False]*len(self)
+
+        def onward(item):
+            return not used[item >> 1] and (reversible or not item & 1)
+
+        def backward(item):
+            return not used[item >> 1] and (reversible or item & 1)
+
+        out = []
+        for i in range(len(self)):
+            if used[i]:
+                continue
+            used[i] = True
+            chain = collections.deque([(i, False)])
+            while counts[i]:
+                j, rev = chain[-1]
+                _, hit = index.near(xy[first[j] if rev else last[j]], onward)
+                if hit is None:
+                    break
+                used[hit[2] >> 1] = True
+                chain.append((hit[2] >> 1, bool(hit[2] & 1)))
+            while counts[i]:
+                j, rev = chain[0]
+                _, hit = index.near(xy[last[j] if rev else first[j]], backward)
+                if hit is None:
+                    break
+                used[hit[2] >> 1] = True
+                chain.appendleft((hit[2] >> 1, not hit[2] & 1))
+            for n, (j, rev) in enumerate(chain):
+                path = self.path(j)[::-1] if rev else self.path(j)
+                out.append(path[1:] if n else path)
+            if len(chain) > 1:
+                out[-len(chain):] = [np.concatenate(out[-len(chain):])]
+        return PathStore.from_arrays(out)
+
+    def nonempty(self):
+        """Returns a store without the empty paths, sharing the points."""
+        keep = self.counts() > 0
+        return PathStore(self.xy, np.append(self.offsets[:-1][keep], len(self.xy)))
+
+    def fuse(self, tolerance):
+        """Join each path to the one before it, if it starts within tolerance
+           of where that one ends, so that the tool is not lifted in between.
+           Unlike weld(), the order of the paths is kept. The first point of a
+           joined path is dropped. Empty paths are dropped too.
+           Returns a new PathStore.
+        """
+        store = self.nonempty()
+        xy = store.xy
+        starts = store.starts()
+        d = xy[starts[1:]] - xy[store.ends()[:-1]]
+        join = d[:, 0]*d[:, 0] + d[:, 1]*d[:, 1] <= tolerance*tolerance
+        keep = np.ones(len(xy), dtype=bool)
+        keep[starts[1:][join]] = False
+        pos = np.zeros(len(xy) + 1, dtype=np.intp)
+        np.cumsum(keep, out=pos[1:])
+        offsets = pos[np.append(starts[:1], starts[1:][~join])]
+        return PathStore(xy[keep], np.append(offsets, pos[-1]))
+
+    def closed(self, max_dist_sq):
+        """True for the paths that end less than sqrt(max_dist_sq) from their start."""
+        if not len(self.xy):
+            return np.zeros(len(self), dtype=bool)
+        d = self.xy[self.ends()] - self.xy[self.starts()]
+        return (self.counts() > 0) & (d[:, 0]*d[:, 0] + d[:, 1]*d[:, 1] < max_dist_sq)
+
+    def orient(self, axis, descending=False):
+        """Split the paths into pieces that strictly ascend (or descend) along
+           axis, 0 for x or 1 for y.
+
+           A path is walked from the end that comes first along axis (from its
+           end, if both are level), as far as the coordinate keeps ascending.
+           The rest of the path, from the last point taken on, is then walked
+           the same way. If not even the first step ascends, that step becomes
+           a piece of its own, turned around.
+           Returns a new PathStore.
+        """
+        v = self.xy[:, axis]
+        if descending:
+            ordered = lambda a, b: a > b
+        else:
+            ordered = lambda a, b: a < b
+        n = len(v)
+        last = np.zeros(n, dtype=bool)
+        last[self.ends()[self.counts() > 0]] = True
+        first = np.zeros(n, dtype=bool)
+        first[self.starts()[self.counts() > 0]] = True
+        # fwd[i]: the step from i to i+1 ascends, bwd[i]: the step from i to i-1 does.
+        fwd = np.zeros(n, dtype=bool)
+        fwd[:-1] = ordered(v[:-1], v[1:]) & ~last[:-1]
+        bwd = np.zeros(n, dtype=bool)
+        bwd[1:] = ordered(v[1:], v[:-1]) & ~first[1:]
+        # a walk from i goes on up to run_fwd[i], or down to run_bwd[i].
+        idx = np.arange(n)
+        run_fwd = np.minimum.accumulate(np.where(fwd, n, idx)[::-1])[::-1]
+        run_bwd = np.maximum.accumulate(np.where(bwd, -1, idx))
+        v = v.tolist()
+
+        runs = []      # (first, step, length), one piece each
+        o = self.offsets.tolist()
+        for p in range(len(self)):
+            lo, hi = o[p], o[p+1] - 1
+            if hi < lo:
+                continue
+            if lo == hi:
+                runs.append((lo, 1, 1))
+                continue
+            up = ordered(v[lo], v[hi])
+            while True:
+                if up:
+                    j = min(int(run_fwd[lo]), hi)
+                    if j == lo:
+                        runs.append((lo + 1, -1, 2))
+                        j += 1
+                    else:
+                        runs.append((lo, 1, j - lo + 1))
+                    if j == hi:
+                        break
+                    lo = j
+                    up = not ordered(v[hi], v[lo])
+                else:
+                    j = max(int(run_bwd[hi]), lo)
+                    if j == hi:
+                        runs.append((hi - 1, 1, 2))
+                        j -= 1
+                    else:
+                        runs.append((hi, -1, hi - j + 1))
+                    if j == lo:
+                        break
+                    hi = j
+                    up = ordered(v[lo], v[hi])
+        return _gather(self.xy, runs, range(len(runs)), len(runs))
+
+    def multipass(self, passes=1, reverse_toggle=False, overcut=0.0, closed=None):
+        """Repeat the paths for several passes of the tool, and let closed
+           paths overlap by overcut at both ends.
+
+           With reverse_toggle, a path is walked back and forth without a
+           lift. Otherwise a closed path goes round passes times, and an open
+           path is repeated as passes separate paths. The overcut of a closed
+           path starts on the last segments before its end and goes on over
+           the first ones after its start, at most one more round each way.
+           closed is a boolean array, see closed().
+           Returns a new PathStore.
+        """
+        if closed is None:
+            closed = np.zeros(len(self), dtype=bool)
+        counts = self.counts()
+        starts = self.starts()
+        flipped = np.full(len(self), bool(reverse_toggle and (passes - 1) % 2))
+        # mm[0] and the direction of the path in its last pass.
+        head = np.where(flipped, self.ends(), starts)
+        step = np.where(flipped, -1, 1)
+        tail = head + (counts - 1)*step
+
+        xy = self.xy
+        pre = {}
+        post = {}
+        if overcut > 0:
+            oc = np.flatnonzero(closed & (counts > 1))
+            budget = np.full(len(oc), float(overcut))
+            k, partial = self._walk(tail[oc], -step[oc], counts[oc] - 1, budget)
+            k2, partial2 = self._walk(head[oc], step[oc], counts[oc] - 1, budget)
+            extra = len(xy)
+            xy = np.concatenate((xy, partial, partial2))
+            for i, (p, h, t, st, m, n, n2) in enumerate(zip(oc.tolist(), head[oc].tolist(), tail[oc].tolist(),
+                                                           step[oc].tolist(), counts[oc].tolist(), k.tolist(), k2.tolist())):
+                pre[p] = ([(extra + i, 1, 1)] if n < m - 1 else []) + [(t - n*st, st, n)]
+                post[p] = [(h + st, st, n2)] + ([(extra + len(oc) + i, 1, 1)] if n2 < m - 1 else [])
+
+        runs = []
+        owner = []      # the output path of each run
+        o = self.offsets.tolist()
+        for p in range(len(self)):
+            lo, hi = o[p], o[p+1] - 1
+            m = hi - lo + 1
+            if reverse_toggle or closed[p]:
+                body = pre.get(p, []) + [(lo, 1, m)]
+                back = False
+                for i in range(1, passes):
+                    if reverse_toggle:
+                        back = not back
+                    body.append((hi - 1, -1, m - 1) if back else (lo + 1, 1, m - 1))
+                body += post.get(p, [])
+                owner += [owner[-1] + 1 if owner else 0]*len(body)
+                runs += body
+            else:
+                for i in range(max(passes, 1)):
+                    owner.append(owner[-1] + 1 if owner else 0)
+                    runs.append((lo, 1, m))
+        return _gather(xy, runs, owner, owner[-1] + 1 if owner else 0)
+
+    def _walk(self, start, step, limit, budget):
+        """Walk from the points start in steps of step (+1 or -1) through
+           their paths, for at most limit segments, until budget runs out.
+           Returns the number of segments walked in full, and the points
+           where the budget ran out, nan where it lasted.
+        """
+        xy = self.xy
+        done = np.zeros(len(start), dtype=np.intp)
+        ends = np.full((len(start), 2), np.nan)
+        left = np.array(budget, dtype=float)
+        act = np.flatnonzero(limit > 0)
+        while len(act):
+            a = start[act] + done[act]*step[act]
+            b = a + step[act]
+            dx = xy[b, 0] - xy[a, 0]
+            dy = xy[b, 1] - xy[a, 1]
+            dist = np.sqrt(dx*dx + dy*dy)
+            go = left[act] > dist
+            stop = ~go
+            f = left[act[stop]]/dist[stop]
+            ends[act[stop], 0] = xy[a[stop], 0] + dx[stop]*f
+            ends[act[stop], 1] = xy[a[stop], 1] + dy[stop]*f
+            act = act[go]
+            left[act] -= dist[go]
+            done[act] += 1
+            act = act[done[act] < limit[act]]
+        return done, ends
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Build a store from a list of (n, 2) arrays, one per path."""
+        offsets = np.zeros(len(arrays) + 1, dtype=np.intp)
+        np.cumsum([len(a) for a in arrays], out=offsets[1:])
+        if not offsets[-1]:
+            return cls(np.zeros((0, 2)), offsets)
+        return cls(np.concatenate(arrays), offsets)
+
+
+def _subtract(spans, lo, hi):
+    """spans is a sorted list of disjoint intervals (a, b) that are covered.
+       Returns the parts of (lo, hi) that are not, and adds (lo, hi) to spans.
+    """
+    free = []
+    pos = lo
+    for a, b in spans:
+        if b <= pos:
+            continue
+        if a >= hi:
+            break
+        if a > pos:
+            free.append((pos, a))
+        pos = b
+    if pos < hi:
+        free.append((pos, hi))
+    rest = [(a, b) for a, b in spans if b < lo or a > hi]
+    touch = [(a, b) for a, b in spans if not (b < lo or a > hi)]
+    spans[:] = sorted(rest + [(min([lo] + [a for a, b in touch]), max([hi] + [b for a, b in touch]))])
+    return free
+
+
+def _gather(xy, runs, owner, count):
+    """Build a PathStore of count paths from runs (first, step, length) of
+       points of xy. Each run takes length points, from xy[first] on in steps
+       of step. The runs are appended to the paths owner, in order.
+    """
+    runs = np.array(runs, dtype=np.intp).reshape(-1, 3)
+    first, step, length = runs[:, 0], runs[:, 1], runs[:, 2]
+    start = np.cumsum(length) - length
+    idx = np.repeat(first, length) + np.repeat(step, length)*(np.arange(int(length.sum())) - np.repeat(start, length))
+    offsets = np.zeros(count + 1, dtype=np.intp)
+    np.cumsum(np.bincount(np.asarray(owner, dtype=np.intp), weights=length, minlength=count).astype(np.intp),
+              out=offsets[1:])
+    return PathStore(xy[idx], offsets)
@@ -0,0 +1,230 @@
+# (c) 2026 inkscape-silhouette contributors
+#
+# Service.py -- run jobs in a long-lived local process.
+#
+# Each time Inkscape runs an extension, it starts a new python, which imports
+# inkex and lxml, searches the USB bus and initializes the cutter again. That
+# takes seconds before the blade moves. A Service stays running instead, owns
+# the device and runs one job after the other, as they come in over a unix
+# socket. The extension itself then only connects, ships its arguments and
+# the document, and relays what the job writes to stdout and stderr.
+#
+# Start it with 'sendto_silhouette.py --serve'. Without a service running,
+# submit() returns None and the extension does all the work itself, as before.
+#
+# The protocol is a sequence of frames in both directions: a one byte tag,
+# a four byte big endian length and that many bytes of data. File names in
+# argv are absolute, the service runs in a directory of its own.
+#   client -> service:  'a' JSON header {"argv": [...]}
+#                       'd' the document
+#   service -> client:  'e' text for stderr, any number of them
+#                       'o' the output document
+#                       'x' the exit code, as ascii digits. Last frame.
+
+import io
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import tempfile
+
+HEADER = struct.Struct(">cI")
+
+
+def socket_path():
+    """Where the service listens: in $XDG_RUNTIME_DIR, if there is one."""
+    run_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if run_dir and os.path.isdir(run_dir):
+        return os.path.join(run_dir, "inkscape-silhouette.sock")
+    return os.path.join(tempfile.gettempdir(), "inkscape-silhouette-%d.sock" % os.getuid())
+
+
+def send_frame(sock, tag, data=b""):
+    sock.sendall(HEADER.pack(tag, len(data)) + data)
+
+
+def recv_frame(sock):
+    """Returns tag, data of the next frame, or None, None at the end of the stream."""
+    head = _recv_exactly(sock, HEADER.size)
+    if head is None:
+        return None, None
+    tag, size = HEADER.unpack(head)
+    data = _recv_exactly(sock, size)
+    if data is None:
+        raise ConnectionError("incomplete frame")
+    return tag, data
+
+
+def _recv_exactly(sock, size):
+    buf = b""
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            if buf:
+                raise ConnectionError("incomplete frame")
+            return None
+        buf += chunk
+    return buf
+
+
+def split_input(argv):
+    """Inkscape passes the document as the last argument that is no option.
+       Returns the other arguments and the file name, None to read stdin.
+    """
+    for i in range(len(argv) - 1, -1, -1):
+        if not argv[i].startswith("-") and os.path.isfile(argv[i]):
+            return argv[:i] + argv[i+1:], argv[i]
+    return list(argv), None
+
+
+def absolute_paths(argv, path_options):
+    """argv with the values of the options in path_options made absolute,
+       in both the --option=value and the --option value form.
+    """
+    args = list(argv)
+    for i, arg in enumerate(args):
+        option, eq, value = arg.partition("=")
+        if option in path_options and eq and value:
+            args[i] = option + "=" + os.path.abspath(value)
+        elif i > 0 and args[i-1] in path_options and not arg.startswith("-"):
+            args[i] = os.path.abspath(arg)
+    return args
+
+
+def submit(argv, path=None, stdin=None, stdout=None, stderr=None, timeout=0.5,
+           path_options=()):
+    """Run a job in the service listening at path (default socket_path()).
+       Returns the exit code of the job, or None if no service answers
+       within timeout seconds. Then nothing has been read from stdin.
+       path_options are the options that take a file name.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    if path is None:
+        path = socket_path()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    sock.settimeout(None)
+
+    if stdin is None:
+        stdin = sys.stdin.buffer
+    if stdout is None:
+        stdout = sys.stdout.buffer if sys.stdout else None
+    if stderr is None:
+        stderr = sys.stderr
+
+    with sock:
+        args, input_file = split_input(argv)
+        if input_file is None:
+            document = stdin.read()
+        else:
+            with open(input_file, "rb") as f:
+                document = f.read()
+        args = absolute_paths(args, path_options)
+        send_frame(sock, b"a", json.dumps({"argv": args}).encode())
+        send_frame(sock, b"d", document)
+
+        while True:
+            tag, data = recv_frame(sock)
+            if tag is None:
+                print("silhouette service: connection lost", file=stderr)
+                return 1
+            if tag == b"e":
+                stderr.write(data.decode(errors="replace"))
+                stderr.flush()
+            elif tag == b"o":
+                if stdout is not None:
+                    stdout.write(data)
+                    stdout.flush()
+            elif tag == b"x":
+                return int(data)
+
+
+class _FrameWriter:
+    """A text stream that sends everything written to it as frames."""
+    def __init__(self, sock, tag):
+        self.sock = sock
+        self.tag = tag
+
+    def write(self, s):
+        if s:
+            send_frame(self.sock, self.tag, s.encode())
+        return len(s)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class Service(socketserver.UnixStreamServer):
+    """Runs jobs submitted over a unix socket, one at a time.
+
+       run_job(argv, document, stdout, stderr) does the work: document is the
+       input as bytes, stdout a binary and stderr a text stream, both sent
+       to the client. It returns the exit code. It must write to stderr, not
+       sys.stderr, and not rely on the current directory: the spooler threads
+       run meanwhile.
+    """
+    def __init__(self, run_job, path=None, log=sys.stderr):
+        if path is None:
+            path = socket_path()
+        self.run_job = run_job
+        self.log = log
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+            except OSError:
+                os.remove(path)         # stale, from a service that died.
+            else:
+                raise ValueError("A silhouette service is already listening at %s" % path)
+            finally:
+                probe.close()
+        old_umask = os.umask(0o077)     # only for us.
+        try:
+            socketserver.UnixStreamServer.__init__(self, path, _Handler)
+        finally:
+            os.umask(old_umask)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        try:
+            os.remove(self.server_address)
+        except OSError:
+            pass
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        tag, header = recv_frame(sock)
+        if tag != b"a":
+            return
+        header = json.loads(header)
+        tag, document = recv_frame(sock)
+        if tag != b"d":
+            return
+
+        stdout = io.BytesIO()
+        stderr = _FrameWriter(sock, b"e")
+        try:
+            code = self.server.run_job(header["argv"], document, stdout, stderr)
+        except SystemExit as e:
+            code = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            print("silhouette service: %s: %s" % (type(e).__name__, e), file=stderr)
+            code = 1
+        print("silhouette service: %s, exit code %s" % (" ".join(header["argv"]), code),
+              file=self.server.log)
+        if stdout.getvalue():
+            send_frame(sock, b"o", stdout.getvalue())
+        send_frame(sock, b"x", str(code or 0).encode())
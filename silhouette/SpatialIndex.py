@@ -0,0 +1,366 @@
+# (c) 2026 inkscape-silhouette contributors
+#
+# SpatialIndex.py -- nearest neighbour lookup for the path ordering strategies.
+#
+# PointGrid buckets points into a uniform grid of square cells. A nearest query
+# searches the cells in growing square rings around the query position and
+# stops as soon as no unsearched cell can hold anything closer. Points are never
+# removed explicitly: the query takes an alive() predicate and drops dead points
+# from the cells it visits.
+#
+# PointHash finds points within a fixed tolerance, as needed to weld path
+# ends that almost meet.
+#
+# BoxTree is a static R-tree of bounding boxes, packed bottom up by sorting
+# the boxes into tiles (Sort-Tile-Recursive). It finds the boxes that contain
+# a given box, as needed for the containment tree of closed paths.
+#
+# ConeIndex answers the question whether any point lies in the 45 degree
+# shadow cone above a position, as needed by MatFree.pyramids_barrier().
+
+import bisect
+
+import numpy as np
+
+
+class PointGrid:
+    def __init__(self, points, cell=None):
+        """points is a list of (x, y, item) tuples. Items must be comparable,
+           they break ties between points at the same distance.
+           cell is the edge length of a grid cell. By default it is chosen to
+           put about one point into each cell.
+        """
+        self.size = len(points)
+        if points:
+            xs = [p[0] for p in points]
+            ys = [p[1] for p in points]
+            self.x0, self.y0 = min(xs), min(ys)
+            w, h = max(xs) - self.x0, max(ys) - self.y0
+        else:
+            self.x0 = self.y0 = 0.0
+            w = h = 0.0
+        if cell is None:
+            n = max(self.size, 1)
+            cell = max((w*h/n)**0.5, max(w, h)/n)
+        if not cell > 0:
+            cell = 1.0
+        self.cell = float(cell)
+        self.nx = int(w/self.cell) + 1
+        self.ny = int(h/self.cell) + 1
+        self.cells = {}
+        for p in points:
+            self.cells.setdefault(self._cell(p[0], p[1]), []).append(p)
+
+    def insert(self, p):
+        """Add the point p = (x, y, item). It must lie within the points the
+           grid was built with.
+        """
+        self.cells.setdefault(self._cell(p[0], p[1]), []).append(p)
+        self.size += 1
+
+    def _cell(self, x, y):
+        ix = min(max(int((x - self.x0)/self.cell), 0), self.nx - 1)
+        iy = min(max(int((y - self.y0)/self.cell), 0), self.ny - 1)
+        return ix, iy
+
+    def _ring(self, cx, cy, r):
+        """Keys of the cells at Chebyshev distance r from (cx, cy), clipped to the grid."""
+        if r == 0:
+            yield cx, cy
+            return
+        x_lo, x_hi = max(cx - r, 0), min(cx + r, self.nx - 1)
+        for y in (cy - r, cy + r):
+            if 0 <= y < self.ny:
+                for x in range(x_lo, x_hi + 1):
+                    yield x, y
+        y_lo, y_hi = max(cy - r + 1, 0), min(cy + r - 1, self.ny - 1)
+        for x in (cx - r, cx + r):
+            if 0 <= x < self.nx:
+                for y in range(y_lo, y_hi + 1):
+                    yield x, y
+
+    def _searched_radius(self, pos, cx, cy, r):
+        """Distance from pos to the nearest cell outside the square of rings 0..r."""
+        gaps = []
+        if cx - r > 0:
+            gaps.append(pos[0] - (self.x0 + (cx - r)*self.cell))
+        if cx + r < self.nx - 1:
+            gaps.append(self.x0 + (cx + r + 1)*self.cell - pos[0])
+        if cy - r > 0:
+            gaps.append(pos[1] - (self.y0 + (cy - r)*self.cell))
+        if cy + r < self.ny - 1:
+            gaps.append(self.y0 + (cy + r + 1)*self.cell - pos[1])
+        if not gaps:
+            return float("inf")
+        return max(min(gaps), 0.0)
+
+    def nearest(self, pos, alive=None, metric=None):
+        """Returns (dist_sq, (x, y, item)) of the alive point closest to pos.
+           Of several points at the same distance, the one with the smallest
+           item wins. Returns (inf, None) if there is no alive point.
+           With a metric (e.g. a TimeModel.MotionModel), closest means lowest
+           metric.move_time() and that is returned instead of dist_sq.
+        """
+        cx, cy = self._cell(pos[0], pos[1])
+        max_r = max(cx, self.nx - 1 - cx, cy, self.ny - 1 - cy)
+        best = None
+        bestdist = float("inf")
+        # guard against points that were rounded into a neighbouring cell.
+        slack = 1.0 - 1e-9
+        for r in range(max_r + 1):
+            for key in self._ring(cx, cy, r):
+                bucket = self.cells.get(key)
+                if not bucket:
+                    continue
+                if alive is not None:
+                    live = [p for p in bucket if alive(p[2])]
+                    if len(live) != len(bucket):
+                        if live:
+                            self.cells[key] = live
+                        else:
+                            del self.cells[key]
+                    bucket = live
+                for p in bucket:
+                    if metric is None:
+                        dx = pos[0]-p[0]
+                        dy = pos[1]-p[1]
+                        distance = dx*dx+dy*dy
+                    else:
+                        distance = metric.move_time(pos, p)
+                    if distance < bestdist or (distance == bestdist and p[2] < best[2]):
+                        bestdist = distance
+                        best = p
+            if best is not None:
+                gap = self._searched_radius(pos, cx, cy, r)*slack
+                if metric is None:
+                    bound = gap*gap
+                elif gap == float("inf"):
+                    bound = gap
+                else:
+                    bound = metric.min_move_time(gap)
+                if bestdist < bound:
+                    break
+        return bestdist, best
+
+
+class PointHash:
+    def __init__(self, points, tolerance):
+        """points is a list of (x, y, item) tuples, with comparable items.
+           tolerance is the largest distance at which near() finds a point,
+           it is also the size of the hash cells.
+        """
+        self.tolerance = float(tolerance)
+        self.cell = self.tolerance if self.tolerance > 0 else 1.0
+        self.cells = {}
+        for p in points:
+            self.cells.setdefault(self._cell(p[0], p[1]), []).append(p)
+
+    def _cell(self, x, y):
+        return int(x//self.cell), int(y//self.cell)
+
+    def near(self, pos, accept=None):
+        """Returns (dist_sq, (x, y, item)) of the point closest to pos, if it
+           is within the tolerance and accept(item) is True. Ties go to the
+           smallest item. Returns (inf, None) if there is no such point.
+        """
+        cx, cy = self._cell(pos[0], pos[1])
+        best = None
+        bestdist = self.tolerance*self.tolerance
+        for j in (-1, 0, 1):
+            for i in (-1, 0, 1):
+                for p in self.cells.get((cx+i, cy+j), ()):
+                    dx = pos[0]-p[0]
+                    dy = pos[1]-p[1]
+                    distance = dx*dx+dy*dy
+                    if distance > bestdist or (best is not None and distance == bestdist and p[2] > best[2]):
+                        continue
+                    if accept is None or accept(p[2]):
+                        bestdist = distance
+                        best = p
+        if best is None:
+            return float("inf"), None
+        return bestdist, best
+
+
+class BoxTree:
+    def __init__(self, boxes, fanout=16):
+        """boxes is an (n, 4) array of (min_x, min_y, max_x, max_y).
+           Items are the row indices of the boxes.
+        """
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        self.fanout = fanout
+        # levels[0] are the boxes, each level above has a node per fanout
+        # entries of the level below. children[l][i] lists the entries of
+        # node i of level l+1 in level l.
+        self.levels = [boxes]
+        self.children = []
+        while len(self.levels[-1]) > fanout:
+            lower = self.levels[-1]
+            cx = lower[:, 0] + lower[:, 2]
+            cy = lower[:, 1] + lower[:, 3]
+            nodes = -(-len(lower) // fanout)
+            slices = int(np.ceil(np.sqrt(nodes)))
+            order = np.argsort(cx, kind='stable')
+            tiles = []
+            per_slice = slices*fanout
+            for k in range(0, len(order), per_slice):
+                part = order[k:k+per_slice]
+                part = part[np.argsort(cy[part], kind='stable')]
+                tiles.extend(part[j:j+fanout] for j in range(0, len(part), fanout))
+            self.children.append(tiles)
+            self.levels.append(np.array([[lower[t, 0].min(), lower[t, 1].min(),
+                                          lower[t, 2].max(), lower[t, 3].max()] for t in tiles]))
+
+    def containing(self, box):
+        """Returns the items whose box contains box, borders included."""
+        x0, y0, x1, y1 = box
+        top = len(self.levels) - 1
+        found = []
+        stack = [(top, np.arange(len(self.levels[top])))]
+        while stack:
+            level, idx = stack.pop()
+            b = self.levels[level][idx]
+            hit = idx[(b[:, 0] <= x0) & (b[:, 1] <= y0) & (b[:, 2] >= x1) & (b[:, 3] >= y1)]
+            if level == 0:
+                found.extend(hit.tolist())
+            else:
+                for i in hit.tolist():
+                    stack.append((level - 1, self.children[level - 1][i]))
+        return sorted(found)
+
+
+class ConeIndex:
+    """Shadow queries for the pyramids strategy of MatFree.
+
+       In the rotated frame u = x+y, v = y-x a point P lies strictly inside
+       the upward 45 degree cone of a point Q (P.y < Q.y and
+       |P.x-Q.x| < Q.y-P.y), iff u_P < u_Q and v_P < v_Q. The points are
+       kept in buckets by u, that is the order in which a forward slanted
+       barrier / sweeps over them, and a segment tree over the buckets keeps
+       their minimum v. A cone is checked in O(log n).
+    """
+    def __init__(self, items, u, v, bucket=4):
+        """items, u and v are arrays of equal length. Items must be unique,
+           they are returned by blocker() and passed to remove().
+        """
+        order = np.argsort(u, kind='stable')
+        items = np.asarray(items)[order].tolist()
+        u = np.asarray(u, dtype=float)[order].tolist()
+        v = np.asarray(v, dtype=float)[order].tolist()
+        # bucket b holds the points with bounds[b] <= u < bounds[b+1]
+        self.bounds = [-float("inf")] + u[bucket::bucket]
+        self.buckets = [list(zip(v[i:i+bucket], u[i:i+bucket], items[i:i+bucket]))
+                        for i in range(0, max(len(items), 1), bucket)]
+        self.where = {item: i//bucket for i, item in enumerate(items)}
+        size = 1
+        while size < len(self.buckets):
+            size *= 2
+        self.size = size
+        tree = [float("inf")]*(2*size)
+        for b, entries in enumerate(self.buckets):
+            tree[size+b] = min(v for v, u, item in entries) if entries else float("inf")
+        for i in range(size - 1, 0, -1):
+            tree[i] = min(tree[2*i], tree[2*i+1])
+        self.tree = tree
+
+    def __contains__(self, item):
+        return item in self.where
+
+    def _update(self, b):
+        tree = self.tree
+        i = self.size + b
+        tree[i] = min((v for v, u, item in self.buckets[b]), default=float("inf"))
+        i >>= 1
+        while i:
+            m = min(tree[2*i], tree[2*i+1])
+            if tree[i] == m:
+                break
+            tree[i] = m
+            i >>= 1
+
+    def insert(self, item, u, v):
+        """Add point item at u, v."""
+        b = bisect.bisect_right(self.bounds, u) - 1
+        self.buckets[b].append((v, u, item))
+        self.where[item] = b
+        self._update(b)
+
+    def remove(self, item):
+        """Drop point item from all future queries."""
+        b = self.where.pop(item, None)
+        if b is None:
+            return
+        self.buckets[b] = [e for e in self.buckets[b] if e[2] != item]
+        self._update(b)
+
+    def _nodes(self, end):
+        """Tree nodes that together cover the buckets before end."""
+        lo, hi = self.size, self.size + end
+        nodes = []
+        while lo < hi:
+            if lo & 1:
+                nodes.append(lo)
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                nodes.append(hi)
+            lo >>= 1
+            hi >>= 1
+        return nodes
+
+    def blocker(self, u, v, exclude=()):
+        """Returns a point, other than those in exclude, that lies strictly
+           inside the cone of (u, v). None if there is no such point.
+        """
+        end = bisect.bisect_left(self.bounds, u)    # buckets before end have points below u
+        if end == 0:
+            return None
+        for pv, pu, item in self.buckets[end-1]:
+            if pu < u and pv < v and item not in exclude:
+                return item
+        ## all points in the buckets before end-1 are below u.
+        tree = self.tree
+        size = self.size
+        for node in self._nodes(end - 1):
+            if tree[node] >= v:
+                continue
+            stack = [node]
+            while stack:
+                i = stack.pop()
+                if tree[i] >= v:
+                    continue
+                if i < size:
+                    stack.append(2*i+1)
+                    stack.append(2*i)
+                    continue
+                for pv, pu, item in self.buckets[i - size]:
+                    if pv < v and item not in exclude:
+                        return item
+        return None
+
+    def blockers(self, u, v, exclude=()):
+        """Yields (item, u, v) of all points, other than those in exclude,
+           that lie strictly inside the cone of (u, v).
+        """
+        end = bisect.bisect_left(self.bounds, u)    # buckets before end have points below u
+        if end == 0:
+            return
+        for pv, pu, item in self.buckets[end-1]:
+            if pu < u and pv < v and item not in exclude:
+                yield item, pu, pv
+        ## all points in the buckets before end-1 are below u.
+        tree = self.tree
+        size = self.size
+        for node in self._nodes(end - 1):
+            stack = [node]
+            while stack:
+                i = stack.pop()
+                if tree[i] >= v:
+                    continue
+                if i < size:
+                    stack.append(2*i+1)
+                    stack.append(2*i)
+                    continue
+                for pv, pu, item in self.buckets[i - size]:
+                    if pv < v and item not in exclude:
+                        yield item, pu, pv
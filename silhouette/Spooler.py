@@ -0,0 +1,259 @@
+# (c) 2026 inkscape-silhouette contributors
+#
+# Spooler.py -- a persistent queue of compiled jobs for one device.
+#
+# Several Inkscape seats, or silhouette_multi, sending to the same cutter
+# would otherwise interleave their commands on the USB device. With a spool,
+# each job is compiled to the command stream it would send, with an offline
+# SilhouetteCameo, and queued on disk. One thread sends the queued streams to
+# the device, one after the other. Compiling happens in the service while
+# that thread sends the previous job, so the cutter does not wait for the
+# host between jobs.
+#
+# A job is stored as three files in the spool directory: NNNNNN.json with its
+# state, and the command streams NNNNNN.setup, from setup(), and NNNNNN.plot.
+# Jobs with a higher priority go first, otherwise the oldest. Among the next
+# jobs of the same priority, those with the same setup stream as the job just
+# sent go first, and their setup is not sent again. The streams are sent
+# with SilhouetteCameo.replay(), in small pieces, waiting for the device to be
+# ready after each, as a direct run does.
+#
+# With several devices in the pool, each has its own thread and takes the
+# jobs it fits, see DevicePool.PoolDevice.matches().
+#
+# The queue can be inspected and changed from the command line:
+#   python3 -m silhouette.Spooler list
+#   python3 -m silhouette.Spooler hold|release|cancel JOB...
+#   python3 -m silhouette.Spooler priority JOB N
+
+import json
+import os
+import sys
+import threading
+import time
+
+from silhouette.DevicePool import DevicePool
+
+QUEUED = "queued"
+HELD = "held"
+SENDING = "sending"
+FAILED = "failed"
+
+
+def spool_dir():
+    """The default spool directory, in $XDG_DATA_HOME."""
+    data_home = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(data_home, "inkscape-silhouette", "spool")
+
+
+class Spooler:
+    def __init__(self, path=None, pool=None, log=sys.stderr, poll=1.0):
+        """path is the spool directory, default spool_dir().
+           pool is the DevicePool to send to, default DevicePool.find()
+           when start() is called.
+        """
+        self.path = path or spool_dir()
+        os.makedirs(self.path, exist_ok=True)
+        self.pool = pool
+        self.log = log
+        self.poll = poll
+        self.queue_lock = threading.Lock()      # new job ids, taking jobs
+        self.wakeup = threading.Event()
+        self.threads = []
+        self.stopping = False
+
+    def _file(self, id, ext):
+        return os.path.join(self.path, "%06d.%s" % (id, ext))
+
+    def _save(self, job):
+        tmp = self._file(job["id"], "json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(job, f)
+        os.replace(tmp, self._file(job["id"], "json"))
+
+    def _write(self, id, ext, data):
+        tmp = self._file(id, ext + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._file(id, ext))
+
+    def _read(self, id, ext):
+        with open(self._file(id, ext), "rb") as f:
+            return f.read()
+
+    def jobs(self):
+        """All jobs in the spool, oldest first."""
+        jobs = []
+        for name in sorted(os.listdir(self.path)):
+            if name.endswith(".json"):
+                try:
+                    with open(os.path.join(self.path, name)) as f:
+                        jobs.append(json.load(f))
+                except (OSError, ValueError):
+                    pass    # removed or replaced meanwhile.
+        return jobs
+
+    def job(self, id):
+        with open(self._file(id, "json")) as f:
+            return json.load(f)
+
+    def add(self, setup, plot, priority=0, name="", hold=False, requires=None):
+        """Queue a job with the command streams setup and plot. Returns its id.
+           requires is for PoolDevice.matches().
+        """
+        with self.queue_lock:
+            ids = [job["id"] for job in self.jobs()]
+            id = max(ids) + 1 if ids else 1
+            self._write(id, "setup", setup)
+            self._write(id, "plot", plot)
+            self._save(dict(id=id, name=name, priority=priority, requires=requires or {},
+                            state=HELD if hold else QUEUED, created=time.time()))
+        self.wakeup.set()
+        return id
+
+    def _change(self, id, states, **changes):
+        job = self.job(id)
+        if job["state"] not in states:
+            raise ValueError("job %d is %s" % (id, job["state"]))
+        job.update(changes)
+        job.pop("note", None)
+        self._save(job)
+        self.wakeup.set()
+
+    def hold(self, id):
+        self._change(id, (QUEUED,), state=HELD)
+
+    def release(self, id):
+        self._change(id, (HELD, FAILED), state=QUEUED)
+
+    def set_priority(self, id, priority):
+        self._change(id, (QUEUED, HELD, FAILED), priority=priority)
+
+    def cancel(self, id):
+        """Remove a job that is not being sent."""
+        if self.job(id)["state"] == SENDING:
+            raise ValueError("job %d is %s" % (id, SENDING))
+        self._remove(id)
+
+    def _remove(self, id):
+        for ext in ("json", "setup", "plot"):
+            try:
+                os.remove(self._file(id, ext))
+            except OSError:
+                pass
+
+    def next_job(self, device):
+        """The job to send next to device, a PoolDevice. None if there is none queued."""
+        queued = [job for job in self.jobs()
+                  if job["state"] == QUEUED and device.matches(job.get("requires", {}))]
+        if not queued:
+            return None
+        top = max(job["priority"] for job in queued)
+        queued = [job for job in queued if job["priority"] == top]
+        if device.last_setup is not None:
+            for job in queued:
+                if self._read(job["id"], "setup") == device.last_setup:
+                    return job
+        return queued[0]
+
+    def send_next(self, device=None):
+        """Send the next job to device, default the first of the pool.
+           Returns its id, None if there is none.
+        """
+        if device is None:
+            device = self.pool.device()
+        with device.lock:
+            with self.queue_lock:
+                job = self.next_job(device)
+                if job is None:
+                    return None
+                job["state"] = SENDING
+                self._save(job)
+            try:
+                setup = self._read(job["id"], "setup")
+                plot = self._read(job["id"], "plot")
+                dev = device.open(log=self.log)
+                if setup == device.last_setup:
+                    print("spooler: job %d '%s' to %s, same setup as before" % (
+                        job["id"], job["name"], device.label()), file=self.log)
+                else:
+                    print("spooler: job %d '%s' to %s" % (job["id"], job["name"], device.label()), file=self.log)
+                    device.last_setup = None
+                    dev.replay(setup)
+                    device.last_setup = setup
+                dev.replay(plot)
+            except Exception as e:
+                print("spooler: job %d failed: %s" % (job["id"], e), file=self.log)
+                device.last_setup = None
+                device.close()
+                job["state"] = FAILED
+                job["note"] = str(e)
+                self._save(job)
+                raise
+            finally:
+                with self.pool.changed:
+                    self.pool.changed.notify_all()
+            self._remove(job["id"])
+            return job["id"]
+
+    def run(self, device):
+        """Send jobs to device as they come, until stop()."""
+        while not self.stopping:
+            try:
+                if self.send_next(device) is not None:
+                    continue
+            except Exception:
+                pass    # logged, and the job is kept as failed.
+            self.wakeup.wait(self.poll)      # also notices changes by other processes.
+            self.wakeup.clear()
+
+    def start(self):
+        """One thread for each device of the pool."""
+        if self.pool is None:
+            self.pool = DevicePool.find()
+        # a job that was being sent when we went down is only partly cut.
+        for job in self.jobs():
+            if job["state"] == SENDING:
+                job["state"] = HELD
+                job["note"] = "interrupted, check the media before releasing it"
+                self._save(job)
+        for device in self.pool.devices:
+            thread = threading.Thread(target=self.run, args=(device,),
+                                      name="spooler %s" % device.label(), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        self.stopping = True
+        self.wakeup.set()
+        for thread in self.threads:
+            thread.join()
+
+
+def main(argv):
+    spooler = Spooler()
+    if not argv or argv[0] == "list":
+        for job in spooler.jobs():
+            print("%6d  %-8s %4d  %s  %s%s" % (job["id"], job["state"], job["priority"],
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(job["created"])),
+                job["name"], "  (%s)" % job["note"] if "note" in job else ""))
+        return 0
+    cmd, args = argv[0], argv[1:]
+    try:
+        if cmd == "priority":
+            spooler.set_priority(int(args[0]), int(args[1]))
+        elif cmd in ("hold", "release", "cancel"):
+            for id in args:
+                getattr(spooler, cmd)(int(id))
+        else:
+            print("usage: python3 -m silhouette.Spooler [list | hold|release|cancel JOB... | priority JOB N]",
+                  file=sys.stderr)
+            return 2
+    except (OSError, ValueError, IndexError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
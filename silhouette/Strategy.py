@@ -30,12 +30,50 @@
 #                          Using .x, .y syntax provided by class XY_a() instead of [0], [1] everywhere.
 #                          ccw() and sharp_turn*() now global. No class needed.
 #                          Using class Barrier from Geomentry in the main loop of pyramids_barrier()
-
+# 2026-10-19, isc       -- points and segments live in numpy arrays instead of XY_a objects.
+#                          XY_a objects are only created for the output.
+#                          pyramids_barrier() completed, using ConeIndex from SpatialIndex
+#                          for the shadow checks. Selectable with preset 'pyramids'.
+#                          Disjoint Y bands of connected components can be cut
+#                          planned in parallel worker processes, see find_components().
+#                          euler_strokes() cuts line networks in few strokes, preset 'euler'.
+
+import bisect   # bisect_left
 import copy     # deepcopy
+import heapq
 import math     # sqrt
+import multiprocessing
+import os       # cpu_count
 import sys      # maxsize
 
+import numpy as np
+
 from silhouette.Geometry import *
+from silhouette.SpatialIndex import ConeIndex, PointGrid
+from silhouette.Intersections import find_intersections
+
+
+# bits in MatFree.flags
+PT_SHARP = 1    # a sharp turn somewhere at this point, see mark_sharp_segs()
+PT_SEEN  = 2    # some segment of this point was already cut
+PT_SUB   = 4    # added by subdividing a segment
+PT_DONE  = 8    # no more segments to cut at this point
+
+# MatFree.euler_strokes(): the circuit reached a point by a jump, not by a segment.
+JUMP = -1
+
+# fewer segments per worker process are not worth starting it for.
+# A segment A--B counts once here, MatFree.n_segs counts it in both directions.
+PARALLEL_MIN_SEGS = 2000
+
+
+def _grow(a, n):
+  """Returns a copy of array a with room for at least n rows, or a itself if it has."""
+  if n <= len(a):
+    return a
+  b = np.zeros((max(n, 2*len(a)),) + a.shape[1:], dtype=a.dtype)
+  b[:len(a)] = a
+  return b
 
 
 presets = {
@@ -60,6 +98,14 @@ presets = {
     'do_slicing': True,
     'verbose': 1
     },
+  'euler': {
+    'euler_algorithm': True,
+    'do_subdivide': False,
+    'sharp_turn_fwd_ratio': 0.0,
+    'overshoot': 0.2,     # works well with 80g paper
+    'tool_pen': False,
+    'verbose': 1
+    },
   'nop': {
     'do_dedup': False,
     'do_subdivide': False,
@@ -72,6 +118,12 @@ presets = {
 
 
 class MatFree:
+  ## the settings that plan_parallel() passes on to its workers.
+  _settings = ('verbose', 'do_dedup', 'do_subdivide', 'do_slicing', 'tool_pen',
+               'barrier_increment', 'overshoot', 'min_subdivide', 'min_subdivide_sq',
+               'min_segmentlen', 'monotone_back_travel', 'sharp_turn_fwd_ratio',
+               'input_scale', 'pyramids_algorithm', 'point_quantum', 'split_crossings')
+
   def __init__(self, preset="default", scale=1.0, pen=None):
     """This initializer defines settings for the apply() method.
        A scale factor is applied to convert input data units to mm.
@@ -90,6 +142,11 @@ class MatFree:
     self.sharp_turn_fwd_ratio = 0.99    # 0.5 == 63 deg, 1.0 == 45 deg
     self.input_scale = scale
     self.pyramids_algorithm = False
+    self.euler_algorithm = False        # see euler_strokes()
+    self.point_quantum = 0.0            # >0: points on the same multiple of this are the same point.
+    self.processes = 1                  # worker processes for disjoint Y bands, 0: one per cpu.
+    self.start_method = None            # how to start them, see multiprocessing.get_context().
+    self.split_crossings = False        # add a point where paths cross, see split_at_crossings().
 
     self.preset(preset)
 
@@ -101,9 +158,27 @@ class MatFree:
     # this avoids a busyloop after hitting Y_bar:
     if self.min_segmentlen < 0.001: self.min_segmentlen = 0.001
 
-    self.points = []
+    ## The point graph. Point i has coordinates xy[i], PT_* bits in flags[i], and
+    ## dup[i] counts how often it was added again. Its segments are the slots
+    ## seg_start[i] .. seg_start[i]+seg_len[i]-1 of seg_to (the other end) and
+    ## seg_done (True once the segment was cut). todo[i] counts its segments
+    ## not yet done.
+    self.n_points = 0
+    self.xy = np.zeros((256, 2))
+    self.flags = np.zeros(256, dtype=np.uint8)
+    self.dup = np.zeros(256, dtype=np.int32)
+    self.seg_start = np.zeros(256, dtype=np.intp)
+    self.seg_len = np.zeros(256, dtype=np.intp)
+    self.todo = np.zeros(256, dtype=np.intp)
+    self.n_segs = 0
+    self.seg_to = np.zeros(256, dtype=np.intp)
+    self.seg_done = np.zeros(256, dtype=bool)
     self.points_dict = {}
+    self._xy_a = {}
     self.paths = []
+    self.output = []
+    self.comp = None                    # see find_components()
+    self.comp_box = None
 
 
   def list_presets(self):
@@ -125,39 +200,92 @@ class MatFree:
        - 'sharp', it is present on nodes where the path turns by more
           than 90 deg.
     """
-    cut = []
-    for path in self.paths:
-      new_path = []
-      for pt in path:
-        new_path.append(self.points[pt])
-      cut.append(new_path)
-    return cut
+    return [[self.point(idx) for idx in path] for path in self.paths]
+
+
+  def point(self, idx):
+    """Returns point idx as an XY_a() object, with attributes id, and
+       sharp, seen, sub, dup where they apply.
+       The same object is returned for the same idx.
+    """
+    pt = self._xy_a.get(idx)
+    if pt is None:
+      pt = XY_a(tuple(self.xy[idx].tolist()))
+      pt.id = idx
+      self._xy_a[idx] = pt
+    f = self.flags[idx]
+    if f & PT_SHARP: pt.sharp = True
+    if f & PT_SEEN: pt.seen = True
+    if f & PT_SUB: pt.sub = True
+    if self.dup[idx]: pt.dup = int(self.dup[idx])
+    return pt
+
+
+  def add_point(self, x, y):
+    """Adds a new point without any segments and returns its index.
+       Use pt2idx() instead, to reuse an existing point at the same location.
+    """
+    idx = self.n_points
+    if idx == len(self.xy):
+      self.xy = _grow(self.xy, idx+1)
+      self.flags = _grow(self.flags, idx+1)
+      self.dup = _grow(self.dup, idx+1)
+      self.seg_start = _grow(self.seg_start, idx+1)
+      self.seg_len = _grow(self.seg_len, idx+1)
+      self.todo = _grow(self.todo, idx+1)
+    self.xy[idx] = (x, y)
+    self.n_points += 1
+    return idx
 
 
   def pt2idx(self, x,y):
     """all points have an index, if the index differs, the point
-       is at a different locations. All points also have attributes
-       stored with in the point object itself. Points that appear for the second
-       time receive an attribute 'dup':1, which is incremented on further reoccurences.
+       is at a different locations. Points are the same, if their coordinates
+       are equal, or with a point_quantum, if they round to the same multiple
+       of point_quantum. Points that appear for the second time get a dup
+       count of 1, which is incremented on further reoccurences.
     """
 
-    k = str(x)+','+str(y)
-    if k in self.points_dict:
-      idx = self.points_dict[k]
+    k = self._point_key(x, y)
+    idx = self.points_dict.get(k)
+    if idx is not None:
       if self.verbose:
         print("%d found as dup" % idx, file=sys.stderr)
-      if 'dup' in self.points[idx].attr:
-        self.points[idx].dup += 1
-      else:
-        self.points[idx].dup = 1
+      self.dup[idx] += 1
     else:
-      idx = len(self.points)
-      self.points.append(XY_a((x,y)))
+      idx = self.add_point(x, y)
       self.points_dict[k] = idx
-      self.points[idx].id = idx
     return idx
 
 
+  def _point_key(self, x, y):
+    if self.point_quantum > 0.0:
+      return (round(x/self.point_quantum), round(y/self.point_quantum))
+    return (x, y)
+
+
+  def segs(s, idx):
+    """The slots in seg_to and seg_done, that belong to the segments of point idx."""
+    start = int(s.seg_start[idx])
+    return range(start, start + int(s.seg_len[idx]))
+
+
+  def _slots(s, idx):
+    """For an array of point indices, returns the arrays (point, slot) listing
+       all segment slots of these points, in order.
+    """
+    lens = s.seg_len[idx]
+    total = int(lens.sum())
+    offs = np.cumsum(lens) - lens
+    slot = np.arange(total) + np.repeat(s.seg_start[idx] - offs, lens)
+    return np.repeat(idx, lens), slot
+
+
+  def _seg_key(s, A, B):
+    """A number for each segment [AB] that does not depend on its direction."""
+    return np.minimum(A, B) * s.n_points + np.maximum(A, B)
+
+
   def load(self, cut):
     """load a sequence of paths.
        Nodes are expected as tuples (x, y).
@@ -179,23 +307,169 @@ class MatFree:
       self.paths.append(new_path)
 
 
+  def split_at_crossings(s, eps=1e-6):
+    """Insert the points where segments cross into the paths, so that crossing
+       paths share a point there. Needs load(), before link_points().
+    """
+    xy = s.xy[:s.n_points].tolist()
+    segments = [(xy[a], xy[b]) for path in s.paths for a, b in zip(path, path[1:])]
+    crossings, overlaps = find_intersections(segments, eps)
+    if s.verbose:
+      print("split_at_crossings: %d crossings, %d overlaps" % (len(crossings), len(overlaps)), file=sys.stderr)
+    splits = {}
+    for x, y, i, j in crossings:
+      splits.setdefault(i, []).append((x, y))
+      splits.setdefault(j, []).append((x, y))
+    if not splits:
+      return
+
+    k = 0
+    for path_idx, path in enumerate(s.paths):
+      new_path = path[:1]
+      for B in path[1:]:
+        A = new_path[-1]
+        ax, ay = xy[A]
+        bx, by = xy[B]
+        for x, y in sorted(splits.get(k, ()), key=lambda p: (p[0]-ax)**2 + (p[1]-ay)**2):
+          ## only where the crossing is inside [AB]
+          if max(abs(x-ax), abs(y-ay)) > eps and max(abs(x-bx), abs(y-by)) > eps:
+            C = s.pt2idx(x, y)
+            if C != new_path[-1]:
+              new_path.append(C)
+        new_path.append(B)
+        k += 1
+      s.paths[path_idx] = new_path
+
+
   def link_points(s):
     """add segments (back and forth) between connected points.
+       The segments of each point are kept in the order of the paths.
     """
+    A = []
+    B = []
     for path in s.paths:
-      A = None
-      for pt in path:
-        if A is not None:
-          if 'seg' in s.points[A].attr:
-            s.points[A].seg.append(pt)
-          else:
-            s.points[A].seg = [ pt ]
+      A.extend(path[:-1])
+      B.extend(path[1:])
+    A = np.array(A, dtype=np.intp)
+    B = np.array(B, dtype=np.intp)
+    # each segment [AB] appears as A->B and B->A
+    src = np.column_stack((A, B)).ravel()
+    dst = np.column_stack((B, A)).ravel()
+    order = np.argsort(src, kind='stable')
+    n = s.n_points
+    counts = np.bincount(src, minlength=n)
+
+    s.n_segs = len(dst)
+    s.seg_to = dst[order]
+    s.seg_done = np.zeros(s.n_segs, dtype=bool)
+    s.seg_start[:n] = np.cumsum(counts) - counts
+    s.seg_len[:n] = counts
+    s.todo[:n] = counts
+
+
+  def find_components(s):
+    """Label the connected components of the point graph, after link_points().
+       Point i belongs to component comp[i], components are numbered in the order
+       of their lowest point index. comp_box[c] is (min_x, min_y, max_x, max_y)
+       of component c.
+    """
+    n = s.n_points
+    A = np.repeat(np.arange(n), s.seg_len[:n])
+    B = s.seg_to[:s.n_segs]
+    ## each point points to a smaller (or the same) point of its component.
+    ## Hook the roots of both ends of each segment together, then shortcut
+    ## the pointers, until all segments have both ends on the same root.
+    label = np.arange(n)
+    while True:
+      la, lb = label[A], label[B]
+      differ = la != lb
+      if not differ.any():
+        break
+      np.minimum.at(label, np.maximum(la, lb)[differ], np.minimum(la, lb)[differ])
+      while True:
+        up = label[label]
+        if (up == label).all():
+          break
+        label = up
+    roots, s.comp = np.unique(label, return_inverse=True)
+    xy = s.xy[:n]
+    k = len(roots)
+    box = np.empty((k, 4))
+    box[:, 0:2] = np.inf
+    box[:, 2:4] = -np.inf
+    np.minimum.at(box[:, 0], s.comp, xy[:, 0])
+    np.minimum.at(box[:, 1], s.comp, xy[:, 1])
+    np.maximum.at(box[:, 2], s.comp, xy[:, 0])
+    np.maximum.at(box[:, 3], s.comp, xy[:, 1])
+    s.comp_box = box
+
+
+  def band_jobs(s, count):
+    """Group the components into Y bands that do not overlap, bottom up.
+       Components overlapping in y are in the same band. Consecutive bands
+       are merged into about count jobs of similar size.
+       Returns a list of (points, paths): the point indices of the job, and
+       its paths with indices into points.
+    """
+    box = s.comp_box
+    order = np.argsort(box[:, 1], kind='stable')
+    top = np.maximum.accumulate(box[order, 3])
+    ## a new band starts at each component above everything before it.
+    new_band = np.concatenate(([True], box[order[1:], 1] > top[:-1]))
+    band = np.empty(len(box), dtype=np.intp)
+    band[order] = np.cumsum(new_band) - 1
+
+    ## a job takes the bands that start in its share of the segments.
+    segs = np.bincount(band[s.comp], weights=s.seg_len[:s.n_points], minlength=int(new_band.sum()))
+    share = max(segs.sum() / max(count, 1), 1.0)
+    _, job = np.unique(((np.cumsum(segs) - segs) // share).astype(np.intp), return_inverse=True)
+    job_of_pt = job[band[s.comp]]
+
+    jobs = []
+    local = np.empty(s.n_points, dtype=np.intp)
+    for j in range(int(job.max()) + 1 if len(job) else 0):
+      pts = np.flatnonzero(job_of_pt == j)
+      local[pts] = np.arange(len(pts))
+      paths = [local[path].tolist() for path in s.paths if len(path) and job_of_pt[path[0]] == j]
+      jobs.append((pts, paths))
+    return jobs
+
+
+  def plan_parallel(s):
+    """Run the barrier on disjoint Y bands in worker processes, and merge
+       the results bottom up, as the rollers need them. Needs mark_sharp_segs().
+       Returns False, if there is nothing to gain (or no worker processes),
+       the caller then runs the barrier itself.
+    """
+    processes = s.processes or os.cpu_count() or 1
+    segs = s.n_segs // 2
+    if processes < 2 or not s.do_slicing or segs < 2*PARALLEL_MIN_SEGS:
+      return False
+    s.find_components()
+    jobs = s.band_jobs(min(processes, segs // PARALLEL_MIN_SEGS))
+    if len(jobs) < 2:
+      return False
+    settings = {k: getattr(s, k) for k in s._settings}
+    work = [(settings, s.xy[pts], s.flags[pts], s.dup[pts], paths) for pts, paths in jobs]
+    try:
+      with multiprocessing.get_context(s.start_method).Pool(processes=min(processes, len(jobs))) as pool:
+        results = pool.starmap(_plan_job, work)
+    except (OSError, ValueError, ImportError, AssertionError) as e:
+      ## AssertionError: daemonic processes, e.g. a StrategyAuto worker, cannot have children.
+      if s.verbose:
+        print("plan_parallel: no worker processes (%s)" % e, file=sys.stderr)
+      return False
+    if s.verbose:
+      print("plan_parallel: %d jobs in %d processes" % (len(jobs), processes), file=sys.stderr)
 
-          if 'seg' in s.points[pt].attr:
-            s.points[pt].seg.append(A)
-          else:
-            s.points[pt].seg = [ A ]
-        A = pt
+    s.output = []
+    for (pts, paths), (output, xy, flags) in zip(jobs, results):
+      ## points added by the worker get new indices here.
+      added = [s.add_point(x, y) for x, y in xy[len(pts):].tolist()]
+      glob = np.concatenate((pts, np.array(added, dtype=np.intp)))
+      s.flags[glob] = flags
+      s.output.extend(glob[path].tolist() for path in output)
+    return True
 
 
   def subdivide_segments(s, maxlen):
@@ -211,23 +485,25 @@ class MatFree:
       for pt in path:
         if len(new_path):
           A = new_path[-1]
-          dist_a_pt_sq = dist_sq(s.points[A], s.points[pt])
+          ax, ay = s.xy[A].tolist()
+          px, py = s.xy[pt].tolist()
+          dist_a_pt_sq = (px-ax)*(px-ax) + (py-ay)*(py-ay)
           if dist_a_pt_sq > maxlen_sq:
             dist = math.sqrt(dist_a_pt_sq)
             nsub = int(dist/maxlen)
             seg_len = dist/float(nsub+1)
-            dx = (s.points[pt].x - s.points[A].x)/float(nsub+1)
-            dy = (s.points[pt].y - s.points[A].y)/float(nsub+1)
+            dx = (px - ax)/float(nsub+1)
+            dy = (py - ay)/float(nsub+1)
             if s.verbose > 1:
               print("pt%d -- pt%d: need nsub=%d, seg_len=%g" % (A,pt,nsub,seg_len), file=sys.stderr)
-              print("dxdy", dx, dy, "to", (s.points[pt].x, s.points[pt].y), "from", (s.points[A].x,s.points[A].y), file=sys.stderr)
+              print("dxdy", dx, dy, "to", (px, py), "from", (ax, ay), file=sys.stderr)
             for subdiv in range(nsub):
-              sub_pt =s.pt2idx(s.points[A].x+dx+subdiv*dx,
-                               s.points[A].y+dy+subdiv*dy)
+              sub_pt =s.pt2idx(ax+dx+subdiv*dx,
+                               ay+dy+subdiv*dy)
               new_path.append(sub_pt)
-              s.points[sub_pt].sub = True
+              s.flags[sub_pt] |= PT_SUB
               if s.verbose > 1:
-                print("   sub", (s.points[sub_pt].x, s.points[sub_pt].y), file=sys.stderr)
+                print("   sub", tuple(s.xy[sub_pt].tolist()), file=sys.stderr)
         new_path.append(pt)
       s.paths[path_idx] = new_path
 
@@ -243,32 +519,22 @@ class MatFree:
        TODO: can honor corner_detect_min_jump? Even if so, what should we do in the case
        where multiple points are so close together that the paper is likely to tear?
     """
-    for pt in s.points:
-      if 'sharp' in pt.attr:
-        ## shortcut existing flags. One sharp turn per point is enough to make us careful.
-        ## we don't want to track which pair of turns actually is a sharp turn, if there
-        ## are more than two segments per point. Those cases are rare enough
-        ## to handle them inefficiently.
-        continue
-      if 'seg' in pt.attr:
-        ll = len(pt.seg)
-        # if ll > 4:
-        #   ## You cannot attach 5 lines to a point without creating one sharp angle.
-        #   ## This is true for sharp turn defined as >90 degree.
-        #   pt.sharp = True
-        #   continue
-        ## look at each pair of segments once, check their angle.
-        for l1 in range(ll):
-          A = s.points[pt.seg[l1]]
-          for l2 in range(l1+1, ll):
-            B = s.points[pt.seg[l2]]
-            if sharp_turn(A,pt,B, s.sharp_turn_fwd_ratio):
-              pt.sharp = True
-          if 'sharp' in pt.attr:
-            break
-      else:
-        print("warning: no segments in point %d. Run link_points() before mark_sharp_segs()" % (pt.id), file=sys.stderr)
+    n = s.n_points
+    for idx in np.flatnonzero(s.seg_len[:n] == 0).tolist():
+      print("warning: no segments in point %d. Run link_points() before mark_sharp_segs()" % (idx), file=sys.stderr)
 
+    ## look at each pair of segments of a point once, check their angle.
+    ## Points with k segments have k*(k-1)/2 pairs. Existing flags stay.
+    pt, slot = s._slots(np.flatnonzero((s.seg_len[:n] > 1) & ((s.flags[:n] & PT_SHARP) == 0)))
+    cnt = s.seg_start[pt] + s.seg_len[pt] - 1 - slot     # later slots of the same point
+    first = np.repeat(slot, cnt)
+    offs = np.cumsum(cnt) - cnt
+    second = first + 1 + np.arange(len(first)) - np.repeat(offs, cnt)
+    pt = np.repeat(pt, cnt)
+
+    xy = s.xy
+    sharp = sharp_turn_batch(xy[s.seg_to[first]], xy[pt], xy[s.seg_to[second]], s.sharp_turn_fwd_ratio)
+    s.flags[np.unique(pt[sharp])] |= PT_SHARP
 
 
   def mark_sharp_paths(s):
@@ -291,19 +557,19 @@ class MatFree:
     A = None
     B = None
     for path in s.paths:
-      if B is not None and len(path) and dist_sq(B, s.points[path[0]]) > min_jump_sq:
+      if B is not None and len(path) and dist_sq(B, s.point(path[0])) > min_jump_sq:
         # disconnect the path, if we jump more than 2mm
         A = None
         B = None
 
       for iC in path:
-        C = s.points[iC]
+        C = s.point(iC)
         if B is not None and dist_sq(B,C) < dup_eps_sq:
           # less than 0.1 mm distance: ignore the point as a duplicate.
           continue
 
         if A is not None and sharp_turn(A,B,C, s.sharp_turn_fwd_ratio):
-          B.sharp = True
+          s.flags[B.id] |= PT_SHARP
 
         A = B
         B = C
@@ -319,16 +585,17 @@ class MatFree:
        the previous segment if it would help. (FIXME: this possibility should
        be detected earlier)
        Otherwise, the segment is appended as a new path.
+       Segments and output paths are lists of point indices.
     """
-    if not 'output' in s.__dict__: s.output = []
     if len(s.output) and s.verbose > 1:
       print("append_or_extend_hard...", s.output[-1][-1], seg, file=sys.stderr)
-    if (len(s.output) > 0 and len(s.output[-1]) >= 2 and
-         'sharp' not in s.output[-1][0] and
-         'sharp' not in s.output[-1][-1]):
+    ## The endpoints are not checked for sharp turns here: the original check
+    ## looked for 'sharp' in the coordinate tuples and never matched.
+    ## Checking now would change the cut order, so it stays that way.
+    if len(s.output) > 0 and len(s.output[-1]) >= 2:
       # we could flip around the previous segment, if needed:
-      if (s.output[-1][0].id == seg[0].id or
-          s.output[-1][0].id == seg[-1].id):
+      if (s.output[-1][0] == seg[0] or
+          s.output[-1][0] == seg[-1]):
         # yes, flipping the previous segment, will help below. do it.
         s.output[-1] = list(reversed(s.output[-1]))
         if s.verbose:
@@ -336,13 +603,13 @@ class MatFree:
       #
     #
 
-    if len(s.output) > 0 and s.output[-1][-1].id == seg[0].id:
+    if len(s.output) > 0 and s.output[-1][-1] == seg[0]:
       s.output[-1].extend(seg[1:])
       if s.verbose > 1:
         print("... extend", file=sys.stderr)
-    elif len(s.output) > 0 and s.output[-1][-1].id == seg[-1].id:
+    elif len(s.output) > 0 and s.output[-1][-1] == seg[-1]:
       ## check if we can turn it around
-      if 'sharp' not in s.output[-1][-1].attr and 'sharp' not in seg[-1].attr and 'sharp' not in seg[0].attr:
+      if not (s.flags[s.output[-1][-1]] & PT_SHARP or s.flags[seg[-1]] & PT_SHARP or s.flags[seg[0]] & PT_SHARP):
         s.output[-1].extend(list(reversed(seg))[1:])
         if s.verbose > 1:
           print("... extend reveresed", file=sys.stderr)
@@ -363,12 +630,12 @@ class MatFree:
        if the last point if the previous segment is identical with our first
        point.
        Otherwise, the segment is appended as a new path.
+       Segments and output paths are lists of point indices.
     """
-    if not 'output' in s.__dict__: s.output = []
     if len(s.output) and s.verbose > 2:
       print("append_or_extend_simple...", s.output[-1][-1], seg, file=sys.stderr)
 
-    if len(s.output) > 0 and s.output[-1][-1].id == seg[0].id:
+    if len(s.output) > 0 and s.output[-1][-1] == seg[0]:
       s.output[-1].extend(seg[1:])
       if s.verbose > 1:
         print("... extend", file=sys.stderr)
@@ -379,153 +646,125 @@ class MatFree:
     #
 
 
-  def unlink_segment(s, A, B):
-    """Remove the segment [AB] from the s.points list.
-       The segment is removed, by replacing its slot with a negative number.
-       The endpoints are marked with seen=True so that in case of a sharp turn,
+  def unlink_segment(s, iA, iB):
+    """Mark the segment [AB] between the points with index iA and iB as done.
+       All segments between A and B are done, if there are several.
+       The endpoints are marked PT_SEEN so that in case of a sharp turn,
        we know we can no longer start there.
-       If now A or B are without other active segments, A and/or B are dropped
-       entirely from s.points .
+       If now A or B are without other active segments, A and/or B are
+       marked PT_DONE.
 
        process_simple_barrier() and process_pyramids_barrier() ignore points and segments
        that have already been done. This asserts progress in the algorithms.
     """
-    A.seen = True
-    B.seen = True
-    iA = A.id
-    iB = B.id
-    a_seg_todo = False
-    b_seg_todo = False
-    for iS in range(len(A.seg)):
-      if A.seg[iS] == iB: A.seg[iS] = -iB or -sys.maxsize
-      if A.seg[iS] >= 0: a_seg_todo = True
-    for iS in range(len(B.seg)):
-      if B.seg[iS] == iA: B.seg[iS] = -iA or -sys.maxsize
-      if B.seg[iS] >= 0: b_seg_todo = True
+    for P, Q in ((iA, iB), (iB, iA)):
+      s.flags[P] |= PT_SEEN
+      for j in s.segs(P):
+        if s.seg_to[j] == Q and not s.seg_done[j]:
+          s.seg_done[j] = True
+          s.todo[P] -= 1
+      if s.todo[P] == 0:
+        s.flags[P] |= PT_DONE
+
 
-    # CAUTION: is this really helpful?:
-    ## it prevents points from a slice to go into process_simple_barrier()'s segment list,
-    ## but it also hides information....
-    if not a_seg_todo: s.points[iA] = None
-    if not b_seg_todo: s.points[iB] = None
 
+  def find_seg(self, iA, iB):
+    """Returns the slot of the first active segment from point iA to point iB, or None."""
+    for j in self.segs(iA):
+      if self.seg_to[j] == iB and not self.seg_done[j]:
+        return j
+    return None
 
 
   def shortcut_segment(self, A, B, C):
-    """ Asuming [AC],[CB] are segments (in A.seg, B.seg, C.seg)
+    """ Asuming [AC],[CB] are segments (of points A, B, C)
         we remove C as the intermediate link and direcly connect [AB]
-        This removes C from self.points (by replacing with None) if
-        C has no other segments.
+        This marks C as PT_DONE if C has no other segments.
         This is the opposite of subdivide_segment()
     """
-    a_seg_idx = None
-    for n in range(0,len(A.seg)):
-      if A.seg[n] == C.id:
-        a_seg_idx = n
-        break
-    b_seg_idx = None
-    for n in range(0,len(B.seg)):
-      if B.seg[n] == C.id:
-        b_seg_idx = n
-        break
-    c_a_seg_idx = None
-    for n in range(0,len(C.seg)):
-      if C.seg[n] == A.id:
-        c_a_seg_idx = n
-        break
-    c_b_seg_idx = None
-    for n in range(0,len(C.seg)):
-      if C.seg[n] == B.id:
-        c_b_seg_idx = n
-        break
+    a_seg_idx = self.find_seg(A.id, C.id)
+    b_seg_idx = self.find_seg(B.id, C.id)
+    c_a_seg_idx = self.find_seg(C.id, A.id)
+    c_b_seg_idx = self.find_seg(C.id, B.id)
     if None in (a_seg_idx, b_seg_idx, c_a_seg_idx, c_b_seg_idx):
       raise ValueError("shortcut_segment cannot find [AC] and [CB] seg.", a_seg_idx, b_seg_idx, c_a_seg_idx, c_b_seg_idx)
-    A.seg[a_seg_idx] = B.id
-    B.seg[b_seg_idx] = A.id
-    C.seg[c_a_seg_idx] = -A.id or -sys.maxsize
-    C.seg[c_b_seg_idx] = -B.id or -sys.maxsize
-    if len(C.seg) == 2:
-      C.attr['obsolete'] = True
-      self.points[C.id] = None
-      print("shortcut_segment: point C obsoleted. A,B,C:", A, B, C, C.att(), file=sys.stderr)
+    self.seg_to[a_seg_idx] = B.id
+    self.seg_to[b_seg_idx] = A.id
+    self.seg_done[c_a_seg_idx] = True
+    self.seg_done[c_b_seg_idx] = True
+    self.todo[C.id] -= 2
+    if self.seg_len[C.id] == 2:
+      self.flags[C.id] |= PT_DONE
+      if self.verbose:
+        print("shortcut_segment: point C obsoleted. A,B,C:", A, B, C, C.att(), file=sys.stderr)
 
 
   def subdivide_segment(self, A, B, C):
-    """ Asuming [AB] is a segment (A.seg has B and B.seg has A),
+    """ Asuming [AB] is a segment (A and B are linked),
         we insert C as an intermediate link [AC],[CB].
-        This also adds C to self.points .
+        This also adds C as a new point.
         Returns True, if subdivision was done.
         Returns False, if [AB] was shorter than min_subdivide.
     """
-    print("subdivide_segment A,B,C: ", A,A.att(), B,B.att(), C,C.att(), file=sys.stderr)
+    if self.verbose:
+      print("subdivide_segment A,B,C: ", A,A.att(), B,B.att(), C,C.att(), file=sys.stderr)
     if dist_sq(A, B) < self.min_subdivide_sq:
-      print(" ---- too short, nothing done.", file=sys.stderr)
-      # should be caught earlier!
-      sys.exit(0)
-
-    a_seg_idx = None
-    for n in range(0,len(A.seg)):
-      if A.seg[n] == B.id:
-        a_seg_idx = n
-        break
+      if self.verbose:
+        print(" ---- too short, nothing done.", file=sys.stderr)
+      return False
 
-    b_seg_idx = None
-    for n in range(0,len(B.seg)):
-      if B.seg[n] == A.id:
-        b_seg_idx = n
-        break
+    a_seg_idx = self.find_seg(A.id, B.id)
+    b_seg_idx = self.find_seg(B.id, A.id)
     if b_seg_idx is None or a_seg_idx is None:
       raise ValueError("A,B not linked???")
-    C.sub = True
-    C.id = len(self.points)
-    self.points.append(C)
-    A.seg[a_seg_idx] = C.id
-    B.seg[b_seg_idx] = C.id
-    C.seg = [A.id,B.id]
+    C.id = self.add_point(C.x, C.y)
+    self.flags[C.id] |= PT_SUB
+    self._xy_a[C.id] = C
+    self.seg_to[a_seg_idx] = C.id
+    self.seg_to[b_seg_idx] = C.id
+    # the two segments of C go to the end of seg_to.
+    n = self.n_segs
+    self.seg_to = _grow(self.seg_to, n+2)
+    self.seg_done = _grow(self.seg_done, n+2)
+    self.seg_to[n:n+2] = (A.id, B.id)
+    self.seg_start[C.id] = n
+    self.seg_len[C.id] = 2
+    self.todo[C.id] = 2
+    self.n_segs = n+2
     return True
 
 
-  def output_add(s, A, B, cut=False):
-    """If cut=True, output the segment [AB] as a cut.
-       Otherwise jump to B, starting a new path there.
-       A is passed so that we can check that this is really the last point
-       we have visited. If not, a jump to A is inserted, before the cut.
-       If cut is False, we can directly jump the output list to B.
-
-       This is a simpler version of append_or_extend_simple(), which recombines
-       segments, into paths. We don't.
-
-       Caller is responsible to postprocess afterwards:
-       * remove pathological short segments.
-       * flip segments so that we can
-       * recombine segments into paths.
+  def output_segment(s, A, B, append=None):
+    """Cut the segment [AB] between the points with index A and B, from A
+       to B unless the sharp corners say otherwise:
+       If one end has 'sharp' (and 'seen'), the other not, then cut towards
+       the 'sharp' end. If both have it, we add the midpoint M, and cut from M
+       to A, then from M to B. (sharp is irrelevent without 'seen')
+       append merges the cut into the output paths, it defaults to
+       append_or_extend_hard().
     """
-    if not 'output' in s.__dict__: s.output = []
-    if s.verbose >= 1:
-      if len(s.output):
-        print("output_add", s.output[-1][-1], A, B, file=sys.stderr)
-      else:
-        print("output_add", None, A, B, file=sys.stderr)
-    #
-    print("\t....................................", file=sys.stderr)
-    if len(s.output) > 30:
-      sys.exit(2)
-
-    if cut:
-      s.output.append([A,B])
-    else:
-      s.output.append([A])      # quite useless....
-      s.output.append([B])
+    if append is None: append = s.append_or_extend_hard
+    sharp_seen = PT_SHARP | PT_SEEN
+    if s.flags[A] & sharp_seen == sharp_seen:
+      if s.flags[B] & sharp_seen == sharp_seen:                 # both sharp
+        ax, ay = s.xy[A].tolist()
+        bx, by = s.xy[B].tolist()
+        M = s.pt2idx((ax+bx)*.5, (ay+by)*.5 )
+        append([M, A])
+        append([M, B])
+      else:                                                     # only A sharp
+        append([B, A])
+    else:                                                       # B sharp or none
+      append([A, B])
 
 
   def _dump_all(s):
     """ dump all points in a readable way.
     """
-    for iP in range(0,len(s.points)):
-      pt = s.points[iP]
-      if pt is None: continue
-      a = pt.att() if pt else None
-      print(iP, ": ", pt, a)
+    for iP in range(0,s.n_points):
+      if s.flags[iP] & PT_DONE: continue
+      pt = s.point(iP)
+      print(iP, ": ", pt, pt.att(), s.seg_to[s.segs(iP)][~s.seg_done[s.segs(iP)]])
 
 
   def process_pyramids_barrier(s, y_slice, max_y, left2right=True):
@@ -535,247 +774,90 @@ class MatFree:
         transport rollers are) with 2x 45 degree coming from both sides,
         meeting at 90 degrees at point A, so that the inside of the
         triangle is free of any cuts.
+        For a segment [AB], the triangles of all its points are covered by
+        the triangle of one apex point, that is 45 degrees below both A and B.
+        The segment is shadowed, if any other point that still has segments
+        todo lies inside that triangle. s.cones is a ConeIndex of all such
+        points, it finds one of them in O(log n).
+
+        A horizontal barrier Y_bar at max_y limits our downwards movement
+        temporarily. Only segments with both ends above max_y are cut.
+        We assume to be called again with lowered Y_bar (increased max_y, it counts downwards),
+        and with the points that the lowered Y_bar has passed.
+
+        The points of y_slice are visited in the order given by the caller.
+        This is a forward slanted 45 degree barrier Xf_bar that is swept
+        sideways: left to right if left2right, otherwise right to left.
+        From each point, pyramids_chain() follows segments as long as they
+        are not shadowed. A shadowed segment waits for the point D that shadows
+        it: when D has no more segments todo, the segment is tried again.
+
+        Returns the number of segments cut.
+    """
+    if s.verbose:
+      print("process_pyramids_barrier limit=%g, points=%d, left2right=%s" % (max_y, len(y_slice), left2right), file=sys.stderr)
+    cut = 0
+    for A in y_slice:
+      cut += s.pyramids_chain(int(A), max_y, left2right)
+    return cut
 
-        We prefer to cut away from the rollers, if possible, but that is
-        subordinate rule -- applicable, whenever the cut direction can
-        be freely chosen. If point A is already part of a cut, then we cut the
-        path A-B always towards A, never starting at A.
-
-        A horizontal barrier Y_bar exists, that limits our downwards movement temporarily.
-        We assume to be called again with lowered Y_bar (increased max_y, it counts downwards).
-
-        Another barrier Xf_bar is a forward slanted 45 degree barrier that is swept sideways.
-        Points become eligible, if they are above Y_bar and behind Xf_bar.
-
-        We start with the sideways barrier from left to right aka increasing x.
-        In this case 'behind' means to the left of Xf_bar. (Every second sweep
-        will be the opposite direction, but below only left to right is
-        discussed).
-        The very first point that is behind Xf_bar is the starting point A. Then we iterate:
-
-        From any previous point A, we prefer to follow a line segment to reach
-        the next point B.  Segments are eligible, if their B is rightward from A,
-        (B.x greater or equal A.x). We chose the segment with the lowest B.y coordinate
-        if there is any choice and check the following conditions:
-
-        a) B is below Y_bar.
-           Compute point C as the intersection of Y_bar with [AB]. Replace
-           the segment [AB] by segments [AC], [CB]. Let B and C swap names.
-        b) B is 45 degrees or more downwards from A (B.x-A.x < B.y-A.y)
-           We make an extra check to see if B would overshadow any point in the other
-           direction. Temporarily apply a backwards slanted barrier Xb_bar in A.
-           While moving the barrier to B, stop at the first point D to the left of AB
-           (i.e. ccw(A,B,D) == True) it hits, if any.
-           If so, position Xb_bar in D, compute point E as the intersection of Xb_bar
-           with A-B. Replace the segment [AB] by segments [AE], [EB].
-           If we have a point C remembered from a), then replace segments [EB], [BC] with [EC]
-           and garbage collect point B and swap back roles B and C.
-           Let B and E swap names.
-        c) B is more than 45 degrees upwards from A. This overshadows A. But we ignore
-           that A may have more segments to be done. We keep that B and consider
-           the issue with A unsolvable.
-           Note that 'advancing' from A to B in this case is actually backwards in
-           Xf_bar's view.
-
-        If we now have no B, then we simply move the sideways barrier to reveal our
-        next A -- very likely a jump rather than a cut. If no todo segments are left in
-        the old A, drop that old A. Iterate.
-
-        But if we have a B and it is not case c), then we tentatively advance Xf_bar
-        from A to B and record all new points F[] in the order we pass them. We
-        don't care about them, if they are all 'below' (on the right hand side
-        of) segment [AB].  For the first point F, that has ccw(A,B,F) == True,
-        we position Xf_bar in F, if any.  If so, we compute point G as the
-        intersection of Xf_bar with [AB]. Replace the segment [AB] by segments
-        [AG], [GB]. We cut segment [AG]. We make F our next A - very likely a
-        jump.  If no todo segments are left in the old A, drop that old A.
-        Iterate.
-
-        Exception for all subdivide actions above: if the segment is shorter than
-        self.min_subdivide, then just keep it as is.
-        If subdividing produces segments shorter than self.min_segmentlen, then we later
-        garbage collect such segments. overshoot shoud be more than min_segmentlen to
-        compensate for this.
-
-        If iteration exhausts, we are done with this processing sweep and
-        report back the lowest remaining min_y coordinate of all points we left
-        behind with segments todo. The next sweep will go the other direction.
-
-        Caller should call us again with direction toggled the other way, and
-        possibly advancing max_y = min_y + monotone_back_travel. The
-        variable barrier_increment is not used here, as we compute the
-        increment.
-
-        In the above context, 'cutting' a segment means, to add it to the output
-        list to deactivate its seg[] entries in the endpoints. Endpoints
-        without active segments do not contribute to the min_y computation
-        above, they are dropped.
-
-        When all points are dropped, we did our final sweep and return min_y =
-        None.  It is caller's responsibility to check the direction of each cut
-        in the s.output list with regards to sharp points and cutting-towards-the-rollers.
-
-        Assert that we cut at least one segment per sweep or drop at least one
-        point per sweep.  Also the number of added segments and points should
-        be less than what we eventually output and drop.
-        If not, the above algorithm may never end.
-
-    """
-    Xf_bar = Barrier(y_slice, key=lambda a:  a[0]+a[1] if a else 0) # forward:   / moving ->
-    Xb_bar = Barrier(y_slice, key=lambda a: -a[0]+a[1] if a else 0) # backwards: \ moving <-
-
-    if not left2right:                                        # forward:   \ moving <-
-      Xf_bar,Xb_bar = Xb_bar,Xf_bar                           # backwards: / moving ->
-
-    A = Xf_bar.point()
+
+  def pyramids_chain(s, A, max_y, left2right=True):
+    """Cut segments starting at point A, then continue at their other end.
+       Segments in the sweep direction (B.x greater or equal A.x when left2right)
+       are preferred, the most upward first.
+       Afterwards, the segments that were waiting for points that are now
+       done are tried again. Returns the number of segments cut.
+    """
+    cut = 0
+    seg_to, seg_done, waiting, cones = s.seg_to, s.seg_done, s.waiting, s.cones
     while True:
-      if A is None:
-        Ai = Xf_bar.next()
-        if Ai is None: break
-        A = Xf_bar.point()
-        continue
-      print("process_pyramids_barrier", left2right, A, A.att(), file=sys.stderr)
-
-      B = None
-      a_todo = 0
-      for Bi in A.seg:
-        if Bi >= 0:                              # segment already done
-          a_todo += 1
-          pt = s.points[Bi]
-          if A.y+s.min_segmentlen >= max_y and pt.y > A.y:
-            continue                             # Do not look downward when close to max_y.
-                                                 # This avoids a busyloop after hitting Y_bar:
-                                                 # ... subdiv, advance, retry, hit, subdiv, ...
-          if left2right:
-            if pt.x >= A.x:
-              if B is None or not ccw(A,B,pt):   # find the leftmost of all [AB]
-                B = pt
-          else: # not left2right
-            if pt.x <= A.x:
-              if B is None or ccw(A,B,pt):       # find the rightmost of all [AB]
-                B = pt
-
-      if B is None:
-        print("no more forward segments", A, a_todo)
-        Xb_bar.find(A, start=0)
-        if a_todo == 0:
-          s.points[A.id] = None                 # drop A
-        while True:
-          Ai = Xf_bar.next()
-          A = None
-          print("xx next Ai candidate", Ai, file=sys.stderr)
-          if Ai is None: break
-          A = Xf_bar.point()
-          print("xx next A candidate", A, file=sys.stderr)
-          if A is None: break
-          if not Xb_bar.ahead(A):
+      while A is not None:
+        xy = s.xy                       # output_segment() may add points.
+        ax, ay = xy[A].tolist()
+        cand = []
+        for j in s.segs(A):
+          if seg_done[j]: continue
+          b = int(seg_to[j])
+          if ((A, b) if A < b else (b, A)) in waiting: continue
+          bx, by = xy[b].tolist()
+          if by > max_y: continue
+          backwards = (bx < ax) if left2right else (bx > ax)
+          cand.append((backwards, (by-ay)/(math.hypot(bx-ax, by-ay) or 1.0), b, bx, by))
+        if len(cand) > 1: cand.sort()
+        B = None
+        for _, _, b, bx, by in cand:
+          D = cones.blocker(max(ax+ay, bx+by), max(ay-ax, by-bx), (A, b))
+          if D is None:
+            B = b
             break
-          else:
-            print("process_pyramids_barrier jump: Ignored A, ahead of Xb_bar", A, file=sys.stderr)
-        print("process_pyramids_barrier jump to next A", A, file=sys.stderr)
-        continue                                # just advance Xf_bar: jump
-      print("segment to check a), b)", A, B)
-
-      if False:                                  # fake to trigger check a)
-        b_id = B.id
-        B = XY_a((1.3,20-2.1))
-        B.id = b_id
-        B.seg = [1,2,A.id,3,4]
-        print("faked segment to check a), b)", A, B)
-      #
-
-      subdividable_ab = bool(dist_sq(A,B) > s.min_subdivide_sq)
-
-      C = None
-      E = None
-      if subdividable_ab and B.y > max_y:        # check a)
-        C = XY_a((intersect_y(A,B, max_y), max_y))
-        ## same, but more expensive:
-        # C2 = intersect_lines(A,B,XY_a((0,max_y)),XY_a((.5,max_y)))
-        print("B below barrier, C=", C)
-        s.subdivide_segment(A,B,C)
-        Xf_bar.insert(C)
-        Xb_bar.insert(C)
-        B,C = C,B
-        # print(A.seg, B.seg, C.seg)
-      #
+          if s.verbose > 1:
+            print("   shadowed", A, b, "by", D, file=sys.stderr)
+          waiting.add((A, b) if A < b else (b, A))
+          s.waiters.setdefault(D, []).append((A, b))
+        if B is not None:
+          s.pyramids_cut(A, B)
+          cut += 1
+        A = B
+      if not s.ready:
+        return cut
+      A, B = s.ready.pop()
+      waiting.discard((A, B) if A < B else (B, A))
 
-      # All of the following shortens [AB] sufficiently, so that B does not
-      # cast shadow upwards on any other point: \B/
-      # Such a point would become our B.
-      # This asserts that there is no other point, whose pyramid would bury B.
-
-      # check b)
-      if (subdividable_ab and (
-          (left2right and B.x-A.x < B.y-A.y) or (not left2right and A.x-B.x < B.y-A.y))):
-        Xb_a_idx = Xb_bar.find(A, start=0)      # could also use lookup() here. It does not matter.
-        Xb_b_idx = Xb_bar.find(B)               # could also use lookup() here. It does not matter.
-        print("check b), moving Xb_bar from A to B", A, B, Xb_a_idx, Xb_b_idx, Xb_bar.key(A), Xb_bar.key(B))
-        D = None
-        for n in range(Xb_a_idx, Xb_b_idx+1):   # sweep from A to B
-          pt = Xb_bar.point(n)
-          if pt.id != A.id and pt.id != B.id and ccw(A,B,pt) == True:
-            D = pt                              # found a D that is clearly left of AB.
-            break
-          else:
-            print("backsweep ignoring pt", pt, Xb_bar.key(pt))
-        #
-        if D is not None:                       # compute intersection of Xb_bar with [AB]
-          E = intersect_lines(D,XY_a((D.x+1,D.y+1)),A,B,limit2=True)
-          if E is None: raise ValueError("finding a shadowed D failed:", A, B, D)
-          E = XY_a(E)
-          s.subdivide_segment(A,B,E)
-          Xf_bar.insert(E)
-          Xb_bar.insert(E)
-          if C is not None:
-            s.shortcut_segment(E,C,B)           # replace segments [EB], [BC] with [EC]
-            B,C = C,B
-          B,E = E,B
-
-      # tentatively advance Xf_bar from A to B
-      Xf_a_idx = Xf_bar.pos()                   # unused, we never move back to A.
-      Xf_b_idx = Xf_bar.lookup(lambda b: b.id==B.id if b else False)
-      if Xf_b_idx is None:                      # Should never happen!
-        print("Xf_bar.lookup(B)=None. B=",B)    # Okayish fallback, but find() may return
-        Xf_b_idx = Xf_bar.find(B)               # a different point with the same key().
-      print("line A,B:", A, B, Xf_a_idx, Xf_b_idx, Xf_bar.point(Xf_b_idx))
-      F = None
-      Xf_f_idx = None
-      for n in range(Xf_a_idx, Xf_b_idx+1):     # sweep from A to B (inclusive)
-        pt = Xf_bar.point(n)
-        if pt is None: continue
-        if subdividable_ab and pt.id != A.id and pt.id != B.id and ccw(A,B,pt) == (not left2right):
-          F = pt                                # found an F that is clearly right of AB.
-          Xf_f_idx = n
-          break
-        else:
-          print("forward sweep ignoring pt", n, pt, pt.id, Xf_bar.key(pt))
-      #
-      if F is not None:                       # compute intersection of Xb_bar with [AB]
-        _F_back = (F.x-1,F.y+1) if left2right else (F.x+1,F.y+1)
-        G = intersect_lines(F,XY_a(_F_back),A,B,limit2=True)
-        if G is None: raise ValueError("finding a shadowed G failed:", A, B, F, _F_back)
-        G = XY_a(G)
-        s.subdivide_segment(A,B,G)
-        Xf_bar.insert(G)
-        Xb_bar.insert(G)
-        if E is not None:
-          pass
-          ## FIXME: should s.shortcut_segment(...E) something here.
-        s.output_add(A,G,cut=True)
-        s.unlink_segment(A,G)
-        Xf_bar.pos(Xf_f_idx)                 # advance to F, further up on the same barrier as G
-        A = Xf_bar.point()
-      #
-      else:
-        s.output_add(A,B,cut=True)
-        s.unlink_segment(A,B)
-        Xf_bar.pos(Xf_b_idx)                  # advance
-        A = Xf_bar.point()
-      print("advanced A to", A, file=sys.stderr)
 
-    ##  barrier has moved all the way to the other end.
-    print("barrier moved all the way", Xf_bar.points, max_y, A.att() if A else None, A.seg if A else None, file=sys.stderr)
+  def pyramids_cut(s, A, B):
+    """Cut the segment [AB], see output_segment(). Points that have no more
+       segments todo are removed from s.cones, segments that waited for
+       them become ready to be tried again.
+    """
+    ## append_or_extend_hard() may flip a path that was already cut, that would
+    ## change the order of cuts.
+    s.output_segment(A, B, append=s.append_or_extend_simple)
+    s.unlink_segment(A, B)
+    for P in (A, B):
+      if s.todo[P] == 0 and P in s.cones:
+        s.cones.remove(P)
+        s.ready.extend(s.waiters.pop(P, ()))
 
 
   def process_simple_barrier(s, y_slice, max_y, last_x=0.0):
@@ -793,77 +875,58 @@ class MatFree:
     """
     if s.verbose:
       print("process_simple_barrier limit=%g, points=%d, %s" % (max_y, len(y_slice), last_x), file=sys.stderr)
-      print("                max_y=%g" % (y_slice[-1].y), file=sys.stderr)
-
-    min_x = None
-    max_x = None
-
-    segments = []
-    for pt in y_slice:
-      if pt is None:            # all segments to that point are done.
-        continue
-      if not 'seg' in pt.attr:  # shit happens
-        continue
-      for iC in pt.seg:
-        if iC < 0:              # this segment is done.
-          continue
-        C = s.points[iC]
-        if C is not None and C.y <= max_y:
-          if s.verbose > 1:
-            print("   segments.append", C, pt, file=sys.stderr)
-          segments.append((C,pt))
-          if min_x is None or min_x >  C.x: min_x =  C.x
-          if min_x is None or min_x > pt.x: min_x = pt.x
-          if max_x is None or max_x <  C.x: max_x =  C.x
-          if max_x is None or max_x < pt.x: max_x = pt.x
-          s.unlink_segment(C,pt)
-        #
-      #
-    #
-
-    left2right = s.decide_left2right(min_x, max_x, last_x)
+      print("                max_y=%g" % (s.xy[y_slice[-1], 1]), file=sys.stderr)
+
+    xy = s.xy
+    ## Collect the segments [C,pt] from all points pt in the slice, where C is above max_y.
+    ## Segments are taken in the order of the points in y_slice, each segment once.
+    pts = np.asarray(y_slice, dtype=np.intp)
+    pts = pts[s.todo[pts] > 0]          # all segments to that point are done.
+    pt, slot = s._slots(pts)
+    C = s.seg_to[slot]
+    todo = ~s.seg_done[slot] & (xy[C, 1] <= max_y) & (s.flags[C] & PT_DONE == 0)
+    pt, C = pt[todo], C[todo]
+    key = s._seg_key(pt, C)
+    _, first = np.unique(key, return_index=True)
+    first.sort()
+    pt, C, key = pt[first], C[first], key[first]
+    if not len(key):
+      return float(s.xy[s.output[-1][-1], 0]) if s.output else 0
+    segments = list(zip(C.tolist(), pt.tolist()))
+    if s.verbose > 1:
+      for seg in segments:
+        print("   segments.append", seg[0], seg[1], file=sys.stderr)
+
+    ## like unlink_segment(C,pt) for all of them
+    ends = np.unique(np.concatenate((pt, C)))
+    src, slot = s._slots(ends)
+    done = ~s.seg_done[slot] & np.isin(s._seg_key(src, s.seg_to[slot]), key)
+    s.seg_done[slot[done]] = True
+    s.todo -= np.bincount(src[done], minlength=len(s.todo))
+    s.flags[ends] |= PT_SEEN
+    s.flags[ends[s.todo[ends] == 0]] |= PT_DONE
+
+    seg_xy = xy[np.array(segments)]       # [segment, end, x/y]
+    ends_x = seg_xy[:, :, 0]
+    left2right = s.decide_left2right(ends_x.min(), ends_x.max(), last_x)
     xsign = -1.0
     if left2right: xsign = 1.0
-    def dovetail_both_key(a):
-      return a[0].y+a[1].y+xsign*(a[0].x+a[1].x)
-    segments.sort(key=dovetail_both_key)
-
-    for segment in segments:
-      ## Flip the orientation of each line segment according to this strategy:
-      ## check 'sharp' both ends. (sharp is irrelevent without 'seen')
-      ##   if one has 'sharp' (and 'seen'), the other not, then cut towards the 'sharp' end.
-      ##   if none has that, cut according to decide_left2right()
-      ##   if both have it, we must subdivide the line segment, and cut from the
-      ##   midpoint to each end, in the order indicated by decide_left2right().
-      A = segment[0]
-      B = segment[1]
-      if 'sharp' in A.attr and 'seen' in A.attr:
-        if 'sharp' in B.attr and 'seen' in B.attr:              # both sharp
-          iM = s.pt2idx((A.x+B.x)*.5, (A.y+B.y)*.5 )
-          M = s.points[iM]
-          if xsign*A.x <= xsign*B.x:
-            s.append_or_extend_hard([M, A])
-            s.append_or_extend_hard([M, B])
-          else:
-            s.append_or_extend_hard([M, B])
-            s.append_or_extend_hard([M, A])
-        else:                                                   # only A sharp
-          s.append_or_extend_hard([B, A])
+    ## dovetail both: sort by y and x of both ends
+    key = (seg_xy[:, 0, 1]+seg_xy[:, 1, 1]) + xsign*(seg_xy[:, 0, 0]+seg_xy[:, 1, 0])
+    order = np.argsort(key, kind='stable')
+    segments = [segments[i] for i in order.tolist()]
+
+    for A, B in segments:
+      ## Cut each line segment in the direction indicated by decide_left2right(),
+      ## output_segment() may flip it for sharp ends.
+      if xsign*xy[A, 0] <= xsign*xy[B, 0]:
+        s.output_segment(A, B)
       else:
-        if 'sharp' in B.attr and 'seen' in B.attr:              # only B sharp
-          s.append_or_extend_hard([A, B])
-        else:                                                   # none sharp
-          if xsign*A.x <= xsign*B.x:
-            s.append_or_extend_hard([A, B])
-          else:
-            s.append_or_extend_hard([B, A])
-          #
-        #
-      #
+        s.output_segment(B, A)
+      xy = s.xy                         # may have grown
 
     # return the last x coordinate of the last stroke
-    if not 'output' in s.__dict__: return 0
-    return s.output[-1][-1].x
+    return float(s.xy[s.output[-1][-1], 0])
 
 
   def decide_left2right(s, min_x, max_x, last_x=0.0):
@@ -891,47 +954,117 @@ class MatFree:
 
        While obeying this shadow rule, we also sweep left and right through the data, similar to the
        simple_barrier() algorithm below.
+
+       The barrier is kept monotone_back_travel below the highest point that
+       has segments todo. Whenever it moves, the points it passes are swept
+       by process_pyramids_barrier(), each time in the other direction.
+       If the barrier cannot move, all remaining segments above it shadow
+       each other. We then break the cycle with unblock_pyramids().
     """
     s.output = []
     if not s.do_slicing:
-      for path in s.paths:
-        s.output.append([])
-        for idx in path:
-          s.output[-1].append(s.points[idx])
-          # if idx == 33: print(s.points[idx].att())
-        #
-      #
+      s.output = [list(path) for path in s.paths]
       return
 
-
-    dir_toggle = True
-    old_min_y = -1e10
-    old_len_output = len(s.output)
+    pts = np.flatnonzero(s.todo[:s.n_points] > 0)
+    ## the horizontal barrier, over the points by ascending y.
+    Y_bar = Barrier(pts.tolist(), key=s.xy[:s.n_points, 1].tolist().__getitem__)
+    sy = Y_bar.points
+    x, y = s.xy[pts, 0], s.xy[pts, 1]
+    s.cones = ConeIndex(pts, x+y, y-x)
+    s.added = []        # heap of (y, point) of points added by unblock_pyramids()
+    s.waiting = set()   # segments (A, B), A < B, that are shadowed
+    s.waiters = {}      # point D: the segments (A, B) shadowed by D
+    s.ready = []        # segments (A, B) to try again
+
+    top = 0             # pointing to the highest point with segments todo.
+    swept = 0           # pointing to the first point below the barrier.
+    barrier_y = -float("inf")
+    left2right = True
     while True:
-      ## always recreate the barrier, so that newly added subdivision points are seen.
-      Y_bar = Barrier(s.points, key=lambda a: a[1] if a else 0)
-      while Y_bar.point() is None:                        # skip forward dropped points
-        # print("Y_bar skipping idx", Y_bar.pos(), file=sys.stderr)
-        if Y_bar.next() is None:                          # next() returns an idx, except when hitting the end.
-          break
-      min_y = Y_bar.point().y
-      barrier_y = min_y + s.monotone_back_travel
-      print("\t>>>>>>>>>>>>>>> new Y-slice between", min_y, barrier_y, file=sys.stderr)
-      y_max_idx = Y_bar.find((0, barrier_y))
-      s.process_pyramids_barrier(Y_bar.pslice(), barrier_y, left2right=dir_toggle)
-      # print("process_pyramids_barrier returns", len(s.output), y_max_idx, len(s.points), file=sys.stderr)
-      # print("output so far: ", s.output, file=sys.stderr)
-
-      if old_len_output == len(s.output) and old_min_y == min_y:
-        print("pyramids_barrier aborted: no progress, stuck at min_y=", min_y, file=sys.stderr)
-        break;
-
-      old_len_output = len(s.output)
-      old_min_y = min_y
-      dir_toggle = not dir_toggle
+      while top < len(sy) and s.todo[sy[top]] == 0:
+        top += 1
+      if top >= len(sy):
+        break
+      new_y = Y_bar.keys[top] + s.monotone_back_travel
+      if new_y > barrier_y:
+        barrier_y = new_y
+        end = Y_bar.find_key(barrier_y)
+        end = swept if end is None else end + 1
+        if end > swept:
+          if s.verbose:
+            print("\t>>>>>>>>>>>>>>> new Y-slice between", Y_bar.keys[swept], barrier_y, file=sys.stderr)
+          y_slice = np.array(sy[swept:end], dtype=np.intp)
+          x, y = s.xy[y_slice, 0], s.xy[y_slice, 1]
+          ## the forward slanted barrier sweeps along x+y, the backwards slanted along y-x.
+          key = (x+y) if left2right else (y-x)
+          s.process_pyramids_barrier(y_slice[np.argsort(key, kind='stable')], barrier_y, left2right)
+          swept = end
+          left2right = not left2right
+          continue
+      ## subdivision points may be higher than sy[top].
+      while s.added and s.todo[s.added[0][1]] == 0:
+        heapq.heappop(s.added)
+      T = int(sy[top])
+      if s.added and s.added[0][0] < Y_bar.keys[top]:
+        T = s.added[0][1]
+      s.unblock_pyramids(T, barrier_y, left2right)
     #
 
 
+  def unblock_pyramids(s, T, max_y, left2right=True):
+    """Called when all segments above max_y shadow each other.
+       Nothing shadows T, the highest point that has segments todo. So each
+       segment [TB] can be cut up to the point G, where its shadow would
+       reach another point. We cut the longest such [TG].
+       If [TG] is too short, [TB] is cut, ignoring the shadow rule.
+       If all segments of T reach below max_y (they were not subdivided),
+       the barrier is lifted for T: any of them can be cut.
+    """
+    tx, ty = s.xy[T].tolist()
+    tu, tv = tx+ty, ty-tx
+    best = None
+    todo = [j for j in s.segs(T) if not s.seg_done[j]]
+    limit_y = max_y
+    if all(s.xy[s.seg_to[j], 1] > max_y for j in todo):
+      limit_y = math.inf
+    for j in todo:
+      B = int(s.seg_to[j])
+      bx, by = s.xy[B].tolist()
+      if by > limit_y: continue
+      ## the shadow of [TG] with G = T + t*(B-T) reaches point P, when
+      ## both u and v of its apex are above those of P.
+      du, dv = (bx+by)-tu, (by-bx)-tv
+      t = 1.0
+      for P, pu, pv in s.cones.blockers(max(tu, bx+by), max(tv, by-bx), (T, B)):
+        t_u = 0.0 if tu > pu else (pu-tu)/du
+        t_v = 0.0 if tv > pv else (pv-tv)/dv
+        t = min(t, max(t_u, t_v))
+      length = math.hypot(bx-tx, by-ty)
+      if best is None or t*length > best[0]*best[2]:
+        best = (t, B, length)
+    t, B, length = best
+    G = None
+    if min(t, 1.0-t)*length >= s.min_segmentlen:
+      t *= 1.0 - 1e-9
+      bx, by = s.xy[B].tolist()
+      G = XY_a((tx+t*(bx-tx), ty+t*(by-ty)))
+      if not s.subdivide_segment(s.point(T), s.point(B), G):
+        G = None
+    if G is not None:
+      if s.verbose:
+        print("unblock_pyramids: subdivide", T, B, "at", G, file=sys.stderr)
+      heapq.heappush(s.added, (G.y, G.id))
+      s.cones.insert(G.id, G.x+G.y, G.y-G.x)
+      s.ready.append((G.id, B))
+      B = G.id
+    elif t < 1.0 and s.verbose:
+      print("unblock_pyramids: cut shadowed", T, B, file=sys.stderr)
+    s.waiting.discard((min(T, B), max(T, B)))
+    s.pyramids_cut(T, B)
+    s.pyramids_chain(B, max_y, left2right)
+
+
   def simple_barrier(s):
     """move a barrier in ascending y direction.
        For each barrier position, only try to cut lines that are above the barrier.
@@ -941,43 +1074,155 @@ class MatFree:
        A point that has all segments with negative signs is removed.
 
        Input is read from s.paths[] -- having lists of point indices.
-       The output is placed into s.output[] as lists of XY_a() objects
+       The output is placed into s.output[] as lists of point indices
        by calling process_simple_barrier() and friends.
     """
 
+    s.output = []
     if not s.do_slicing:
-      s.output = []
-      for path in s.paths:
-        s.output.append([])
-        for idx in path:
-          s.output[-1].append(s.points[idx])
-        #
-      #
+      s.output = [list(path) for path in s.paths]
       return
 
+    if s.n_points == 0:
+      return
 
     ## first step sort the points into an additional list by ascending y.
-    def by_y_key(a):
-      return a.y
-    sy = sorted(s.points, key=by_y_key)
+    sy = np.argsort(s.xy[:s.n_points, 1], kind='stable')
+    sy_y = s.xy[sy, 1].tolist()
 
     barrier_y = s.barrier_increment
     barrier_idx = 0     # pointing to the first element that is beyond.
     last_x = 0.0        # we start at home.
+    ## points behind the barrier that still have segments to do, in sy order.
+    ## Points that are done are retired, newly crossed points are appended.
+    active = sy[0:0]
     while True:
       old_idx = barrier_idx
-      while sy[barrier_idx].y < barrier_y:
-        barrier_idx += 1
-        if barrier_idx >= len(sy):
-          break
+      barrier_idx = bisect.bisect_left(sy_y, barrier_y, lo=barrier_idx)
       if barrier_idx > old_idx:
-        last_x = s.process_simple_barrier(sy[0:barrier_idx], barrier_y, last_x=last_x)
+        active = np.concatenate((active[s.todo[active] > 0], sy[old_idx:barrier_idx]))
+        last_x = s.process_simple_barrier(active, barrier_y, last_x=last_x)
       if barrier_idx >= len(sy):
         break
       barrier_y += s.barrier_increment
     #
 
 
+  def euler_strokes(s):
+    """Cut each network of connected segments in as few strokes as possible.
+       Needs link_points(), and mark_sharp_segs() for a knife.
+
+       Strokes can only start and end at points with an odd number of
+       segments. Taking them in order, each of those is paired with the
+       closest one left, and the pair gets a jump. With the jumps, all points
+       have an even number of segments, and an Euler circuit (Hierholzer)
+       runs through all segments and jumps. It falls apart into strokes at
+       the jumps. The circuit goes on as straight as possible at each point,
+       and with a knife, a stroke is split where it turns sharply at a
+       PT_SHARP point.
+       The output is placed into s.output[] as lists of point indices, in no
+       particular order.
+    """
+    s.output = [list(path) for path in s.paths if len(path) == 1]
+    n = s.n_points
+    if n == 0:
+      return
+    pt, slot = s._slots(np.arange(n))
+    to = s.seg_to[slot]
+
+    ## rev[j] is the slot of the same segment at its other end. Parallel
+    ## segments are paired in slot order.
+    rev = np.empty(s.n_segs, dtype=np.intp)
+    order = np.lexsort((pt > to, s._seg_key(pt, to)))
+    key = s._seg_key(pt, to)[order]
+    first = np.flatnonzero(np.concatenate(([True], key[1:] != key[:-1])))
+    half = np.diff(np.concatenate((first, [len(key)]))) // 2
+    fwd = np.repeat(first, half) + np.arange(int(half.sum())) - np.repeat(np.cumsum(half) - half, half)
+    bwd = fwd + np.repeat(half, half)
+    rev[slot[order[fwd]]] = slot[order[bwd]]
+    rev[slot[order[bwd]]] = slot[order[fwd]]
+
+    jump = {}
+    odd = np.flatnonzero(s.seg_len[:n] % 2 == 1).tolist()
+    if odd:
+      grid = PointGrid([(x, y, i) for (x, y), i in zip(s.xy[odd].tolist(), odd)])
+      for i in odd:
+        if i not in jump:
+          jump[i] = None
+          _, hit = grid.nearest(s.xy[i].tolist(), alive=lambda k: k not in jump)
+          jump[i] = hit[2]
+          jump[hit[2]] = i
+
+    xy = s.xy[:n].tolist()
+    seg_to = s.seg_to.tolist()
+    rev = rev.tolist()
+    used = [False]*s.n_segs
+    left = [[] for i in range(n)]
+    for p, j in zip(pt.tolist(), slot.tolist()):
+      left[p].append(j)
+    for start in range(n):
+      if not left[start]:
+        continue
+      stack = [(start, None)]     # (point, how we got there: slot, JUMP or None)
+      circuit = []
+      while stack:
+        v, via = stack[-1]
+        cand = left[v] = [j for j in left[v] if not used[j]]
+        if cand:
+          j = cand[0]
+          if via is not None and via != JUMP and len(cand) > 1:
+            U, V = xy[stack[-2][0]], xy[v]
+            j = min(cand, key=lambda j: _turn(U, V, xy[seg_to[j]]))
+          used[j] = used[rev[j]] = True
+          stack.append((seg_to[j], j))
+        elif jump.get(v, v) != v:
+          w = jump.pop(v)
+          del jump[w]
+          stack.append((w, JUMP))
+        else:
+          circuit.append(stack.pop())
+      circuit.reverse()
+
+      ## split at the jumps. The circuit is closed, so that the stroke that
+      ## ends it goes on with the one that starts it.
+      strokes = [[circuit[0][0]]]
+      for v, via in circuit[1:]:
+        if via == JUMP:
+          strokes.append([v])
+        else:
+          strokes[-1].append(v)
+      if len(strokes) > 1 and circuit[1][1] != JUMP and circuit[-1][1] != JUMP:
+        strokes[0] = strokes.pop() + strokes[0][1:]
+      strokes = [stroke for stroke in strokes if len(stroke) > 1]
+      if not s.tool_pen:
+        strokes = [part for stroke in strokes for part in s._split_sharp(stroke)]
+      s.output.extend(strokes)
+
+
+  def _split_sharp(s, stroke):
+    """Split a stroke of euler_strokes() at the PT_SHARP points where it turns
+       sharply. A closed stroke starts at one of those, if there is one.
+    """
+    def sharp(i):
+      A, B, C = stroke[i-1], stroke[i], stroke[(i+1) % len(stroke)]
+      return s.flags[B] & PT_SHARP and sharp_turn(s.point(A), s.point(B), s.point(C), s.sharp_turn_fwd_ratio)
+
+    if stroke[0] == stroke[-1] and len(stroke) > 3:
+      stroke = stroke[:-1]
+      for i in range(len(stroke)):
+        if sharp(i):
+          stroke = stroke[i:] + stroke[:i]
+          break
+      stroke.append(stroke[0])
+    parts = [stroke[:1]]
+    for i in range(1, len(stroke) - 1):
+      parts[-1].append(stroke[i])
+      if sharp(i):
+        parts.append([stroke[i]])
+    parts[-1].append(stroke[-1])
+    return parts
+
+
   def apply_overshoot(s, paths, start_travel, end_travel):
     """Extrapolate path in the output list by the give travel at start and/or end
        Paths are extended linear, curves are not taken into accound.
@@ -996,6 +1241,8 @@ class MatFree:
       return C
 
     for path in paths:
+      if len(path) < 2:
+        continue                        # a dot has no direction to extend.
       if start_travel > 0.0:
         path[0] = extend_b(path[1],path[0], start_travel)
       if end_travel > 0.0:
@@ -1005,17 +1252,57 @@ class MatFree:
 
 
   def apply(self, cut):
+    """Returns the cut reordered, as lists of XY_a() objects.
+    """
     self.load(cut)
-    if self.pyramids_algorithm:
-      self.link_points()
-      self.mark_sharp_segs()
+    if self.split_crossings:
+      self.split_at_crossings()
+    self.subdivide_segments(self.monotone_back_travel)
+    self.link_points()
+    self.mark_sharp_segs()
+    if self.euler_algorithm:
+      self.euler_strokes()
+    elif self.plan_parallel():
+      pass
+    elif self.pyramids_algorithm:
       self.pyramids_barrier()
     else:
-      self.subdivide_segments(self.monotone_back_travel)
-      self.link_points()
-      self.mark_sharp_segs()
       self.simple_barrier()
+    self.output = [[self.point(idx) for idx in path] for path in self.output]
     if self.tool_pen == False and self.overshoot > 0.0:
       self.output = self.apply_overshoot(self.output, self.overshoot, self.overshoot)
 
     return self.output
+
+
+def _turn(U, V, W):
+  """How much the way from U over V to W turns at V, -1 (straight on) to 1 (back)."""
+  dx, dy = V[0]-U[0], V[1]-U[1]
+  ex, ey = W[0]-V[0], W[1]-V[1]
+  d = math.hypot(dx, dy)*math.hypot(ex, ey)
+  return -(dx*ex + dy*ey)/d if d > 0 else 0.0
+
+
+def _plan_job(settings, xy, flags, dup, paths):
+  """One job of MatFree.plan_parallel(), runs in a worker process.
+     Returns the output paths, the coordinates and the flags of all points,
+     including those added by the barrier.
+  """
+  s = MatFree(scale=1.0)
+  s.__dict__.update(settings)
+  n = len(xy)
+  s.n_points = n
+  s.xy = np.array(xy, dtype=float)
+  s.flags = np.array(flags, dtype=np.uint8)
+  s.dup = np.array(dup, dtype=np.int32)
+  s.seg_start = np.zeros(n, dtype=np.intp)
+  s.seg_len = np.zeros(n, dtype=np.intp)
+  s.todo = np.zeros(n, dtype=np.intp)
+  s.points_dict = {s._point_key(x, y): i for i, (x, y) in enumerate(s.xy.tolist())}
+  s.paths = paths
+  s.link_points()
+  if s.pyramids_algorithm:
+    s.pyramids_barrier()
+  else:
+    s.simple_barrier()
+  return s.output, s.xy[:s.n_points], s.flags[:s.n_points]
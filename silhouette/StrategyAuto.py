@@ -0,0 +1,97 @@
+# (c) 2026 inkscape-silhouette contributors
+#
+# StrategyAuto.py -- pick the best cut strategy for a document.
+#
+# Which strategy gives the quickest cut depends on the drawing. The auto
+# strategy computes the plans of several strategies in parallel worker
+# processes, scores each one with the MotionModel estimate, and takes the
+# quickest plan that was ready before the deadline. Zorder needs no work and
+# is always available as a fallback.
+
+import multiprocessing
+import time
+
+from silhouette.Strategy import MatFree
+import silhouette.StrategyMinTraveling
+
+CANDIDATES = ("mintravel", "mintravelfull", "matfree", "euler", "zorder")
+
+
+def plan(strategy, paths, pen=False, metric=None, preset="default", parents=None):
+    """Order paths with one of the strategies, as sendto_silhouette does:
+       matfree with the MatFree preset, the mintravel strategies with the
+       containment parents, for inner_first.
+       Returns lists of (x, y) tuples. This runs in the worker processes.
+    """
+    if strategy == "matfree":
+        mf = MatFree(preset, scale=1.0, pen=pen)
+        mf.verbose = 0
+        paths = mf.apply(paths)
+    elif strategy == "euler":
+        mf = MatFree("euler", scale=1.0, pen=pen)
+        mf.verbose = 0
+        paths = silhouette.StrategyMinTraveling.sort(mf.apply(paths), metric=metric)
+    elif strategy == "mintravel":
+        paths = silhouette.StrategyMinTraveling.sort(paths, metric=metric, parents=parents)
+    elif strategy == "mintravelfull":
+        paths = silhouette.StrategyMinTraveling.sort(paths, entrycircular=True, metric=metric, parents=parents)
+    elif strategy == "mintravelfwd":
+        paths = silhouette.StrategyMinTraveling.sort(paths, entrycircular=True, reversible=False,
+                                                     metric=metric, parents=parents)
+    return [[(pt[0], pt[1]) for pt in path] for path in paths]
+
+
+def race(paths, model, candidates=CANDIDATES, timeout=10.0, pen=False, metric=None, log=None,
+         preset="default", parents=None, start_method=None):
+    """Plan paths with all candidate strategies, see plan() for preset and
+       parents, and return the quickest plan as (strategy, paths, scores). scores maps each strategy that finished
+       in time to its estimated duration in seconds; strategies that failed
+       or were too slow are missing. log, if given, is called with messages
+       about failed candidates. start_method is for multiprocessing.get_context().
+    """
+    paths = [[(pt[0], pt[1]) for pt in path] for path in paths]
+    plans = {}
+    if "zorder" in candidates:
+        plans["zorder"] = paths
+    work = [s for s in candidates if s != "zorder"]
+
+    deadline = time.time() + timeout
+    pool = None
+    if work:
+        try:
+            pool = multiprocessing.get_context(start_method).Pool(processes=len(work))
+        except (OSError, ValueError, ImportError) as e:
+            if log:
+                log("auto: no worker processes (%s), planning one by one" % e)
+    if pool is not None:
+        try:
+            jobs = {s: pool.apply_async(plan, (s, paths, pen, metric, preset, parents)) for s in work}
+            for s, job in jobs.items():
+                try:
+                    plans[s] = job.get(max(deadline - time.time(), 0.0))
+                except multiprocessing.TimeoutError:
+                    if log:
+                        log("auto: %s did not finish in time" % s)
+                except Exception as e:
+                    if log:
+                        log("auto: %s failed: %r" % (s, e))
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        for s in work:
+            if time.time() >= deadline:
+                if log:
+                    log("auto: no time left for %s" % s)
+                continue
+            try:
+                plans[s] = plan(s, [list(path) for path in paths], pen, metric, preset, parents)
+            except Exception as e:
+                if log:
+                    log("auto: %s failed: %r" % (s, e))
+
+    scores = {s: model.estimate(plans[s])['duration'] for s in candidates if s in plans}
+    if not scores:
+        return "zorder", paths, scores
+    best = min(scores, key=lambda s: (scores[s], candidates.index(s)))
+    return best, plans[best], scores
@@ -6,6 +6,12 @@
 # At each end of a cut search the nearest starting point for the next cut.
 # This will probably not find find the global optimum, but works well enough.
 
+import time
+
+import numpy as np
+
+from silhouette.SpatialIndex import BoxTree, PointGrid
+
 
 # Calculates the distance between two given points.
 # The result does not calculate the root for performance reasons,
@@ -42,14 +48,228 @@ def findnearestpath(paths, pos, entrycircular, reversible):
     return nearestindex,selected
 
 
+# Index entries for all points, where a path may be entered.
+# The item (index, rank) orders ties like findnearestpath() does:
+# lower path index first, then start, end, and the points of a closed path.
+def entrypoints(paths, indices, entrycircular, reversible):
+    points = []
+    for index in indices:
+        path = paths[index]
+        points.append((path[0][0], path[0][1], (index, 0)))
+        if reversible:
+            points.append((path[-1][0], path[-1][1], (index, 1)))
+        if (entrycircular & (path[0] == path[-1])):
+            # first and last point are the start point again, no need to index them.
+            for i in range(1, len(path)-1):
+                points.append((path[i][0], path[i][1], (index, i+2)))
+    return points
+
+
 # Sort paths to approximate minimal traveling times
 # (greedy algorithm not necessarily optimal)
-def sort(paths, entrycircular=False, reversible=True):
+# Same result as repeatedly calling findnearestpath(), but the candidates are
+# looked up in a PointGrid, so that large jobs do not take quadratic time.
+# With a metric (see TimeModel.MotionModel) the next path is the one that is
+# quickest to reach, instead of the nearest one.
+# With parents (see containment()), a path is only cut after all paths that
+# have it as parent.
+def sort(paths, entrycircular=False, reversible=True, metric=None, parents=None):
+    indices = [i for i, path in enumerate(paths) if len(path)]
+    alive = [True] * len(paths)
+    children = [0] * len(paths)
+    for p in (parents or ()):
+        if p is not None:
+            children[p] += 1
+    # paths waiting for their children are dropped from the grid, and put
+    # back when they are ready.
+    is_alive = lambda item: alive[item[0]] and not children[item[0]]
+    grid = PointGrid(entrypoints(paths, indices, entrycircular, reversible))
+    indexed = len(indices)
+    left = indexed
     pos=(0,0)
     sortedpaths=[]
-    while (len(paths) > 0):
-        i,path = findnearestpath(paths,pos,entrycircular,reversible)
-        paths.pop(i)             # delete found index
+    while (left > 0):
+        if left < indexed // 2:
+            # most cells are empty now, build a denser grid.
+            indices = [i for i in indices if alive[i]]
+            grid = PointGrid(entrypoints(paths, indices, entrycircular, reversible))
+            indexed = left
+        _, (_, _, (index, rank)) = grid.nearest(pos, is_alive, metric)
+        path = paths[index]
+        if rank == 1:
+            path = path[::-1]
+        elif rank > 1:
+            i = rank - 2
+            path = path[i:] + path[1:i+1]
+        alive[index] = False
+        left -= 1
+        parent = parents[index] if parents else None
+        if parent is not None:
+            children[parent] -= 1
+            if not children[parent]:
+                for p in entrypoints(paths, [parent], entrycircular, reversible):
+                    grid.insert(p)
         pos = path[-1]           # endpoint is next start point for search
         sortedpaths.append(path) # append to output list
     return sortedpaths
+
+
+# Containment tree of the paths, for cutting holes before the outline around
+# them. Returns parents, where parents[i] is the index of the smallest closed
+# path (as told by is_closed(path)) that path i lies inside, or None.
+# Candidates come from a BoxTree of the bounding boxes of the closed paths, a
+# path lies inside one, if the winding number of its first point is not zero.
+# A closed path can only be inside a larger one, so that duplicates do not
+# become each others parents.
+def containment(paths, is_closed):
+    parents = [None] * len(paths)
+    closed = [i for i, path in enumerate(paths) if len(path) > 2 and is_closed(path)]
+    if not closed:
+        return parents
+    polys = [np.array([pt[:2] for pt in paths[i]], dtype=float) for i in closed]
+    boxes = np.array([[p[:, 0].min(), p[:, 1].min(), p[:, 0].max(), p[:, 1].max()] for p in polys])
+    area = [abs(_area(p)) for p in polys]
+    rank = {i: k for k, i in enumerate(closed)}
+    tree = BoxTree(boxes)
+    for i, path in enumerate(paths):
+        if not len(path):
+            continue
+        if i in rank:
+            box = boxes[rank[i]]
+            own = area[rank[i]]
+        else:
+            xs = [pt[0] for pt in path]
+            ys = [pt[1] for pt in path]
+            box = (min(xs), min(ys), max(xs), max(ys))
+            own = 0.0
+        best = None
+        for k in tree.containing(box):
+            if area[k] <= own or (best is not None and area[k] >= area[best]):
+                continue
+            if _winding(polys[k], path[0]):
+                best = k
+        if best is not None:
+            parents[i] = closed[best]
+    return parents
+
+
+def _area(poly):
+    x, y = poly[:, 0], poly[:, 1]
+    return 0.5*float(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+
+# Winding number of the closed polygon poly around point p.
+def _winding(poly, p):
+    a = poly
+    b = np.roll(poly, -1, axis=0)
+    x, y = p[0], p[1]
+    side = (b[:, 0]-a[:, 0])*(y-a[:, 1]) - (x-a[:, 0])*(b[:, 1]-a[:, 1])
+    up = (a[:, 1] <= y) & (b[:, 1] > y) & (side > 0)
+    down = (a[:, 1] > y) & (b[:, 1] <= y) & (side < 0)
+    return int(np.count_nonzero(up)) - int(np.count_nonzero(down))
+
+
+# Total length of the moves between paths, starting at pos.
+def travel(paths, pos=(0,0)):
+    total = 0.0
+    for path in paths:
+        total += dist_sq(pos, path[0])**0.5
+        pos = path[-1]
+    return total
+
+
+def _dist(a, b):
+    d = a - b
+    return np.hypot(d[..., 0], d[..., 1])
+
+
+# Local search on an ordered list of paths, as returned by sort().
+# Only the moves between paths are optimized, each path keeps its entry point.
+# Or-opt moves chains of up to three paths to a better place in the order,
+# 2-opt reverses a section of the order (and every path in it), the latter
+# only if paths may be reversed. Stops when no move helps any more or the
+# time budget (in seconds) is used up.
+# Moves are measured by length, or by metric.move_times() if a metric is given.
+def improve(paths, reversible=True, timeout=1.0, pos=(0,0), metric=None):
+    n = len(paths)
+    if n < 2 or timeout <= 0:
+        return paths
+    deadline = time.time() + timeout
+    origin = np.array([pos], dtype=float)
+    S = np.array([path[0][:2] for path in paths], dtype=float)
+    E = np.array([path[-1][:2] for path in paths], dtype=float)
+    order = np.arange(n)
+    flipped = np.zeros(n, dtype=bool)
+    eps = 1e-9
+    if metric is None:
+        cost = _dist
+    else:
+        cost = metric.move_times
+    d1 = lambda a, b: float(cost(a, b))
+
+    def exit_before(i):
+        return origin[0] if i == 0 else E[i-1]
+
+    improved = True
+    while improved and time.time() < deadline:
+        improved = False
+        for i in range(n):
+            if time.time() >= deadline:
+                break
+            P = exit_before(i)
+
+            if reversible:
+                # 2-opt: reverse the positions i..j
+                j = np.arange(i, n)
+                delta = cost(P[None, :], E[i:]) - d1(P, S[i])
+                nxt = j[:-1] + 1
+                delta[:-1] += cost(S[i][None, :], S[nxt]) - cost(E[j[:-1]], S[nxt])
+                k = int(np.argmin(delta))
+                if delta[k] < -eps:
+                    j = i + k
+                    S[i:j+1], E[i:j+1] = E[i:j+1][::-1].copy(), S[i:j+1][::-1].copy()
+                    order[i:j+1] = order[i:j+1][::-1].copy()
+                    flipped[i:j+1] = ~flipped[i:j+1][::-1]
+                    improved = True
+                    P = exit_before(i)
+
+            # Or-opt: move the chain i..i+L-1 between two other paths.
+            best = (-eps, None)
+            for L in (1, 2, 3):
+                if i + L > n:
+                    break
+                cs, ce = S[i], E[i+L-1]
+                if i + L < n:
+                    gain = d1(P, cs) + d1(ce, S[i+L]) - d1(P, S[i+L])
+                else:
+                    gain = d1(P, cs)
+                # gap k lies between positions k-1 and k of the order without the chain.
+                X = np.concatenate((origin, np.delete(E, range(i, i+L), axis=0)))
+                Y = np.delete(S, range(i, i+L), axis=0)
+                m = len(Y)
+                candidates = [(cs, ce, False)]
+                if reversible:
+                    candidates.append((ce, cs, True))
+                for entry, leave, rev in candidates:
+                    insert = cost(X, entry[None, :])
+                    insert[:m] += cost(Y, leave[None, :]) - cost(X[:m], Y)
+                    insert[i] = np.inf    # where the chain came from
+                    k = int(np.argmin(insert))
+                    if insert[k] - gain < best[0]:
+                        best = (insert[k] - gain, (L, k, rev))
+            if best[1] is not None:
+                L, k, rev = best[1]
+                chain = list(range(i, i+L))
+                rest = [p for p in range(n) if not i <= p < i+L]
+                if rev:
+                    chain.reverse()
+                idx = np.array(rest[:k] + chain + rest[k:])
+                S, E = S[idx], E[idx]
+                order, flipped = order[idx], flipped[idx]
+                if rev:
+                    moved = slice(k, k+L)
+                    S[moved], E[moved] = E[moved].copy(), S[moved].copy()
+                    flipped[moved] = ~flipped[moved]
+                improved = True
+
+    return [paths[o][::-1] if f else paths[o] for o, f in zip(order.tolist(), flipped.tolist())]
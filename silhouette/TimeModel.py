@@ -0,0 +1,126 @@
+# (c) 2026 inkscape-silhouette contributors
+#
+# TimeModel.py -- rough motion time model for Graphtec cutters.
+#
+# In cut path coordinates x runs across the media and is driven by the tool
+# carriage, y runs along the media and is driven by the rollers. Both axes
+# move at the same time, so a move takes as long as the slower axis needs.
+# Each axis accelerates up to its top speed and decelerates again
+# (trapezoidal profile), short moves never reach the top speed.
+# Every path costs one tool down and tool up.
+#
+# The numbers below are estimates from stopwatch timings, not vendor data.
+# They are good enough to compare plans, and to tell minutes from hours.
+
+import numpy as np
+
+from silhouette.PathStore import PathStore
+from silhouette.Graphtec import PRODUCT_LINE_CAMEO4, MEDIA
+
+MOTION_DEFAULT = dict(
+  speed_step=10.0,      # mm/s cut speed per speed setting
+  max_speed=10,         # highest speed setting
+  travel_speed=200.0,   # mm/s with the tool up
+  roller_ratio=0.8,     # y speed relative to x speed
+  accel_x=1000.0,       # mm/s^2
+  accel_y=600.0,        # mm/s^2
+  lift_time=0.12,       # s for one tool down and up
+)
+
+MOTION_CAMEO4 = dict(MOTION_DEFAULT,
+  max_speed=30,
+  travel_speed=400.0,
+  accel_x=2000.0,
+  accel_y=1200.0,
+  lift_time=0.08,
+)
+
+
+def _axis_time(d, v, a):
+    """Time to move distance d (array) with top speed v and acceleration a."""
+    d = np.abs(d)
+    ramp = v*v/a        # distance needed to get to top speed and back to rest
+    return np.where(d < ramp, 2.0*np.sqrt(d/a), d/v + v/a)
+
+
+class MotionModel:
+    def __init__(self, cut_speed=100.0, travel_speed=200.0, roller_ratio=0.8,
+                 accel_x=1000.0, accel_y=600.0, lift_time=0.12):
+        """Speeds are in mm/s along the carriage (x) axis, accelerations in mm/s^2,
+           lift_time in seconds.
+        """
+        self.cut_speed = float(cut_speed)
+        self.travel_speed = float(travel_speed)
+        self.roller_ratio = float(roller_ratio)
+        self.accel_x = float(accel_x)
+        self.accel_y = float(accel_y)
+        self.lift_time = float(lift_time)
+
+    @classmethod
+    def for_device(cls, product_id=None, speed=None, media=None):
+        """Model for a device and speed setting. speed None means the
+           default speed of the media (see Graphtec.MEDIA).
+        """
+        p = MOTION_CAMEO4 if product_id in PRODUCT_LINE_CAMEO4 else MOTION_DEFAULT
+        if speed is None:
+            for m in MEDIA:
+                if m[0] == media and m[2] is not None:
+                    speed = m[2]
+                    break
+            else:
+                speed = p['max_speed']
+        speed = min(max(speed, 1), p['max_speed'])
+        return cls(cut_speed=speed*p['speed_step'], travel_speed=p['travel_speed'],
+                   roller_ratio=p['roller_ratio'], accel_x=p['accel_x'],
+                   accel_y=p['accel_y'], lift_time=p['lift_time'])
+
+    def move_times(self, A, B):
+        """Tool up travel times from each point of A to the point of B at the
+           same index. A and B are (N, 2) arrays, or a single point each.
+        """
+        D = np.asarray(B, dtype=float) - np.asarray(A, dtype=float)
+        v = self.travel_speed
+        tx = _axis_time(D[..., 0], v, self.accel_x)
+        ty = _axis_time(D[..., 1], v*self.roller_ratio, self.accel_y)
+        return np.maximum(tx, ty)
+
+    def move_time(self, a, b):
+        """Tool up travel time from point a to point b."""
+        return float(self.move_times(a[:2], b[:2]))
+
+    def min_move_time(self, gap):
+        """Lower bound for moves, where one of the axes moves at least gap."""
+        v = self.travel_speed
+        return float(min(_axis_time(gap, v, self.accel_x),
+                         _axis_time(gap, v*self.roller_ratio, self.accel_y)))
+
+    def estimate(self, paths, pos=(0, 0)):
+        """Returns a dict with cut_length and travel_length in mm,
+           the number of lifts, and the predicted duration in seconds.
+           paths is a list of paths or a PathStore. Empty paths are ignored.
+        """
+        if not isinstance(paths, PathStore):
+            paths = PathStore.from_paths(paths)
+        store = paths.nonempty()
+        xy = store.xy
+        n = len(store)
+        same_path = store.path_index()
+        seg = np.flatnonzero(same_path[1:] == same_path[:-1])
+        D = xy[seg+1] - xy[seg]
+        cut_length = float(np.sum(np.hypot(D[:, 0], D[:, 1])))
+        # while cutting, segments flow into each other. Count one speed ramp per path.
+        v = self.cut_speed
+        cut_time = float(np.sum(np.maximum(np.abs(D[:, 0])/v, np.abs(D[:, 1])/(v*self.roller_ratio))))
+        cut_time += n*(v/self.accel_x + v*self.roller_ratio/self.accel_y)/2.0
+
+        if n:
+            A = np.concatenate(([pos[:2]], xy[store.ends()[:-1]]))
+            B = xy[store.starts()]
+        else:
+            A = B = np.zeros((0, 2))
+        T = B - A
+        travel_length = float(np.sum(np.hypot(T[:, 0], T[:, 1])))
+        travel_time = float(np.sum(self.move_times(A, B)))
+
+        return dict(cut_length=cut_length, travel_length=travel_length, lifts=n,
+                    duration=cut_time + travel_time + n*self.lift_time)
@@ -4,14 +4,14 @@ import os
 import sys
 import time
 import pickle
-import subprocess
 from threading import Thread
 from tempfile import NamedTemporaryFile
 from pathlib import Path
 from collections import defaultdict, OrderedDict
 import xmltodict
 import traceback
-from io import StringIO
+from io import StringIO, BytesIO
+from contextlib import redirect_stderr
 import wx
 from wx.lib.scrolledpanel import ScrolledPanel
 from wx.lib.agw import ultimatelistctrl as ulc
@@ -823,39 +823,78 @@ class SilhouetteMulti(EffectExtension):
 
         return commands
 
-    def run_multi(self, actions):
-        self.save_copy()
-
-        commands = self.format_commands(actions)
+    def action_args(self, color, settings):
+        return (["--%s=%s" % (k, v) for k, v in settings.items()]
+                + ["--id=%s" % node.get("id") for node in self.objects_by_color[color]])
 
+    def run_multi(self, actions):
         if self.options.dry_run:
-            emit_to_log("\n\n".join(commands))
+            self.save_copy()
+            emit_to_log("\n\n".join(self.format_commands(actions)))
+            os.remove(self.svg_copy_file_name)
 
         self.frame.wrapup()
 
         if not self.options.dry_run:
-            self.run_commands_with_dialog(commands)
-
-        os.remove(self.svg_copy_file_name)
-
-    def run_commands_with_dialog(self, commands):
-        for i, command in enumerate(commands):
-            returncode = self.run_command_with_dialog(command, step=i + 1, total=len(commands))
-            if returncode != 0:
-                # At this point, we have already displayed the log if we are
-                # going to. So if we want the user to see the failed command
-                # we just have to go ahead and display it.
-                # But we will use the dialog's extended message to reduce
-                # visual clutter
-                info_dialog(None, "Action failed.",
-                            extended = f"Return code: {returncode}\nCommand: '{command}'")
-
-                sys.exit(1)
-
-    def run_command_with_dialog(self, command, step, total):
-        # exec ensures that the shell gets replaced so that we can terminate the
-        # actual python script if the user cancels
-        process = subprocess.Popen("exec " + command, shell=True)
+            self.run_actions_with_dialog(actions)
+
+    def run_actions_with_dialog(self, actions):
+        # The actions run here, on the document we parsed already, and share
+        # one SilhouetteCameo: the device is searched and initialized once,
+        # only its setup() runs again for each action.
+        from sendto_silhouette import SendtoSilhouette
+        from silhouette.DeviceLock import DeviceLock
+        from silhouette.DevicePool import DevicePool
+
+        # keep other runs off our devices until all actions are done.
+        locks = {}
+        for color, settings in actions:
+            lock = DeviceLock.find(settings.get('device') or None)
+            locks[lock.path] = lock
+        locks = [locks[path] for path in sorted(locks)]
+        for lock in locks:
+            lock.acquire()
+        SendtoSilhouette.pool = DevicePool.find()
+        SendtoSilhouette.document_in = self.document
+        try:
+            for i, (color, settings) in enumerate(actions):
+                args = self.action_args(color, settings)
+                error = self.run_action_with_dialog(args, step=i + 1, total=len(actions))
+                if error is not None:
+                    # At this point, we have already displayed the log if we are
+                    # going to. So if we want the user to see the failed action
+                    # we just have to go ahead and display it.
+                    # But we will use the dialog's extended message to reduce
+                    # visual clutter
+                    info_dialog(None, "Action failed.",
+                                extended = f"{type(error).__name__}: {error}\nArguments: '{' '.join(args)}'")
+
+                    sys.exit(1)
+        finally:
+            SendtoSilhouette.pool = None
+            SendtoSilhouette.document_in = None
+            for lock in locks:
+                lock.release()
+
+    def run_action_with_dialog(self, args, step, total):
+        # The action runs in a thread, so that the dialog stays responsive.
+        # Returns the exception that ended the action, or None.
+        from sendto_silhouette import run_on_pool
+        result = []
+
+        def run():
+            try:
+                with redirect_stderr(multilogfile):
+                    run_on_pool(args, BytesIO(), multilogfile)
+                result.append(None)
+            except SystemExit as err:
+                result.append(err if err.code else None)
+            except BaseException as err:
+                traceback.print_exc(file=multilogfile)
+                result.append(err)
+
+        thread = Thread(target=run, daemon=True)
+        thread.start()
 
         dialog = wx.ProgressDialog(style=wx.PD_APP_MODAL|wx.PD_CAN_ABORT|wx.PD_ELAPSED_TIME,
                                    message="Performing action %d of %d..." % (step, total),
@@ -863,30 +902,28 @@ class SilhouetteMulti(EffectExtension):
 
         last_tick = time.time()
 
-        while process.returncode is None:
+        while thread.is_alive():
             if time.time() - last_tick > 0.5:
                 dialog.Pulse()
                 last_tick = time.time()
 
-            process.poll()
             wx.Yield()
-            time.sleep(0.1)
+            thread.join(0.1)
 
             if dialog.WasCancelled():
-                def cancel():
-                    process.terminate()
-                    process.wait()
-
-                Thread(target=cancel).start()
-
                 dialog.Destroy()
                 wx.Yield()
                 info_dialog(None, "Action aborted.  It may take awhile for the machine to cancel its operation.")
-                sys.exit(1)
+                # The action thread may still be writing to the device. End
+                # the process with it, as we terminated the child before:
+                # the device locks must not be released before the thread
+                # has stopped, and the operating system drops them with us.
+                multilogfile.flush()
+                os._exit(1)
 
         dialog.Destroy()
         wx.Yield()
-        return process.returncode
+        return result[0]
 
     # end of class MyFrame
 
@@ -0,0 +1,24 @@
+import threading
+
+from silhouette.DeviceLock import DeviceLock
+
+
+def test_one_run_at_a_time_on_a_device(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    first, second = DeviceLock("1-2.3"), DeviceLock("1-2.3")
+    assert first.acquire(blocking=False)
+    assert not second.acquire(blocking=False)
+    assert DeviceLock("1-4").acquire(blocking=False)     # another device
+
+    got = threading.Event()
+
+    def wait():
+        with second:
+            got.set()
+
+    thread = threading.Thread(target=wait)
+    thread.start()
+    assert not got.wait(0.2)
+    first.release()
+    thread.join()
+    assert got.is_set()
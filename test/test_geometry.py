@@ -0,0 +1,63 @@
+import numpy as np
+
+from silhouette.Geometry import (Barrier, XY_a, ccw, ccw_batch, dist_sq_batch, intersect_lines,
+                                 intersect_lines_batch, pairwise_dist_sq, polyline_length,
+                                 segment_dist_sq, segment_dist_sq_batch, sharp_turn,
+                                 sharp_turn_batch)
+
+
+def test_batch_matches_scalar():
+    rng = np.random.default_rng(5)
+    # grid points give plenty of colinear and right angle corners.
+    P = rng.integers(-4, 5, (3000, 3, 2)) * 0.5
+    pts = [[XY_a(p) for p in triple] for triple in P.tolist()]
+    assert ccw_batch(P[:, 0], P[:, 1], P[:, 2]).tolist() == [ccw(*t) for t in pts]
+    for fwd_ratio in (0.0, 0.5, 1.0, -0.5):
+        assert (sharp_turn_batch(P[:, 0], P[:, 1], P[:, 2], fwd_ratio).tolist()
+                == [sharp_turn(A, B, C, fwd_ratio) for A, B, C in pts])
+
+
+def test_intersect_lines_batch_matches_scalar():
+    rng = np.random.default_rng(7)
+    # small grids: many parallel, colinear and touching segments.
+    P = rng.integers(-2, 3, (2000, 4, 2)) * 0.5
+    pts = [[XY_a(p) for p in quad] for quad in P.tolist()]
+    for limit1, limit2 in ((False, False), (True, True), (True, False)):
+        xy = intersect_lines_batch(P[:, 0], P[:, 1], P[:, 2], P[:, 3], limit1, limit2)
+        for row, quad in zip(xy.tolist(), pts):
+            hit = intersect_lines(*quad, limit1=limit1, limit2=limit2)
+            if hit is None:
+                assert np.isnan(row).all()
+            else:
+                assert tuple(row) == tuple(hit)
+    # the same end point object comes back for colinear segments.
+    A, B, C, D = XY_a((0, 0)), XY_a((2, 0)), XY_a((1, 0)), XY_a((3, 0))
+    assert intersect_lines(A, B, C, D) is C
+
+
+def test_distances():
+    A = np.array([[0.0, 0.0], [0.0, 0.0], [1.0, 1.0]])
+    B = np.array([[4.0, 0.0], [0.0, 0.0], [1.0, 3.0]])
+    P = np.array([[2.0, 3.0], [3.0, 4.0], [0.0, 5.0]])
+    assert segment_dist_sq_batch(P, A, B).tolist() == [9.0, 25.0, 5.0]
+    assert segment_dist_sq(XY_a((5.0, 1.0)), XY_a((0.0, 0.0)), XY_a((4.0, 0.0))) == 2.0
+    assert pairwise_dist_sq(A, P)[2].tolist() == dist_sq_batch(A[2], P).tolist() == [5.0, 13.0, 17.0]
+    assert polyline_length([(0, 0), (3, 4), (3, 0)]) == 9.0
+
+
+def test_barrier_bisects_like_a_scan():
+    rng = np.random.default_rng(3)
+    pts = [XY_a(p) for p in (rng.integers(0, 20, (300, 2)) * 0.5).tolist()]
+    bar = Barrier(pts[:200], key=lambda a: a.y)
+    assert bar.keys == sorted(p.y for p in pts[:200])
+    for p in pts[200:]:
+        # points with the same key go after those already there.
+        bar.insert(p)
+        assert bar.index(p) == max(i for i, q in enumerate(bar.points) if q.y <= p.y)
+    assert bar.keys == [p.y for p in bar.points] == sorted(p.y for p in pts)
+    bar.first()
+    for limit in (-1.0, 0.0, 3.2, 3.5, 9.5, 10.0):
+        idx = bar.find_key(limit, start=0)
+        behind = [i for i, q in enumerate(bar.points) if q.y <= limit]
+        assert idx == (behind[-1] if behind else None)
+    assert bar.index(XY_a((0.0, 0.0))) is None      # compared by identity
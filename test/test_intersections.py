@@ -0,0 +1,78 @@
+import math
+import random
+
+from silhouette.Intersections import find_intersections, path_segments
+
+
+def test_crossings_and_overlaps():
+    paths = [
+        [(0.0, 0.0), (10.0, 10.0), (20.0, 0.0)],    # a V, its corner is no crossing
+        [(0.0, 10.0), (10.0, 0.0)],                 # an X with the left arm of the V
+        [(10.0, 12.0), (10.0, 20.0)],               # a T, hangs from the next path
+        [(0.0, 12.0), (20.0, 12.0)],
+        [(5.0, 30.0), (15.0, 30.0)],                # cut twice, from 8 to 12
+        [(8.0, 30.0), (12.0, 30.0)],
+    ]
+    segments, where = path_segments(paths)
+    crossings, overlaps = find_intersections(segments)
+
+    found = sorted((where[i][0], where[j][0], round(x, 6), round(y, 6)) for x, y, i, j in crossings)
+    assert found == [(0, 1, 5.0, 5.0), (2, 3, 10.0, 12.0), (4, 5, 8.0, 30.0)]
+
+    assert [(where[i][0], where[j][0]) for i, j, a, b in overlaps] == [(4, 5)]
+    assert math.isclose(sum(math.dist(a, b) for i, j, a, b in overlaps), 4.0)
+
+
+def brute_force_crossings(segments):
+    """All pairs, following the docstring of find_intersections()."""
+    from fractions import Fraction
+
+    def key(p):
+        return (p[1], p[0])
+
+    def on(p, a, b):
+        ## p strictly inside the segment from a to b, which it is colinear with.
+        return min(key(a), key(b)) < key(p) < max(key(a), key(b))
+
+    found = set()
+    for i in range(len(segments)):
+        for j in range(i + 1, len(segments)):
+            (a, b), (c, d) = segments[i], segments[j]
+            r = (b[0] - a[0], b[1] - a[1])
+            s = (d[0] - c[0], d[1] - c[1])
+            cross = r[0]*s[1] - r[1]*s[0]
+            ac = (c[0] - a[0], c[1] - a[1])
+            if cross == 0:
+                if ac[0]*r[1] - ac[1]*r[0] != 0:
+                    continue            # parallel, on different lines
+                ti, tj = min((a, b), key=key), min((c, d), key=key)
+                for p, other in ((ti, (c, d)), (tj, (a, b))):
+                    if on(p, *other):
+                        found.add((i, j, p))
+                continue
+            t = Fraction(ac[0]*s[1] - ac[1]*s[0], cross)
+            u = Fraction(ac[0]*r[1] - ac[1]*r[0], cross)
+            if 0 <= t <= 1 and 0 <= u <= 1 and not (t in (0, 1) and u in (0, 1)):
+                found.add((i, j, (a[0] + t*r[0], a[1] + t*r[1])))
+    return found
+
+
+def test_crossings_match_brute_force():
+    rnd = random.Random(4)
+    for n in range(200):
+        segments = []
+        while len(segments) < 12:
+            seg = ((rnd.randint(0, 6), rnd.randint(0, 6)), (rnd.randint(0, 6), rnd.randint(0, 6)))
+            if seg[0] == seg[1]:
+                continue
+            segments.append(seg)
+            if rnd.random() < 0.2:
+                segments.append(seg)                                # a duplicate
+            if rnd.random() < 0.2:
+                (x0, y0), (x1, y1) = seg
+                segments.append(((x0, y0), (2*x1 - x0, 2*y1 - y0))) # colinear, twice as long
+        crossings, overlaps = find_intersections(segments)
+        found = {(i, j, (round(x, 6), round(y, 6))) for x, y, i, j in crossings}
+        want = {(i, j, (round(float(p[0]), 6), round(float(p[1]), 6)))
+                for i, j, p in brute_force_crossings(segments)}
+        assert found == want, segments
@@ -0,0 +1,111 @@
+import pytest
+
+from silhouette.PathStore import PathStore
+
+
+def test_roundtrip():
+    paths = [[(0.0, 0.0), (1.0, 2.0)], [(5.0, 5.0)], [(3.0, 1.0), (4.0, 1.0), (4.0, 2.0)]]
+    assert PathStore.from_paths(paths).to_paths() == paths
+    assert PathStore.from_paths([]).to_paths() == []
+
+
+def test_simplify_keeps_ends_and_sharp_corners():
+    paths = [
+        # nearly straight line with a small wobble
+        [(0.0, 0.0), (1.0, 0.01), (2.0, -0.01), (3.0, 0.0)],
+        # a narrow spike, well within tolerance, but sharp
+        [(0.0, 5.0), (3.0, 5.0), (3.01, 6.0), (3.02, 5.0)],
+        # degenerate paths survive
+        [(5.0, 5.0), (5.0, 5.0)],
+        [(1.0, 1.0)],
+    ]
+    simplified = PathStore.from_paths(paths).simplify(0.1).to_paths()
+    assert simplified == [
+        [(0.0, 0.0), (3.0, 0.0)],
+        [(0.0, 5.0), (3.0, 5.0), (3.01, 6.0), (3.02, 5.0)],
+        [(5.0, 5.0), (5.0, 5.0)],
+        [(1.0, 1.0)],
+    ]
+    # far off points are kept
+    assert PathStore.from_paths(paths[:1]).simplify(0.005).to_paths() == paths[:1]
+
+
+def test_dedup_edges_cuts_shared_lines_once():
+    def square(x):
+        return [(x, 0.0), (x + 10.0, 0.0), (x + 10.0, 10.0), (x, 10.0), (x, 0.0)]
+    paths = [
+        square(0.0),
+        square(10.0),                           # shares its left edge with the first
+        [(5.0, 20.0), (15.0, 20.0)],
+        [(0.0, 20.0), (10.0, 20.015625), (20.0, 20.0)],   # within the grid, covers the one above
+    ]
+    deduped = PathStore.from_paths(paths).dedup_edges().to_paths()
+    assert deduped == [
+        square(0.0),
+        [(10.0, 0.0), (20.0, 0.0), (20.0, 10.0), (10.0, 10.0)],
+        [(5.0, 20.0), (15.0, 20.0)],
+        [(0.0, 20.0), (5.0, 20.0078125)],
+        [(15.0, 20.0078125), (20.0, 20.0)],
+    ]
+
+
+def test_weld_joins_chains_of_paths():
+    paths = [
+        [(0.0, 0.0), (1.0, 0.0)],
+        [(5.0, 5.0), (6.0, 6.0)],
+        [(2.0, 0.0), (1.0, 0.001)],     # end to end with the first
+        [(2.0005, 0.0), (3.0, 0.0)],
+        [(-1.0, 0.0), (0.0, 0.0)],      # comes before the first
+    ]
+    store = PathStore.from_paths(paths)
+    assert store.weld(0.01).to_paths() == [
+        [(-1.0, 0.0), (0.0, 0.0), (1.0, 0.0), (2.0, 0.0), (3.0, 0.0)],
+        [(5.0, 5.0), (6.0, 6.0)],
+    ]
+    assert store.weld(0.01, reversible=False).to_paths() == [
+        [(-1.0, 0.0), (0.0, 0.0), (1.0, 0.0)],
+        [(5.0, 5.0), (6.0, 6.0)],
+        [(2.0, 0.0), (1.0, 0.001)],
+        [(2.0005, 0.0), (3.0, 0.0)],
+    ]
+
+
+def test_orient_and_multipass():
+    paths = [[(0.0, 0.0), (0.0, 2.0), (0.0, 1.0), (0.0, 3.0)]]
+    assert PathStore.from_paths(paths).orient(1).to_paths() == [
+        [(0.0, 0.0), (0.0, 2.0)], [(0.0, 1.0), (0.0, 2.0)], [(0.0, 1.0), (0.0, 3.0)]]
+
+    square = [(0.0, 0.0), (4.0, 0.0), (4.0, 4.0), (0.0, 4.0), (0.0, 0.0)]
+    store = PathStore.from_paths([square, [(9.0, 0.0), (9.0, 1.0)]])
+    closed = store.closed(0.01)
+    assert closed.tolist() == [True, False]
+    assert store.multipass(2, False, 1.0, closed).to_paths() == [
+        [(0.0, 1.0)] + square + square[1:] + [(1.0, 0.0)],
+        [(9.0, 0.0), (9.0, 1.0)],
+        [(9.0, 0.0), (9.0, 1.0)],
+    ]
+    assert store.multipass(2, True, 0.0, closed).to_paths()[1] == [(9.0, 0.0), (9.0, 1.0), (9.0, 0.0)]
+
+
+def test_transforms_keep_the_top_left_corner():
+    paths = [[(10.0, 20.0), (14.0, 20.0), (14.0, 22.0)]]
+    assert PathStore.from_paths(paths).bbox() == (10.0, 20.0, 14.0, 22.0)
+    assert PathStore.from_paths([]).bbox() is None
+    assert PathStore.from_paths(paths).mirror().to_paths() == [[(14.0, 20.0), (10.0, 20.0), (10.0, 22.0)]]
+    assert PathStore.from_paths(paths).flip().to_paths() == [[(10.0, 22.0), (14.0, 22.0), (14.0, 20.0)]]
+    # clockwise with y down: the long side now runs downwards.
+    assert PathStore.from_paths(paths).rotate(90).to_paths() == [[(12.0, 20.0), (12.0, 24.0), (10.0, 24.0)]]
+    assert PathStore.from_paths(paths).rotate(45).rotate(-45).bbox() == pytest.approx((10.0, 20.0, 14.0, 22.0))
+    assert PathStore.from_paths(paths).scale(2.0, 0.5).translate(1.0, -1.0).to_paths() == [
+        [(11.0, 19.0), (19.0, 19.0), (19.0, 20.0)]]
+
+
+def test_fuse_joins_paths_that_go_on_where_the_last_ended():
+    paths = [[(0.0, 0.0), (1.0, 0.0)], [], [(1.0, 0.0), (2.0, 0.0)],
+             [(2.05, 0.0), (3.0, 0.0)], [(5.0, 5.0)], [(5.0, 5.0), (6.0, 6.0)]]
+    store = PathStore.from_paths(paths)
+    assert store.fuse(0.0).to_paths() == [
+        [(0.0, 0.0), (1.0, 0.0), (2.0, 0.0)], [(2.05, 0.0), (3.0, 0.0)], [(5.0, 5.0), (6.0, 6.0)]]
+    assert store.fuse(0.1).to_paths() == [
+        [(0.0, 0.0), (1.0, 0.0), (2.0, 0.0), (3.0, 0.0)], [(5.0, 5.0), (6.0, 6.0)]]
+    assert PathStore.from_paths([]).fuse(0.1).to_paths() == []
@@ -33,3 +33,142 @@ def test_loading_duplicated_path(data_dir):
         [(30.0, 20.0), (30.0, 40.0)],
         [(20.0, 30), (40.0, 30)],
     ]
+
+
+def offline_cameo():
+    """A SilhouetteCameo class that compiles offline, but stays open like a
+       device found on usb. Its opened lists the instances.
+    """
+    from silhouette.Graphtec import SilhouetteCameo, DEVICE
+
+    class OfflineCameo(SilhouetteCameo):
+        opened = []
+
+        def __init__(self, log, progress_cb=None, cmdfile=None, inc_queries=False, dry_run=False,
+                     force_hardware=None, address=None):
+            SilhouetteCameo.__init__(self, log=log, progress_cb=progress_cb, cmdfile=cmdfile,
+                                     offline_hardware=[hw for hw in DEVICE if hw['name'] == 'Silhouette_Cameo3'][0])
+            self.dev = True
+            self.opened.append(self)
+
+        def write(self, *args, **kwargs):
+            self.dev = None
+            try:
+                return SilhouetteCameo.write(self, *args, **kwargs)
+            finally:
+                self.dev = True
+
+        def read(self, *args, **kwargs):
+            self.dev = None
+            try:
+                return SilhouetteCameo.read(self, *args, **kwargs)
+            finally:
+                self.dev = True
+
+    return OfflineCameo
+
+
+@pytest.fixture
+def actions(data_dir, monkeypatch):
+    """Run actions as silhouette_multi does: on one parsed document, with one
+       pool of devices. Returns the SilhouetteCameo class of the pool.
+    """
+    import inkex
+    import silhouette.DevicePool
+    from silhouette.DevicePool import DevicePool, PoolDevice
+
+    cameo = offline_cameo()
+    monkeypatch.setattr(silhouette.DevicePool, "SilhouetteCameo", cameo)
+    monkeypatch.setattr(SendtoSilhouette, "pool", DevicePool([PoolDevice()]))
+    document = inkex.load_svg(str(data_dir / 'plus_with_duplicate.svg'))
+    monkeypatch.setattr(SendtoSilhouette, "document_in", document)
+    return cameo
+
+
+def test_actions_share_the_parsed_document_and_the_device(actions, tmp_path):
+    import io
+
+    logs = []
+    for id in ("path857", "use1652"):
+        log = tmp_path / (id + ".log")
+        effect = SendtoSilhouette()
+        effect.run(["--preview=false", "--logfile=%s" % log, "--id=%s" % id], output=io.BytesIO())
+        assert effect.document is SendtoSilhouette.document_in
+        logs.append(log.read_text())
+
+    assert len(actions.opened) == 1
+    assert "Device Version" in logs[0] and "Device Version" not in logs[1]
+    assert all("status=ready" in log for log in logs)
+
+
+def test_a_failing_action_closes_the_device_for_the_next(actions, tmp_path, monkeypatch):
+    import io
+    from sendto_silhouette import run_on_pool
+
+    def plot(self, **kwargs):
+        raise ValueError("stuck")
+
+    args = ["--preview=false", "--logfile=%s" % (tmp_path / "log")]
+    with monkeypatch.context() as m:
+        m.setattr(actions, "plot", plot)
+        with pytest.raises(ValueError):
+            run_on_pool(args, io.BytesIO())
+    assert len(actions.opened) == 1
+    assert SendtoSilhouette.pool.devices[0].cameo is None
+
+    run_on_pool(args, io.BytesIO())
+    assert len(actions.opened) == 2
+    assert SendtoSilhouette.pool.devices[0].cameo is actions.opened[1]
+
+
+def test_a_pipelined_job_waits_until_the_device_is_ready(data_dir, tmp_path, monkeypatch):
+    import io
+    import sendto_silhouette
+    from silhouette.DeviceLock import DeviceLock
+    from silhouette.Graphtec import SilhouetteCameo, DEVICE
+
+    class Usb:
+        """Still cutting the run before for three status queries."""
+        def __init__(self):
+            self.moving = 3
+            self.writes = []
+            self.response = b""
+
+        def write(self, endpoint, data, timeout=None):
+            data = bytes(data)
+            if data == b"\x1b\x05":
+                self.response = b"1\x03" if self.moving else b"0\x03"
+                self.moving = max(0, self.moving - 1)
+            else:
+                assert not self.moving, "written while moving"
+                self.writes.append(data)
+            return len(data)
+
+        def read(self, endpoint, size, timeout=None):
+            data, self.response = self.response, b""
+            return data
+
+    usb = Usb()
+
+    def cameo(log, **kwargs):
+        dev = SilhouetteCameo(log=log, offline_hardware=DEVICE[0])
+        dev.dev = usb
+        return dev
+
+    monkeypatch.setattr(sendto_silhouette, "SilhouetteCameo", cameo)
+    monkeypatch.setattr(sendto_silhouette.time, "sleep", lambda sec: None)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+    effect = SendtoSilhouette()
+    effect.parse_arguments([str(data_dir / 'plus_with_duplicate.svg')])
+    effect.log = io.StringIO()
+    effect.device_lock = DeviceLock("1-1")
+    job = b"\x1b\x04FW300\x03" + b"".join(b"D%d,0\x03" % i for i in range(400))
+    effect.spool_buffer = io.BytesIO(job)
+    try:
+        effect.transmit(None, None)
+    finally:
+        effect.device_lock.release()
+
+    assert b"".join(usb.writes) == job
+    assert all(len(data) <= 1024 for data in usb.writes)
+    assert "status=ready" in effect.log.getvalue()
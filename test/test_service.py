@@ -0,0 +1,35 @@
+import io
+import os
+import threading
+
+from silhouette.Service import Service, submit
+
+
+def test_submit_runs_the_job_in_the_service(tmp_path):
+    path = str(tmp_path / "s.sock")
+    assert submit(["x.svg"], path=path) is None      # nobody listening
+
+    jobs = []
+
+    def run_job(argv, document, stdout, stderr):
+        jobs.append((argv, document))
+        print("working", file=stderr)
+        stdout.write(document.upper())
+        return 3
+
+    service = Service(run_job, path, log=io.StringIO())
+    thread = threading.Thread(target=service.handle_request)
+    thread.start()
+    doc = tmp_path / "doc.svg"
+    doc.write_bytes(b"<svg/>")
+    stdout, stderr = io.BytesIO(), io.StringIO()
+    try:
+        assert submit(["--speed=3", "--logfile=x.log", "--cmdfile", "x.cmd", str(doc)], path=path,
+                      stdout=stdout, stderr=stderr, path_options=("--logfile", "--cmdfile")) == 3
+    finally:
+        thread.join()
+        service.server_close()
+    assert jobs == [(["--speed=3", "--logfile=" + os.path.abspath("x.log"),
+                      "--cmdfile", os.path.abspath("x.cmd")], b"<svg/>")]
+    assert stdout.getvalue() == b"<SVG/>"
+    assert stderr.getvalue() == "working\n"
@@ -0,0 +1,117 @@
+import io
+import threading
+
+import pytest
+
+from silhouette.DevicePool import DevicePool, PoolDevice
+from silhouette.Graphtec import DEVICE, SilhouetteCameo
+from silhouette.Spooler import Spooler
+
+
+class Cameo:
+    """Stands in for an open SilhouetteCameo."""
+    def __init__(self):
+        self.dev = True
+        self.sent = []
+
+    def attach(self, **kwargs):
+        pass
+
+    def replay(self, data):
+        self.sent.append(data)
+
+
+def pool_of(*devices):
+    for device in devices:
+        device.cameo = Cameo()
+    return DevicePool(list(devices))
+
+
+def test_priorities_holds_and_batching(tmp_path):
+    pool = pool_of(PoolDevice())
+    dev = pool.devices[0].cameo
+    spooler = Spooler(str(tmp_path), pool=pool)
+    a = spooler.add(b"S1", b"a")
+    b = spooler.add(b"S2", b"b")
+    c = spooler.add(b"S1", b"c")
+    d = spooler.add(b"S2", b"d", priority=5)
+    e = spooler.add(b"S1", b"e", hold=True)
+    spooler.cancel(a)
+
+    assert spooler.send_next() == d
+    # b has the setup just sent.
+    assert spooler.send_next() == b
+    assert spooler.send_next() == c
+    assert spooler.send_next() is None
+    assert dev.sent == [b"S2", b"d", b"b", b"S1", b"c"]
+
+    spooler.release(e)
+    # a new spooler, as after a restart, finds the job on disk.
+    pool = pool_of(PoolDevice())
+    spooler = Spooler(str(tmp_path), pool=pool)
+    assert [job["id"] for job in spooler.jobs()] == [e]
+    assert spooler.send_next() == e
+    assert pool.devices[0].cameo.sent == [b"S1", b"e"]
+    assert spooler.jobs() == []
+
+
+def test_jobs_go_to_devices_that_fit(tmp_path):
+    narrow = PoolDevice("1-1", {"name": "Silhouette_Portrait", "width_mm": 203})
+    wide = PoolDevice("1-2", {"name": "Silhouette_Cameo4", "width_mm": 304.8}, tool="pen")
+    pool = pool_of(narrow, wide)
+    spooler = Spooler(str(tmp_path), pool=pool)
+    a = spooler.add(b"S", b"a", requires={"width_mm": 250.0})
+    b = spooler.add(b"S", b"b", requires={"tool": "cut"})
+    assert spooler.send_next(narrow) == b
+    assert spooler.send_next(narrow) is None
+    assert spooler.send_next(wide) == a
+
+    # sheets of a job fan out over both, each waits for the other to start.
+    both = threading.Barrier(2, timeout=10)
+    def sheet(device, progress_cb):
+        both.wait()
+        return device.label()
+    assert sorted(pool.run_all([({}, sheet), ({}, sheet)])) == ["1-1", "1-2"]
+    with pytest.raises(ValueError):
+        pool.run_all([({"width_mm": 400.0}, sheet)])
+
+
+class Usb:
+    """Stands in for the usb device: moving for a while after each command."""
+    def __init__(self):
+        self.writes = []
+        self.busy = 0
+        self.response = b""
+
+    def write(self, endpoint, data, timeout=None):
+        data = bytes(data)
+        if data == b"\x1b\x05":
+            self.response = b"1\x03" if self.busy else b"0\x03"
+            self.busy = max(0, self.busy - 1)
+        else:
+            assert self.busy == 0, "written while moving"
+            self.writes.append(data)
+            if not data.startswith(b"\x1b"):
+                self.busy = 2
+        return len(data)
+
+    def read(self, endpoint, size, timeout=None):
+        data, self.response = self.response, b""
+        return data
+
+
+def test_streams_go_in_small_pieces_when_ready(tmp_path):
+    device = PoolDevice()
+    device.cameo = SilhouetteCameo(log=io.StringIO(), offline_hardware=DEVICE[0])
+    usb = device.cameo.dev = Usb()
+    spooler = Spooler(str(tmp_path), pool=DevicePool([device]), log=io.StringIO())
+    setup = b"\x1b\x04FW300\x03!10,0\x03"
+    plot = b"".join(b"D%d,%d\x03" % (i, 2 * i) for i in range(600))
+    spooler.add(setup, plot)
+    spooler.send_next()
+
+    assert b"".join(usb.writes) == setup + plot
+    assert usb.writes[0] == b"\x1b\x04"
+    for data in usb.writes[1:]:
+        assert len(data) <= 1024 and data.endswith(b"\x03")
+    assert len(usb.writes) > 6
@@ -0,0 +1,170 @@
+import math
+import random
+
+import numpy as np
+
+from silhouette.Strategy import MatFree
+from silhouette.TimeModel import MotionModel
+import silhouette.StrategyAuto
+import silhouette.StrategyMinTraveling
+
+
+def cut_segments(paths):
+    return [((a.x, a.y), (b.x, b.y)) for path in paths for a, b in zip(path, path[1:])]
+
+
+def test_pyramids_cuts_everything_in_shadow_order():
+    paths = [
+        [(10.0, 10.0), (30.0, 10.0), (30.0, 30.0), (10.0, 30.0), (10.0, 10.0)],
+        [(15.0, 40.0), (25.0, 12.0)],     # steep, crosses nothing, ends inside the square
+        [(40.0, 10.0), (60.0, 30.0)],     # an X of two 45 degree lines
+        [(60.0, 10.0), (40.0, 30.0)],
+    ]
+    mf = MatFree("pyramids", scale=1.0, pen=False)
+    mf.verbose = 0
+    mf.overshoot = 0.0
+    segs = cut_segments(mf.apply(paths))
+
+    length = sum(math.dist(a, b) for path in paths for a, b in zip(path, path[1:]))
+    assert math.isclose(sum(math.dist(a, b) for a, b in segs), length)
+
+    # no point is cut while a point of a later cut lies in its shadow.
+    for i, seg in enumerate(segs):
+        for q in seg:
+            for later in segs[i+1:]:
+                for p in later:
+                    assert not (p[0]+p[1] < q[0]+q[1] - 1e-9 and p[1]-p[0] < q[1]-q[0] - 1e-9), (q, p)
+
+
+def test_pyramids_without_subdivision_cut_everything():
+    # no segment of the highest point ends above the barrier.
+    paths = [[(26, 2), (16, 32), (31, 25)], [(5, 25), (40, 0)], [(27, 3), (6, 9), (14, 2), (36, 40)]]
+    mf = MatFree("pyramids", scale=1.0, pen=True)
+    mf.verbose = 0
+    mf.do_subdivide = False
+    segs = cut_segments(mf.apply(paths))
+    length = sum(math.dist(a, b) for path in paths for a, b in zip(path, path[1:]))
+    assert math.isclose(sum(math.dist(a, b) for a, b in segs), length)
+
+
+def test_parallel_bands_are_cut_bottom_up(monkeypatch):
+    import silhouette.Strategy
+    monkeypatch.setattr(silhouette.Strategy, "PARALLEL_MIN_SEGS", 1)
+    square = [(0.0, 0.0), (20.0, 0.0), (20.0, 20.0), (0.0, 20.0), (0.0, 0.0)]
+    paths = [[(x + 30.0*i, y + 50.0*j) for x, y in square] for j in (2, 0, 1) for i in range(2)]
+
+    def plan(processes, start_method=None):
+        mf = MatFree("default", scale=1.0, pen=False)
+        mf.verbose = 0
+        mf.overshoot = 0.0
+        mf.processes = processes
+        mf.start_method = start_method
+        return cut_segments(mf.apply(paths)), mf.comp_box
+
+    parallel, boxes = plan(2)
+    serial, _ = plan(1)
+    assert len(boxes) == 6
+    assert sorted(map(sorted, parallel)) == sorted(map(sorted, serial))
+    bands = [min(a[1], b[1]) // 50 for a, b in parallel]
+    assert bands == sorted(bands)
+    # as in the service, where the threads must not be forked.
+    assert plan(2, "spawn")[0] == parallel
+
+
+def test_euler_strokes_cut_a_grid_in_few_strokes():
+    # a 4x4 grid of unit squares, made of single segments.
+    paths = []
+    for i in range(5):
+        for k in range(4):
+            paths.append([(float(k), float(i)), (k + 1.0, float(i))])
+            paths.append([(float(i), float(k)), (float(i), k + 1.0)])
+    # a sharp V
+    paths.append([(10.0, 0.0), (11.0, 4.0)])
+    paths.append([(11.0, 4.0), (12.0, 0.0)])
+
+    def plan(pen):
+        mf = MatFree("euler", scale=1.0, pen=pen)
+        mf.verbose = 0
+        mf.overshoot = 0.0
+        return cut_segments(mf.apply(paths))
+
+    for pen in (True, False):
+        segs = plan(pen)
+        assert sorted(map(sorted, segs)) == sorted(sorted(seg) for path in paths for seg in zip(path, path[1:]))
+
+    # the 12 points on the sides of the grid have 3 segments each: 6 strokes, and one for the V.
+    mf = MatFree("euler", scale=1.0, pen=True)
+    mf.verbose = 0
+    assert len(mf.apply(paths)) == 7
+    # a knife does not turn in the V.
+    mf = MatFree("euler", scale=1.0, pen=False)
+    mf.verbose = 0
+    mf.overshoot = 0.0
+    assert not any((11.0, 4.0) in path[1:-1] for path in mf.apply(paths))
+
+
+def test_euler_strokes_keep_dots_with_overshoot():
+    mf = MatFree("euler", scale=1.0, pen=False)
+    mf.verbose = 0
+    out = [[(p.x, p.y) for p in path] for path in mf.apply([[(0, 0), (10, 0)], [(5, 5)]])]
+    # the line is extended by the overshoot at both ends, the dot stays a dot.
+    assert sorted(out) == [[(-0.2, 0.0), (10.2, 0.0)], [(5.0, 5.0)]]
+
+
+def test_mintravel_cuts_inner_paths_first():
+    def square(x, y, w):
+        return [(x, y), (x + w, y), (x + w, y + w), (x, y + w), (x, y)]
+    paths = [
+        square(0.0, 0.0, 100.0),
+        square(10.0, 10.0, 20.0),       # a hole
+        square(12.0, 12.0, 5.0),        # a part in the hole
+        [(50.0, 50.0), (60.0, 60.0)],
+        square(200.0, 0.0, 10.0),
+    ]
+    parents = silhouette.StrategyMinTraveling.containment(paths, lambda path: path[0] == path[-1])
+    assert parents == [None, 0, 1, 0, None]
+
+    # without the constraint, the outline comes first: it starts at home.
+    cut = silhouette.StrategyMinTraveling.sort(paths, parents=parents)
+    where = [next(i for i, path in enumerate(cut) if path[0] in p) for p in paths]
+    assert where[2] < where[1] < where[0] and where[3] < where[0]
+
+    # so does the auto strategy, whichever mintravel strategy wins.
+    strategy, cut, scores = silhouette.StrategyAuto.race(paths, MotionModel.for_device(None),
+            candidates=("mintravel", "mintravelfull"), parents=parents)
+    where = [next(i for i, path in enumerate(cut) if path[0] in p) for p in paths]
+    assert where[2] < where[1] < where[0] and where[3] < where[0]
+
+
+def test_simple_barrier_only_looks_at_open_points():
+    rng = random.Random(3)
+    paths = [[(rng.uniform(0, 60), rng.uniform(0, 60)) for _ in range(rng.randrange(2, 6))] for _ in range(80)]
+
+    class Count(MatFree):
+        def process_simple_barrier(s, y_slice, max_y, last_x=0.0):
+            s.slices.append(len(y_slice))
+            return MatFree.process_simple_barrier(s, y_slice, max_y, last_x)
+
+    class Rescan(MatFree):
+        """Hands every point behind the barrier to each step, as before."""
+        def process_simple_barrier(s, y_slice, max_y, last_x=0.0):
+            below = np.flatnonzero(s.xy[:s.n_points, 1] < max_y)
+            y_slice = below[np.argsort(s.xy[below, 1], kind='stable')]
+            s.slices.append(len(y_slice))
+            return MatFree.process_simple_barrier(s, y_slice, max_y, last_x)
+
+    def plan(cls):
+        mf = cls("default", scale=1.0, pen=False)
+        mf.verbose = 0
+        mf.overshoot = 0.0
+        mf.slices = []
+        return cut_segments(mf.apply(paths)), mf.slices
+
+    segs, active = plan(Count)
+    rescan, behind = plan(Rescan)
+    assert segs == rescan
+    length = sum(math.dist(a, b) for path in paths for a, b in zip(path, path[1:]))
+    assert math.isclose(sum(math.dist(a, b) for a, b in segs), length)
+    # points that are done are dropped, the last steps see only a few.
+    assert len(active) == len(behind) > 3
+    assert sum(active) < 0.6*sum(behind) and active[-1] < 0.5*behind[-1]
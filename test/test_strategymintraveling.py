@@ -0,0 +1,68 @@
+import random
+
+from silhouette.StrategyMinTraveling import findnearestpath, improve, sort, travel
+from silhouette.TimeModel import MotionModel
+
+
+def random_paths(rng, n):
+    """Paths on a coarse grid, so that many entry points tie. Some are closed."""
+    paths = []
+    for _ in range(n):
+        path = [(float(rng.randrange(20)), float(rng.randrange(20))) for _ in range(rng.randrange(1, 5))]
+        if len(path) > 2 and rng.random() < 0.4:
+            path.append(path[0])
+        paths.append(path)
+    return paths
+
+
+def greedy(paths, entrycircular=False, reversible=True):
+    """The ordering sort() had before it used an index: scan all paths each time."""
+    left = list(paths)
+    pos = (0, 0)
+    out = []
+    while left:
+        index, path = findnearestpath(left, pos, entrycircular, reversible)
+        left.pop(index)
+        out.append(path)
+        pos = path[-1]
+    return out
+
+
+def test_sort_orders_like_the_greedy_scan():
+    rng = random.Random(11)
+    for n in (1, 2, 10, 300):
+        paths = random_paths(rng, n)
+        for entrycircular, reversible in ((False, True), (True, True), (True, False)):
+            assert sort(paths, entrycircular, reversible) == greedy(paths, entrycircular, reversible)
+    assert sort([]) == []
+
+
+def test_sort_with_a_metric_goes_where_it_is_quickest():
+    m = MotionModel.for_device(None)
+    # the rollers are slower: 10mm along y takes longer than 11mm along x.
+    paths = [[(0.0, 10.0), (0.0, 20.0)], [(11.0, 0.0), (20.0, 0.0)]]
+    assert sort(paths)[0] == paths[0]
+    assert sort(paths, metric=m)[0] == paths[1]
+
+
+def test_improve_shortens_the_travel():
+    # a row of short strokes, sorted badly: every other one first.
+    paths = [[(float(x), 0.0), (x + 0.5, 0.0)] for x in list(range(0, 40, 2)) + list(range(1, 40, 2))]
+    better = improve(paths, timeout=5.0)
+    assert travel(better) < 0.7*travel(paths)
+    # the same strokes, some reversed.
+    assert sorted(sorted(path) for path in better) == sorted(sorted(path) for path in paths)
+
+    rng = random.Random(5)
+    paths = sort(random_paths(rng, 200))
+    for reversible in (True, False):
+        better = improve(paths, reversible=reversible, timeout=5.0)
+        assert travel(better) <= travel(paths)
+        if reversible:
+            assert sorted(map(sorted, better)) == sorted(map(sorted, paths))
+        else:
+            assert sorted(better) == sorted(paths)
+
+    assert improve(paths, timeout=0.0) is paths
+    m = MotionModel.for_device(None)
+    assert m.estimate(improve(paths, metric=m, timeout=5.0))["duration"] <= m.estimate(paths)["duration"]
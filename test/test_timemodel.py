@@ -0,0 +1,59 @@
+import math
+
+import numpy as np
+
+from silhouette.Graphtec import PRODUCT_ID_SILHOUETTE_CAMEO4
+from silhouette.PathStore import PathStore
+from silhouette.TimeModel import MotionModel
+
+
+def test_estimates_grow_with_the_length():
+    m = MotionModel.for_device(None, speed=5)
+    d = np.linspace(0.0, 500.0, 2001)
+    for axis in (0, 1):
+        B = np.zeros((len(d), 2))
+        B[:, axis] = d
+        t = m.move_times(np.zeros((len(d), 2)), B)
+        assert t[0] == 0.0 and (np.diff(t) > 0).all()
+
+    durations = [m.estimate([[(0.0, 0.0), (length, length/2)]])["duration"]
+                 for length in (0.1, 1.0, 10.0, 100.0, 1000.0)]
+    assert durations == sorted(set(durations))
+    # an estimate counts each path once, however it is given.
+    paths = [[(0.0, 0.0), (3.0, 4.0), (3.0, 0.0)], [], [(10.0, 10.0)], [(20.0, 0.0), (20.0, 5.0)]]
+    est = m.estimate(paths)
+    assert est == m.estimate(PathStore.from_paths(paths))
+    assert est["lifts"] == 3
+    assert math.isclose(est["cut_length"], 14.0)
+    assert math.isclose(est["travel_length"], 0.0 + math.dist((3.0, 0.0), (10.0, 10.0))
+                        + math.dist((10.0, 10.0), (20.0, 0.0)))
+
+
+def test_moving_with_the_tool_up_is_quicker_than_cutting():
+    for product_id in (None, PRODUCT_ID_SILHOUETTE_CAMEO4):
+        for speed in (1, 10, 30):
+            m = MotionModel.for_device(product_id, speed=speed)
+            for length in (0.5, 20.0, 300.0):
+                for a, b in (((0.0, 0.0), (length, 0.0)), ((0.0, 0.0), (0.0, length))):
+                    cut = m.estimate([[a, b]])["duration"] - m.lift_time
+                    assert m.move_time(a, b) <= cut
+    # faster devices and speed settings take less time.
+    paths = [[(0.0, 0.0), (100.0, 50.0)], [(200.0, 0.0), (0.0, 80.0)]]
+    slow = MotionModel.for_device(None, speed=3).estimate(paths)["duration"]
+    fast = MotionModel.for_device(None, speed=10).estimate(paths)["duration"]
+    cameo4 = MotionModel.for_device(PRODUCT_ID_SILHOUETTE_CAMEO4, speed=10).estimate(paths)["duration"]
+    assert slow > fast > cameo4
+
+
+def test_short_moves_are_limited_by_the_acceleration():
+    m = MotionModel(travel_speed=200.0, accel_x=1000.0, accel_y=600.0, roller_ratio=0.8)
+    # 200mm/s is reached after 20mm along x, the rest of 40mm is braking.
+    for d in (0.1, 1.0, 10.0, 39.0):
+        t = m.move_time((0.0, 0.0), (d, 0.0))
+        assert math.isclose(t, 2.0*math.sqrt(d/1000.0))
+        assert t > d/200.0
+    assert math.isclose(m.move_time((0.0, 0.0), (100.0, 0.0)), 100.0/200.0 + 200.0/1000.0)
+    # the rollers are slower than the carriage, a diagonal takes as long as its slower axis.
+    assert m.move_time((0.0, 0.0), (0.0, 10.0)) > m.move_time((0.0, 0.0), (10.0, 0.0))
+    assert m.move_time((0.0, 0.0), (10.0, 10.0)) == m.move_time((0.0, 0.0), (0.0, 10.0))
+    assert m.min_move_time(10.0) == m.move_time((0.0, 0.0), (10.0, 0.0))